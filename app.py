@@ -1,14 +1,10 @@
-from flask import Flask, render_template, session, jsonify
-from flask_socketio import SocketIO, emit
+from flask import Flask, render_template, session, request
+from flask_socketio import emit, join_room
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 import os
 from config import Config
-from datetime import timedelta
-
-# Initialize extensions
-db = SQLAlchemy()
-socketio = SocketIO()
+from extensions import db, socketio
+from utils.message_queue import socketio_queue_options
 
 def create_app():
     app = Flask(__name__)
@@ -21,7 +17,24 @@ def create_app():
     # Initialize extensions
     db.init_app(app)
     CORS(app)
-    socketio.init_app(app, cors_allowed_origins="*", async_mode='eventlet')
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        async_mode='eventlet',
+        **socketio_queue_options(app.config['SOCKETIO_MESSAGE_QUEUE'])
+    )
+    
+    # Create tables for all models
+    import models.user
+    import models.analysis
+    import models.deck_state
+    import models.job
+    import models.track_pin
+    from utils.schema import upgrade_schema
+    with app.app_context():
+        db.create_all()
+        # create_all() leaves existing tables alone; add columns models gained since
+        upgrade_schema()
     
     # Register blueprints
     from routes.api import api_bp
@@ -32,37 +45,95 @@ def create_app():
     app.register_blueprint(mixer_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     
+    from routes.auth import seed_default_user
+    with app.app_context():
+        seed_default_user()
+    
+    # Track references shared between workers keep tracks one worker is
+    # streaming from being evicted by another
+    from utils.storage import storage_manager
+    from utils.track_pins import create_track_pins
+    from utils.track_store import share_pins
+    pins = create_track_pins(app.config['TRACK_PIN_BACKEND'], app)
+    if pins is not None:
+        pins.reap()
+        share_pins(pins)
+        storage_manager.add_pin_source(pins.pinned_ids)
+    
+    # Index temp audio and mixes, reclaiming files left by a previous run
+    with app.app_context():
+        storage_manager.scan()
+    
+    # CLI commands (flask analyze-crate ...)
+    from cli import register_commands
+    register_commands(app)
+    
+    # Request timing, /metrics and the opt-in slow request profiler
+    from utils.metrics import metrics, instrument_app, RequestProfiler
+    profiler = None
+    if app.config['PROFILE_SLOW_REQUESTS'] > 0:
+        profiler = RequestProfiler(
+            app.config['PROFILE_SLOW_REQUESTS'],
+            sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+            folder=app.config['PROFILE_DIR']
+        )
+    instrument_app(app, profiler)
+    
+    @app.route('/metrics')
+    def metrics_endpoint():
+        # Prometheus text exposition format
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    
+    from utils.deck_store import new_state_id
+    
     @app.route('/')
     def index():
+        # The deck state ID doubles as the session's Socket.IO room
+        session.setdefault('deck_state_id', new_state_id())
         return render_template('index.html')
     
     @app.route('/mixer')
     def mixer():
+        session.setdefault('deck_state_id', new_state_id())
         return render_template('mixer.html')
     
-    # WebSocket events
+    # WebSocket events, scoped to the client's session room
+    from utils.control_relay import control_relay
+    
+    def _room():
+        return session.get('deck_state_id') or request.sid
+    
     @socketio.on('connect')
     def handle_connect():
-        print('Client connected')
-        emit('connection_response', {'data': 'Connected to DJ Mixer Server'})
+        room = _room()
+        join_room(room)
+        control_relay.join(room, request.sid)
+        emit('connection_response', {'data': 'Connected to DJ Mixer Server', 'room': room})
+        
+        # Bring late joiners up to date; later deck updates are deltas
+        state = control_relay.snapshot(room)
+        if state:
+            emit('deck_update', state)
+    
+    @socketio.on('disconnect')
+    def handle_disconnect():
+        control_relay.leave(_room(), request.sid)
     
     @socketio.on('deck_control')
     def handle_deck_control(data):
-        # Broadcast deck controls to all clients
-        emit('deck_update', data, broadcast=True, include_self=False)
+        # Coalesced: only the latest deck state per tick goes out
+        control_relay.submit(_room(), 'deck_update', data, request.sid)
     
     @socketio.on('crossfader_change')
     def handle_crossfader(data):
-        emit('crossfader_update', data, broadcast=True, include_self=False)
+        control_relay.submit(_room(), 'crossfader_update', data, request.sid)
     
     @socketio.on('bpm_sync')
     def handle_bpm_sync(data):
-        emit('sync_update', data, broadcast=True, include_self=False)
+        control_relay.send(_room(), 'sync_update', data, request.sid)
     
     return app
 
 if __name__ == '__main__':
     app = create_app()
-    with app.app_context():
-        db.create_all()
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Analysis time and accuracy against the analysis sample rate.
+Tracks rendered at 44.1 kHz are analyzed with AudioProcessor at each
+--rates value (the first is the baseline for the speedup column) and
+scored against the fixtures' known tempo and beats: BPM error, beat
+F-measure and mean absolute beat offset. Every fixture is also rendered
+with a noise floor at each --noise level. Exits 1 if any BPM error is
+above --tolerance percent, or if the configured ANALYSIS_SAMPLE_RATE
+does worse than 44100 Hz on a fixture (BPM error more than --bpm-slack
+points higher, or beat F-measure more than --f-slack lower).
+
+    python -m benchmarks.bench_analysis_rate [--rates 44100,22050,11025]
+                                             [--duration 300] [--bpms 124,128.5]
+                                             [--noise 0,0.01,0.05]
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from config import Config
+from utils.audio_processor import AudioProcessor
+from benchmarks.fixtures import FIXTURES
+from benchmarks.suite import beat_f_measure, tempo_accuracy
+
+RENDER_RATE = 44100
+REFERENCE_RATE = 44100
+
+def beat_offset_ms(estimated, reference):
+    """Mean distance from each estimated beat to its nearest reference beat"""
+    estimated = np.asarray(estimated, dtype=float)
+    if len(estimated) == 0:
+        return float('nan')
+    nearest = np.abs(estimated[:, None] - np.asarray(reference)[None, :]).min(axis=1)
+    return float(nearest.mean() * 1000)
+
+def timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rates', default='44100,22050,11025')
+    parser.add_argument('--duration', type=float, default=300.0)
+    parser.add_argument('--bpms', default='124,128.5')
+    parser.add_argument('--kinds', default='click,drums')
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--noise', default='0,0.01,0.05', help='noise floor levels')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='max BPM error in percent')
+    parser.add_argument('--bpm-slack', type=float, default=0.05,
+                        help='BPM error (percent points) the default rate may lose to 44100 Hz')
+    parser.add_argument('--f-slack', type=float, default=0.01,
+                        help='beat F-measure the default rate may lose to 44100 Hz')
+    args = parser.parse_args()
+
+    default_rate = Config.ANALYSIS_SAMPLE_RATE
+    rates = [int(rate) for rate in args.rates.split(',')]
+    # The default rate is compared against the reference on every fixture
+    rates += [rate for rate in (default_rate, REFERENCE_RATE) if rate not in rates]
+    processors = {rate: AudioProcessor(sample_rate=RENDER_RATE, analysis_sample_rate=rate)
+                  for rate in rates}
+
+    # Warm up numba/librosa caches so JIT time is not measured
+    warmup, _ = FIXTURES['click'](120, 10, RENDER_RATE)
+    for processor in processors.values():
+        processor.analyze(warmup)
+
+    failed = False
+    print(f"{'fixture':<24}{'rate':>7}{'seconds':>9}{'speedup':>9}{'bpm':>10}{'err %':>8}"
+          f"{'beat F':>8}{'offset ms':>11}")
+    for kind in args.kinds.split(','):
+        for bpm in (float(value) for value in args.bpms.split(',')):
+            for noise in (float(value) for value in args.noise.split(',')):
+                audio, beat_times = FIXTURES[kind](bpm, args.duration, RENDER_RATE, noise_level=noise)
+                name = f'{kind} {bpm:g} BPM' + (f' noise {noise:g}' if noise else '')
+                rows = {}
+                for rate, processor in processors.items():
+                    seconds, analysis = timed(lambda: processor.analyze(audio), args.repeat)
+                    rows[rate] = (seconds, analysis['bpm'], tempo_accuracy(analysis['bpm'], bpm)['bpm_error_pct'],
+                                  beat_f_measure(analysis['beat_times'], beat_times),
+                                  beat_offset_ms(analysis['beat_times'], beat_times))
+
+                baseline = rows[rates[0]][0]
+                _, _, reference_error, reference_f, _ = rows[REFERENCE_RATE]
+                for rate, (seconds, detected, error, f_measure, offset) in rows.items():
+                    ok = error <= args.tolerance
+                    if rate == default_rate:
+                        ok = ok and error <= reference_error + args.bpm_slack
+                        ok = ok and f_measure >= reference_f - args.f_slack
+                    failed = failed or not ok
+                    print(f"{name:<24}{rate:>7}{seconds:>9.3f}{baseline / seconds:>8.2f}x"
+                          f"{detected:>10.2f}{error:>8.2f}"
+                          f"{f_measure:>8.3f}{offset:>11.2f}{'' if ok else '  FAIL'}")
+
+    if failed:
+        print(f"BPM error above {args.tolerance}%, or the default rate ({default_rate} Hz) "
+              f"less accurate than {REFERENCE_RATE} Hz")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
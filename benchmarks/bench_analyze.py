@@ -0,0 +1,51 @@
+"""
+Compare the legacy two-pass analysis (calculate_bpm + detect_beat_positions)
+with the single-pass AudioProcessor.analyze() on a synthetic 5-minute track.
+
+    python -m benchmarks.bench_analyze [--duration 300] [--bpm 124]
+"""
+import argparse
+import time
+from utils.audio_processor import AudioProcessor
+from benchmarks.fixtures import click_track
+
+def timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def legacy_analysis(processor, audio):
+    bpm = processor.calculate_bpm(audio)
+    beat_times, tempo = processor.detect_beat_positions(audio)
+    return bpm, beat_times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=300.0)
+    parser.add_argument('--bpm', type=float, default=124.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    processor = AudioProcessor()
+    audio, _ = click_track(args.bpm, args.duration, processor.sample_rate)
+    
+    # Warm up numba/librosa caches so JIT time is not measured
+    processor.analyze(audio[:processor.sample_rate * 10])
+    legacy_analysis(processor, audio[:processor.sample_rate * 10])
+    
+    legacy_time, (legacy_bpm, legacy_beats) = timed(
+        lambda: legacy_analysis(processor, audio), args.repeat
+    )
+    single_time, analysis = timed(lambda: processor.analyze(audio), args.repeat)
+    
+    print(f"track: {args.duration:.0f}s click track at {args.bpm} BPM")
+    print(f"legacy two-pass : {legacy_time:7.3f}s  bpm={float(legacy_bpm):.2f} beats={len(legacy_beats)}")
+    print(f"analyze()       : {single_time:7.3f}s  bpm={analysis['bpm']:.2f} beats={len(analysis['beat_times'])}")
+    print(f"speedup         : {legacy_time / single_time:7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Micro-benchmarks for the vectorized BeatDetector hot loops.
+Each method is timed against the original per-beat/per-frame Python
+implementation (kept below as the reference) and checked for numerical
+equivalence. align_beats has no equivalent reference (the original
+correlated vectors of ones and always found a zero shift): it must
+recover a known shift within its resolution and answer within
+ALIGN_BUDGET.
+
+    python -m benchmarks.bench_beat_detector [--duration 600]
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from scipy import signal
+from utils.beat_detector import BeatDetector
+from benchmarks.fixtures import click_track
+
+# Reference implementations (pre-vectorization)
+
+def legacy_calculate_beat_phase(detector, audio_data, beat_times):
+    beat_samples = (beat_times * detector.sample_rate).astype(int)
+    beat_energies = []
+    window_size = int(0.05 * detector.sample_rate)
+    for beat_sample in beat_samples:
+        start = max(0, beat_sample - window_size // 2)
+        end = min(len(audio_data), beat_sample + window_size // 2)
+        segment = audio_data[start:end]
+        if len(segment) > 0:
+            beat_energies.append(np.sqrt(np.mean(segment ** 2)))
+        else:
+            beat_energies.append(0)
+    return np.array(beat_energies)
+
+def legacy_detect_energy_peaks(detector, audio_data, threshold=0.1):
+    frame_length = 2048
+    hop_length = 512
+    energy = []
+    for i in range(0, len(audio_data) - frame_length, hop_length):
+        frame = audio_data[i:i + frame_length]
+        energy.append(np.sqrt(np.mean(frame ** 2)))
+    energy = np.array(energy)
+    peaks = signal.find_peaks(energy, height=threshold)[0]
+    return peaks * hop_length / detector.sample_rate, energy
+
+def legacy_create_beat_grid(detector, audio_data, bpm, first_beat_time=0):
+    beat_interval = 60 / bpm
+    duration = len(audio_data) / detector.sample_rate
+    beat_times = []
+    current_time = first_beat_time
+    while current_time < duration:
+        beat_times.append(current_time)
+        current_time += beat_interval
+    return np.array(beat_times)
+
+# Minimum speedup each method must keep on the default 10-minute track
+MIN_SPEEDUP = {
+    'calculate_beat_phase': 2.0,
+    'detect_energy_peaks': 5.0,
+    'create_beat_grid': 2.0
+}
+ALIGN_BUDGET = 0.05  # seconds per deck pair, for /sync_beats
+ALIGN_SHIFT = 0.01  # seconds track B's beats are moved by
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def close(a, b):
+    if isinstance(a, tuple):
+        return all(close(x, y) for x, y in zip(a, b))
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return a.shape == b.shape and np.allclose(a, b, rtol=1e-5, atol=1e-6)
+
+def close_peaks(expected, actual):
+    """
+    Energy must match; peak times may move by one hop where two frames
+    tie within float32 rounding of the legacy per-frame means.
+    """
+    (peaks_a, energy_a), (peaks_b, energy_b) = expected, actual
+    hop_time = 512 / 44100
+    return (close(energy_a, energy_b) and len(peaks_a) == len(peaks_b)
+            and np.all(np.abs(peaks_a - peaks_b) <= hop_time + 1e-9))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=600.0)
+    parser.add_argument('--bpm', type=float, default=126.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    detector = BeatDetector()
+    # A noise floor keeps energy peaks unambiguous (no exact plateaus)
+    audio, beat_times = click_track(args.bpm, args.duration, detector.sample_rate, noise_level=1e-3)
+    beat_times = np.concatenate([[0.01], beat_times[1:], [args.duration - 0.01]])  # edge windows
+    beat_times_b = beat_times[:len(beat_times) * 3 // 4] + ALIGN_SHIFT
+    
+    # (name, legacy, vectorized, comparison)
+    cases = [
+        ('calculate_beat_phase',
+         lambda: legacy_calculate_beat_phase(detector, audio, beat_times),
+         lambda: detector.calculate_beat_phase(audio, beat_times), close),
+        ('detect_energy_peaks',
+         lambda: legacy_detect_energy_peaks(detector, audio),
+         lambda: detector.detect_energy_peaks(audio), close_peaks),
+        ('create_beat_grid',
+         lambda: legacy_create_beat_grid(detector, audio, args.bpm, 0.25),
+         lambda: detector.create_beat_grid(audio, args.bpm, 0.25), close),
+    ]
+    
+    print(f"track: {args.duration:.0f}s at {args.bpm} BPM, {len(beat_times)} beats")
+    print(f"{'method':<22}{'legacy':>10}{'vectorized':>12}{'speedup':>10}  equal  pinned")
+    failed = False
+    for name, legacy, vectorized, compare in cases:
+        legacy_time, expected = timed(legacy, args.repeat)
+        new_time, actual = timed(vectorized, args.repeat)
+        equal = compare(expected, actual)
+        speedup = legacy_time / new_time
+        pinned = speedup >= MIN_SPEEDUP[name]
+        failed |= not (equal and pinned)
+        print(f"{name:<22}{legacy_time * 1000:>9.2f}ms{new_time * 1000:>10.2f}ms"
+              f"{speedup:>9.1f}x  {str(equal):<5}  {pinned}")
+    
+    # B's beats are ALIGN_SHIFT late, so the shift that lines them up is -ALIGN_SHIFT
+    resolution = 0.001
+    align_time, (shift, _) = timed(
+        lambda: detector.align_beats(beat_times, beat_times_b, resolution=resolution), args.repeat
+    )
+    recovered = shift is not None and abs(shift + ALIGN_SHIFT) <= resolution
+    in_budget = align_time <= ALIGN_BUDGET
+    failed |= not (recovered and in_budget)
+    shift_ms = float('nan') if shift is None else shift * 1000
+    print(f"{'align_beats':<22}{'':>10}{align_time * 1000:>10.2f}ms"
+          f"  shift {shift_ms:+.2f}ms (expected {-ALIGN_SHIFT * 1000:+.2f}ms)"
+          f"  recovered {recovered}  within {ALIGN_BUDGET * 1000:.0f}ms {in_budget}")
+    
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Beat storage size and lookup cost: detected beats of a synthetic track
+as a JSON list, a raw float64 array and a binary beatgrid (with and
+without residuals), plus nearest-beat/snap lookups against a linear scan.
+
+    python -m benchmarks.bench_beatgrid [--duration 600] [--bpm 124] [--queries 10000]
+"""
+import argparse
+import json
+import time
+import numpy as np
+from utils.audio_processor import AudioProcessor
+from utils.beatgrid import BeatGrid
+from benchmarks.fixtures import drum_pattern
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=600.0)
+    parser.add_argument('--bpm', type=float, default=124.0)
+    parser.add_argument('--queries', type=int, default=10000)
+    args = parser.parse_args()
+
+    processor = AudioProcessor()
+    audio, _ = drum_pattern(args.bpm, args.duration, processor.sample_rate)
+    analysis = processor.analyze(audio)
+    beat_times = np.asarray(analysis['beat_times'])
+
+    # A DJ edit whose tempo drifts from bpm to bpm + 6 over the track
+    drifting = np.cumsum(60.0 / np.linspace(args.bpm, args.bpm + 6, len(beat_times)))
+
+    print(f"{'beats':<26}{'json':>9}{'float64':>9}{'grid':>8}{'no resid':>10}{'vs json':>9}{'max err ms':>12}")
+    for name, beats in (('detected', beat_times), ('drifting tempo', drifting)):
+        grid = BeatGrid.from_beats(beats, sample_rate=processor.sample_rate)
+        data = grid.to_bytes()
+        bare = BeatGrid.from_beats(beats, residuals=False, sample_rate=processor.sample_rate).to_bytes()
+        json_size = len(json.dumps(beats.tolist()))
+        error = np.abs(BeatGrid.from_bytes(data).times() - beats).max() * 1000
+        print(f"{name + f' ({len(beats)})':<26}{json_size:>9}{beats.nbytes:>9}{len(data):>8}{len(bare):>10}"
+              f"{json_size / len(data):>8.0f}x{error:>12.4f}")
+
+    grid = BeatGrid.from_beats(beat_times, sample_rate=processor.sample_rate)
+    queries = np.random.default_rng(0).uniform(0, args.duration, args.queries)
+    scan_time, scan = timed(lambda: np.abs(queries[:, None] - beat_times[None, :]).argmin(axis=1))
+    grid_time, (nearest, _) = timed(lambda: grid.nearest_beat(queries))
+    snap_time, _ = timed(lambda: grid.snap(queries, 4))
+    assert np.array_equal(scan, nearest)
+    print(f"\n{args.queries} lookups over {len(beat_times)} beats")
+    print(f"linear scan    : {scan_time * 1000:8.2f} ms")
+    print(f"nearest_beat   : {grid_time * 1000:8.2f} ms  ({scan_time / grid_time:.0f}x)")
+    print(f"snap (1/16ths) : {snap_time * 1000:8.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Downbeat and phrase detection accuracy and cost. Each fixture is
+analyzed with AudioProcessor and its downbeats (and, for the arranged
+fixture, its 8- and 16-bar phrase starts) are scored against the
+fixture's known bars with the beat F-measure, next to the old rule of
+taking every fourth beat. The plain drum loop repeats every two beats,
+so its beats 1 and 3 cannot be told apart and it only shows that the
+snare beats are never picked. The stage histogram gives the structure
+detection time as a fraction of beat tracking. Exits 1 if the arranged
+fixture's downbeat F-measure is below --min-f.
+
+    python -m benchmarks.bench_downbeats [--duration 300] [--bpm 124] [--pickups 0,1,2,3]
+"""
+import argparse
+import sys
+from utils.audio_processor import AudioProcessor
+from utils.metrics import STAGE_SECONDS
+from benchmarks.fixtures import FIXTURES
+from benchmarks.suite import beat_f_measure
+
+def stage_seconds(stage):
+    return STAGE_SECONDS.snapshot(stage=stage)[1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=300.0)
+    parser.add_argument('--bpm', type=float, default=124.0)
+    parser.add_argument('--pickups', default='0,1,2,3', help='beats before the first bar')
+    parser.add_argument('--min-f', type=float, default=0.9)
+    args = parser.parse_args()
+
+    processor = AudioProcessor()
+    # Warm up numba/librosa caches so JIT time is not measured
+    warmup, _ = FIXTURES['click'](120, 10, processor.sample_rate)
+    processor.analyze(warmup)
+
+    cases = [('click', 0)]
+    for kind in ('drums', 'arranged'):
+        cases.extend((kind, int(pickup)) for pickup in args.pickups.split(','))
+
+    failed = False
+    print(f"{'fixture':<14}{'pickup':>7}{'every 4th':>11}{'downbeats':>11}{'8 bars':>8}{'16 bars':>9}"
+          f"{'structure ms':>14}{'of beats':>10}")
+    for kind, pickup in cases:
+        kwargs = {'pickup_beats': pickup} if kind != 'click' else {}
+        audio, beat_times = FIXTURES[kind](args.bpm, args.duration, processor.sample_rate, **kwargs)
+
+        before = stage_seconds('analyze.structure'), stage_seconds('analyze.beat_track')
+        analysis = processor.analyze(audio)
+        structure = stage_seconds('analyze.structure') - before[0]
+        tracking = stage_seconds('analyze.beat_track') - before[1]
+
+        bars = beat_times[pickup::4]
+        naive = beat_f_measure(analysis['beat_times'][::4], bars)
+        detected = beat_f_measure(analysis['downbeats'], bars)
+        phrases = ''
+        if kind == 'arranged':
+            # The arrangement changes every 8 bars
+            phrases = (f"{beat_f_measure(analysis['phrases'][8], beat_times[pickup::32]):>8.3f}"
+                       f"{beat_f_measure(analysis['phrases'][16], beat_times[pickup::64]):>9.3f}")
+            ok = detected >= args.min_f
+            failed = failed or not ok
+        else:
+            ok = True
+        print(f"{kind:<14}{pickup:>7}{naive:>11.3f}{detected:>11.3f}{phrases:>17}"
+              f"{structure * 1000:>14.2f}{structure / tracking:>9.1%}{'' if ok else '  FAIL'}")
+
+    if failed:
+        print(f"Downbeat F-measure below {args.min_f} on the arranged fixture")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Cold start of a web worker: time to import the app and run create_app(),
+resident memory afterwards, and which heavy DSP modules got loaded.
+Each run is a fresh interpreter. The "dsp" row additionally imports the
+analysis stack, i.e. what an analysis worker pays on its first job.
+
+    python -m benchmarks.bench_startup [--repeat 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ('scipy.signal', 'scipy.ndimage', 'librosa.core', 'numba',
+                 'soundfile', 'youtube_dl', 'pydub', 'matplotlib')
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+with app.app_context():
+    from utils.services import services
+    services.audio_processor.analysis_params()
+if {dsp}:
+    import utils.beat_detector, utils.effects, utils.time_stretch, utils.mix_renderer
+    import librosa.core, librosa.beat
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+def probe(dsp, workdir):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    code = PROBE.format(dsp=dsp, heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, '-W', 'ignore', '-c', code], cwd=workdir, env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return json.loads(proc.stdout.decode().strip().splitlines()[-1])
+
+def summarize(runs):
+    return {
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'rss_mb': statistics.median(run['rss_mb'] for run in runs),
+        'heavy': runs[-1]['heavy']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        probe(False, workdir)  # warm the OS file cache and create the database
+        results = {
+            'web': summarize([probe(False, workdir) for _ in range(args.repeat)]),
+            'dsp': summarize([probe(True, workdir) for _ in range(args.repeat)])
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"median of {args.repeat} fresh interpreters")
+    for name, result in results.items():
+        heavy = ', '.join(result['heavy']) or '-'
+        print(f"{name:<4} {result['seconds']:6.3f}s  {result['rss_mb']:7.1f} MB RSS  heavy: {heavy}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Real-time factor of the streaming WSOLA time stretcher for 1%, 5% and
+10% tempo changes, against librosa's whole-track phase vocoder, plus the
+streaming resampler used for sample-rate mismatches.
+RTF = seconds of audio produced per second of processing (higher is better).
+BPM after is measured from the click onsets of the stretched output;
+exits 1 if it is more than --tolerance percent off the expected tempo.
+
+    OMP_NUM_THREADS=1 python -m benchmarks.bench_time_stretch [--duration 120] [--no-librosa]
+"""
+import argparse
+import sys
+import time
+import librosa
+import numpy as np
+from scipy import signal
+from utils.resample import Resampler
+from utils.time_stretch import TimeStretcher
+from benchmarks.fixtures import click_track
+
+RATES = (1.01, 1.05, 1.10)
+
+def timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def stream(blocks):
+    """Consume a block generator like the renderer does; returns frames produced"""
+    return sum(len(block) for block in blocks)
+
+def onset_bpm(audio, sr, expected_bpm):
+    """
+    Tempo of a click track from its click onsets (the sharpest power
+    rises, 1 ms frames): slope of onset time against click index. Measures
+    the stretcher alone, without the beat tracker's own error.
+    """
+    hop = int(0.001 * sr)
+    frames = np.asarray(audio[:len(audio) // hop * hop], dtype=np.float64).reshape(-1, hop)
+    rise = np.diff(np.einsum('ij,ij->i', frames, frames), prepend=0.0)
+    interval = 60.0 / expected_bpm
+    onsets, _ = signal.find_peaks(rise, height=0.2 * rise.max(), distance=int(interval / 2 / 0.001))
+    times = onsets * hop / sr
+    index = np.round((times - times[0]) / interval)
+    return 60.0 / np.polyfit(index, times, 1)[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=120.0)
+    parser.add_argument('--bpm', type=float, default=124.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-librosa', action='store_true', help='Skip the phase vocoder baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='max BPM error after stretching, percent')
+    args = parser.parse_args()
+    
+    sr = 44100
+    audio, _ = click_track(args.bpm, args.duration, sr, noise_level=0.05)
+    
+    failed = False
+    print(f"track: {args.duration:.0f}s click track at {args.bpm} BPM, {sr} Hz")
+    print(f"{'change':>7} {'WSOLA RTF':>10} {'librosa RTF':>12} {'BPM after':>10} {'expected':>9}")
+    for rate in RATES:
+        stretcher = TimeStretcher(audio, rate)
+        wsola_time, frames = timed(lambda: stream(stretcher.blocks()), args.repeat)
+        out_seconds = frames / sr
+        
+        librosa_rtf = '-'
+        if not args.no_librosa:
+            pv_time, _ = timed(lambda: librosa.effects.time_stretch(audio, rate=rate), 1)
+            librosa_rtf = f"{out_seconds / pv_time:.1f}x"
+        
+        expected = args.bpm * rate
+        bpm = onset_bpm(stretcher.render(), sr, expected)
+        ok = abs(bpm - expected) <= expected * args.tolerance / 100
+        failed = failed or not ok
+        print(f"{(rate - 1) * 100:6.0f}% {out_seconds / wsola_time:9.1f}x {librosa_rtf:>12} {bpm:10.2f}"
+              f" {expected:9.2f}{'' if ok else '  FAIL'}")
+    
+    for orig_sr in (48000, 22050):
+        source, _ = click_track(args.bpm, args.duration, orig_sr)
+        resampler = Resampler(source, orig_sr, sr)
+        resample_time, frames = timed(lambda: stream(resampler.blocks()), args.repeat)
+        print(f"resample {orig_sr} -> {sr}: RTF {frames / sr / resample_time:.1f}x")
+    
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import numpy as np
+
+def click_track(bpm=120.0, duration=30.0, sample_rate=44100, seed=0, noise_level=0.0):
+    """
+    Deterministic click track at a known BPM.
+    Each beat is a short decaying noise burst; every fourth beat is accented.
+    noise_level adds a constant noise floor.
+    """
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(duration * sample_rate), dtype=np.float32)
+    if noise_level:
+        audio += noise_level * rng.standard_normal(len(audio)).astype(np.float32)
+    
+    click_len = int(0.03 * sample_rate)
+    click = rng.standard_normal(click_len).astype(np.float32)
+    click *= np.exp(-np.linspace(0, 8, click_len)).astype(np.float32)
+    
+    beat_interval = 60.0 / bpm
+    beat_times = np.arange(0, duration - 0.05, beat_interval)
+    for i, t in enumerate(beat_times):
+        start = int(t * sample_rate)
+        gain = 0.9 if i % 4 == 0 else 0.5
+        audio[start:start + click_len] += gain * click
+    
+    return audio, beat_times
+
+def drum_pattern(bpm=124.0, duration=30.0, sample_rate=44100, seed=0, pickup_beats=0,
+                 noise_level=0.0):
+    """
+    Deterministic four-on-the-floor drum loop at a known BPM: a pitched
+    kick on every beat, a snare on beats 2 and 4 and closed hats on the
+    off-beat eighths. The first bar starts after pickup_beats beats.
+    noise_level adds a noise floor after normalizing to 0.9 peak.
+    Returns (audio, beat_times) like click_track.
+    """
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(duration * sample_rate), dtype=np.float32)
+    
+    kick_len = int(0.25 * sample_rate)
+    t = np.arange(kick_len) / sample_rate
+    sweep = 2 * np.pi * (50 * t + 70 * (1 - np.exp(-t * 30)) / 30)
+    kick = (np.sin(sweep) * np.exp(-t * 12)).astype(np.float32)
+    
+    snare_len = int(0.15 * sample_rate)
+    t = np.arange(snare_len) / sample_rate
+    snare = (0.6 * rng.standard_normal(snare_len) + 0.4 * np.sin(2 * np.pi * 190 * t))
+    snare = (snare * np.exp(-t * 25)).astype(np.float32)
+    
+    hat_len = int(0.04 * sample_rate)
+    hat = rng.standard_normal(hat_len).astype(np.float32)
+    hat = np.diff(hat, prepend=0)  # crude high-pass
+    hat *= np.exp(-np.linspace(0, 10, hat_len)).astype(np.float32)
+    
+    def place(sound, times, gain):
+        for start in (times * sample_rate).astype(int):
+            end = min(start + len(sound), len(audio))
+            audio[start:end] += gain * sound[:end - start]
+    
+    beat_interval = 60.0 / bpm
+    beat_times = np.arange(0, duration - 0.05, beat_interval)
+    place(kick, beat_times, 0.8)
+    place(snare, beat_times[pickup_beats + 1::2], 0.5)
+    place(hat, beat_times + beat_interval / 2, 0.25)
+    
+    peak = np.abs(audio).max()
+    if peak > 0:
+        audio *= np.float32(0.9 / peak)
+    if noise_level:
+        audio += noise_level * rng.standard_normal(len(audio)).astype(np.float32)
+    return audio, beat_times
+
+def arranged_track(bpm=124.0, duration=30.0, sample_rate=44100, seed=0, pickup_beats=1,
+                   noise_level=0.0):
+    """
+    drum_pattern with an arrangement: a bass note on every bar (a four-bar
+    progression), a pad that plays in alternate 8-bar sections and a
+    crash opening every 16-bar phrase. The first bar starts after
+    pickup_beats beats, so downbeats are beat_times[pickup_beats::4] and
+    8-bar phrases start at beat_times[pickup_beats::32]. noise_level
+    adds a noise floor as in drum_pattern.
+    Returns (audio, beat_times) like click_track.
+    """
+    rng = np.random.default_rng(seed)
+    audio, beat_times = drum_pattern(bpm, duration, sample_rate, seed, pickup_beats)
+    audio *= np.float32(0.6)
+    
+    bar_len = int(4 * 60.0 / bpm * sample_rate)
+    t = np.arange(bar_len) / sample_rate
+    envelope = np.minimum(t / 0.005, 1) * np.exp(-t * 0.8)
+    crash_len = int(1.5 * sample_rate)
+    crash = np.diff(rng.standard_normal(crash_len + 1)).astype(np.float32)
+    crash *= np.exp(-np.linspace(0, 6, crash_len)).astype(np.float32)
+    
+    for bar, start in enumerate((beat_times[pickup_beats::4] * sample_rate).astype(int)):
+        end = min(start + bar_len, len(audio))
+        root = (55.0, 43.65, 65.41, 49.0)[bar % 4]
+        bass = np.sin(2 * np.pi * root * t) + 0.3 * np.sin(4 * np.pi * root * t)
+        audio[start:end] += (0.35 * bass * envelope)[:end - start].astype(np.float32)
+        if (bar // 8) % 2:
+            pad = sum(np.sin(2 * np.pi * f * t) for f in (4 * root, 5 * root, 6 * root))
+            audio[start:end] += (0.05 * pad)[:end - start].astype(np.float32)
+        if bar % 16 == 0:
+            end = min(start + crash_len, len(audio))
+            audio[start:end] += 0.3 * crash[:end - start]
+    
+    peak = np.abs(audio).max()
+    if peak > 0:
+        audio *= np.float32(0.9 / peak)
+    if noise_level:
+        audio += noise_level * rng.standard_normal(len(audio)).astype(np.float32)
+    return audio, beat_times
+
+FIXTURES = {'click': click_track, 'drums': drum_pattern, 'arranged': arranged_track}
@@ -0,0 +1,330 @@
+"""
+End-to-end benchmark suite on deterministic synthetic tracks.
+
+For every fixture (click track or drum pattern at a known BPM and
+length) it times ingest (ffmpeg decode), analysis, mix rendering,
+filtering and the Flask endpoints (through the test client, with a
+YouTubeLoader stub that "downloads" the fixture files), recording wall
+time, peak RSS and real-time factor (audio seconds per wall second).
+Analysis results are scored against the known tempo and beat positions.
+
+    python -m benchmarks.suite [--durations 30,120,600] [--kinds click,drums]
+                               [--bpms 124] [--repeat 3] [--output results.json]
+                               [--compare benchmarks/baseline.json] [--tolerance 0.2]
+
+With --compare the run is checked against an earlier --output file:
+stages that got slower than the tolerance allows, and fixtures whose BPM
+or beat accuracy dropped, are reported and the exit status is 1.
+Hour-long fixtures (--durations 3600) need several GB of RAM.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import soundfile as sf
+from benchmarks.fixtures import FIXTURES
+
+SAMPLE_RATE = 44100
+BEAT_TOLERANCE = 0.07  # seconds, for the beat F-measure
+MIN_REGRESSION = 0.05  # seconds a stage must slow down by before it counts
+
+class PeakRSS:
+    """Peak resident memory (MB) while the block runs, sampled from /proc"""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak_mb = _rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        # No procfs: fall back to the process-lifetime peak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(fn, audio_seconds=None, repeat=1):
+    """Best wall time of repeat runs: ({wall_seconds, peak_rss_mb[, rtf]}, result)"""
+    wall, peak = float('inf'), 0.0
+    for _ in range(repeat):
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            result = fn()
+            wall = min(wall, time.perf_counter() - start)
+        peak = max(peak, rss.peak_mb)
+    record = {'wall_seconds': wall, 'peak_rss_mb': peak}
+    if audio_seconds:
+        record['rtf'] = audio_seconds / wall
+    return record, result
+
+def tempo_accuracy(estimated, true_bpm):
+    """Percent error of the BPM estimate, raw and allowing half/double time"""
+    error = abs(estimated - true_bpm) / true_bpm * 100
+    octave = min(abs(estimated * factor - true_bpm) / true_bpm * 100 for factor in (0.5, 1, 2))
+    return {'bpm': estimated, 'bpm_error_pct': error, 'bpm_octave_error_pct': octave}
+
+def beat_f_measure(estimated, reference, tolerance=BEAT_TOLERANCE):
+    """F-measure of estimated beat times against the reference, one match per beat"""
+    estimated = np.sort(np.asarray(estimated, dtype=float))
+    reference = np.asarray(reference, dtype=float)
+    if len(estimated) == 0 or len(reference) == 0:
+        return 0.0
+    used = np.zeros(len(estimated), dtype=bool)
+    hits = 0
+    for beat in reference:
+        i = int(np.searchsorted(estimated, beat))
+        for j in (i - 1, i):
+            if 0 <= j < len(estimated) and not used[j] and abs(estimated[j] - beat) <= tolerance:
+                used[j] = True
+                hits += 1
+                break
+    precision = hits / len(estimated)
+    recall = hits / len(reference)
+    return 0.0 if hits == 0 else 2 * precision * recall / (precision + recall)
+
+def make_fixtures(kinds, bpms, durations, folder):
+    """Write every fixture as a float WAV: {name: {path, bpm, duration, beat_times}}"""
+    fixtures = {}
+    for kind in kinds:
+        for bpm in bpms:
+            for duration in durations:
+                name = f'{kind}_{bpm:g}bpm_{duration:g}s'
+                audio, beat_times = FIXTURES[kind](bpm, duration, SAMPLE_RATE)
+                path = os.path.join(folder, f'{name}.wav')
+                sf.write(path, audio, SAMPLE_RATE, subtype='FLOAT')
+                fixtures[name] = {
+                    'path': path, 'kind': kind, 'bpm': bpm, 'duration': duration,
+                    'beat_times': beat_times
+                }
+    return fixtures
+
+def bench_dsp(name, fixture, repeat=1):
+    """Ingest, analysis, filtering and mix rendering outside the web tier"""
+    from utils.audio_decoder import decode_audio
+    from utils.audio_processor import AudioProcessor
+    from utils.track_pipeline import render_mix_file
+    from utils.track_store import TrackStore
+
+    processor = AudioProcessor(sample_rate=SAMPLE_RATE)
+    seconds = fixture['duration']
+    stages = {}
+
+    stages['ingest'], audio = measure(
+        lambda: decode_audio(fixture['path'], sample_rate=SAMPLE_RATE), seconds, repeat
+    )
+    stages['analyze'], analysis = measure(lambda: processor.analyze(audio), seconds, repeat)
+    stages['filter'], _ = measure(
+        lambda: processor.apply_filter(audio, 'lowpass', 800), seconds, repeat
+    )
+
+    # Mix the track with itself from a track store, as the mix routes do
+    folder = tempfile.mkdtemp(prefix='bench-tracks-')
+    try:
+        store = TrackStore(folder)
+        store.put('a', audio, SAMPLE_RATE)
+        store.put('b', audio, SAMPLE_RATE)
+        output = os.path.join(folder, 'mix.wav')
+        stages['mix'], _ = measure(
+            lambda: render_mix_file('a', 'b', folder, output, 8.0), 2 * seconds, repeat
+        )
+        stages['mix_effects'], _ = measure(
+            lambda: render_mix_file('a', 'b', folder, output, 8.0, effects={
+                'a': [{'type': 'eq', 'low': -12}],
+                'b': [{'type': 'filter', 'kind': 'highpass', 'cutoff': 200,
+                       'automation': {'cutoff': [[0, 200], [seconds, 20]]}}]
+            }), 2 * seconds, repeat
+        )
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    accuracy = tempo_accuracy(analysis['bpm'], fixture['bpm'])
+    accuracy['beat_f_measure'] = beat_f_measure(analysis['beat_times'], fixture['beat_times'])
+    return stages, accuracy
+
+def bench_endpoints(fixtures, workdir, repeat=1):
+    """Time the Flask endpoints through the test client with a stubbed loader"""
+    from utils.youtube_dl import YouTubeLoader
+
+    class FixtureLoader(YouTubeLoader):
+        """YouTubeLoader whose 'streams' are the fixture WAV files"""
+        def _resolve_stream(self, video_id):
+            return {'url': fixtures[video_id]['path'], 'headers': None, 'ext': 'wav'}
+
+        def get_audio_info(self, video_id):
+            fixture = fixtures[video_id]
+            return {'id': video_id, 'title': video_id, 'duration': fixture['duration']}
+
+    from config import Config
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+    from app import create_app
+    from utils.services import services
+    from utils.storage import storage_manager
+
+    app = create_app()
+    services.register('youtube_loader', lambda: FixtureLoader(
+        temp_folder=app.config['TEMP_AUDIO_FOLDER'], storage=storage_manager
+    ))
+    services.reset()
+    client = app.test_client()
+
+    def request(method, url, **kwargs):
+        response = getattr(client, method)(url, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {url} -> {response.status_code}: {response.data[:200]}")
+        return response
+
+    results = {}
+    for name, fixture in fixtures.items():
+        seconds = fixture['duration']
+        stages = {}
+        # Cold: downloads and analyzes, so it can only run once per fixture
+        stages['api_analyze'], _ = measure(
+            lambda: request('post', f'/api/audio/analyze/{name}'), seconds
+        )
+        stages['api_analyze_cached'], _ = measure(
+            lambda: request('post', f'/api/audio/analyze/{name}'), repeat=repeat
+        )
+        stages['api_waveform'], _ = measure(
+            lambda: request('get', f'/api/audio/waveform/{name}?zoom=1024'), repeat=repeat
+        )
+        stages['api_mix'], _ = measure(lambda: request('post', '/api/mix', json={
+            'video_id1': name, 'video_id2': name, 'crossfade_duration': 8.0
+        }), 2 * seconds, repeat)
+        stages['api_mix_stream'], _ = measure(lambda: request(
+            'get', f'/api/mix/stream?video_id1={name}&video_id2={name}&crossfade_duration=8'
+        ).data, 2 * seconds, repeat)
+        results[name] = stages
+
+    from utils.jobs import job_manager
+    job_manager.shutdown()
+    return results
+
+def compare(results, baseline, tolerance):
+    """Human-readable regressions of results against a baseline run"""
+    problems = []
+    for name, fixture in results['fixtures'].items():
+        before = baseline.get('fixtures', {}).get(name)
+        if not before:
+            continue
+        for stage, record in fixture['stages'].items():
+            old = before['stages'].get(stage)
+            # Ignore jitter on stages that only take milliseconds
+            if (old and record['wall_seconds'] > old['wall_seconds'] * (1 + tolerance)
+                    and record['wall_seconds'] - old['wall_seconds'] > MIN_REGRESSION):
+                problems.append(
+                    f"{name}/{stage}: {old['wall_seconds']:.3f}s -> {record['wall_seconds']:.3f}s "
+                    f"(+{(record['wall_seconds'] / old['wall_seconds'] - 1) * 100:.0f}%)"
+                )
+        accuracy, old = fixture['accuracy'], before['accuracy']
+        if accuracy['bpm_octave_error_pct'] > old['bpm_octave_error_pct'] + 1.0:
+            problems.append(
+                f"{name}: BPM error {old['bpm_octave_error_pct']:.2f}% -> "
+                f"{accuracy['bpm_octave_error_pct']:.2f}%"
+            )
+        if accuracy['beat_f_measure'] < old['beat_f_measure'] - 0.05:
+            problems.append(
+                f"{name}: beat F-measure {old['beat_f_measure']:.3f} -> {accuracy['beat_f_measure']:.3f}"
+            )
+    return problems
+
+def print_report(results):
+    for name, fixture in results['fixtures'].items():
+        accuracy = fixture['accuracy']
+        print(f"\n{name}: bpm={accuracy['bpm']:.2f} (error {accuracy['bpm_error_pct']:.2f}%, "
+              f"octave-folded {accuracy['bpm_octave_error_pct']:.2f}%) "
+              f"beat F={accuracy['beat_f_measure']:.3f}")
+        for stage, record in fixture['stages'].items():
+            rtf = f"{record['rtf']:8.1f}x" if 'rtf' in record else ' ' * 9
+            print(f"  {stage:<20} {record['wall_seconds']:8.3f}s {rtf}  {record['peak_rss_mb']:8.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', default='30,120,600', help='Fixture lengths in seconds')
+    parser.add_argument('--kinds', default='click,drums', help=f"Fixture kinds ({', '.join(FIXTURES)})")
+    parser.add_argument('--bpms', default='124', help='Fixture tempos')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage (best time is kept)')
+    parser.add_argument('--no-endpoints', action='store_true', help='Skip the Flask endpoint stages')
+    parser.add_argument('--output', help='Write results as JSON (use as a later --compare baseline)')
+    parser.add_argument('--compare', help='Baseline JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown per stage (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    durations = [float(d) for d in args.durations.split(',')]
+    bpms = [float(b) for b in args.bpms.split(',')]
+    kinds = args.kinds.split(',')
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    workdir = tempfile.mkdtemp(prefix='bench-suite-')
+    cwd = os.getcwd()
+    try:
+        fixtures = make_fixtures(kinds, bpms, durations, workdir)
+
+        # Warm up numba/librosa so JIT compilation is not timed
+        from utils.audio_processor import AudioProcessor
+        warmup, _ = FIXTURES['click'](120, 10, SAMPLE_RATE)
+        AudioProcessor(sample_rate=SAMPLE_RATE).analyze(warmup)
+
+        results = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+            'fixtures': {}
+        }
+        for name, fixture in fixtures.items():
+            print(f"benchmarking {name} ...", file=sys.stderr)
+            stages, accuracy = bench_dsp(name, fixture, args.repeat)
+            results['fixtures'][name] = {
+                'kind': fixture['kind'], 'bpm': fixture['bpm'], 'duration': fixture['duration'],
+                'stages': stages, 'accuracy': accuracy
+            }
+
+        if not args.no_endpoints:
+            print("benchmarking endpoints ...", file=sys.stderr)
+            for name, stages in bench_endpoints(fixtures, workdir, args.repeat).items():
+                results['fixtures'][name]['stages'].update(stages)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print(f"\n{len(problems)} regression(s) against {baseline_path}:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print(f"\nno regressions against {baseline_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+@click.command('analyze-crate')
+@click.argument('sources', nargs=-1)
+@click.option('--file', 'crate_file', type=click.Path(exists=True),
+              help='Text file with one video ID or local audio path per line.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: all cores).')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON.')
+@with_appcontext
+def analyze_crate_command(sources, crate_file, workers, as_json):
+    """Pre-analyze a crate of video IDs and/or local audio files.
+
+    Results are stored in the analysis cache as they finish; re-running
+    after an interruption only analyzes the tracks that are still missing.
+    """
+    from utils.services import services
+    from utils.batch_analyzer import BatchAnalyzer, check_items
+    
+    items = list(sources)
+    if crate_file:
+        with open(crate_file) as f:
+            items += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not items:
+        raise click.UsageError('No video IDs or files given')
+    try:
+        check_items(items)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    
+    analyzer = BatchAnalyzer(
+        services.audio_processor, services.analysis_cache, current_app.config['TEMP_AUDIO_FOLDER'],
+        allow_files=True
+    )
+    
+    def on_progress(done, total, item, error):
+        status = f'FAILED: {error}' if error else 'ok'
+        click.echo(f'[{done}/{total}] {item} {status}', err=True)
+    
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        report = analyzer.run(items, pool.submit, on_progress)
+    
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    
+    click.echo(f"tracks: {report['total']} total, {report['skipped']} already cached, "
+               f"{report['analyzed']} analyzed, {len(report['failed'])} failed")
+    click.echo(f"elapsed: {report['elapsed']:.1f}s ({report['tracks_per_minute']:.1f} tracks/minute)")
+    for stage, seconds in report['stage_mean_seconds'].items():
+        click.echo(f"  {stage:<8} {seconds:.3f}s per track")
+
+def register_commands(app):
+    app.cli.add_command(analyze_crate_command)
@@ -11,8 +11,42 @@ class Config:
     YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     TEMP_AUDIO_FOLDER = 'temp_audio'
+    MIX_FOLDER = os.path.join('static', 'mixes')
+    STORAGE_QUOTA_BYTES = int(os.environ.get('STORAGE_QUOTA_BYTES', 10 * 1024 ** 3))  # temp audio + mixes
     
     # Audio processing settings
-    SAMPLE_RATE = 44100
+    RENDER_SAMPLE_RATE = int(os.environ.get('RENDER_SAMPLE_RATE', 44100))  # decoding, mixing, playback
+    ANALYSIS_SAMPLE_RATE = int(os.environ.get('ANALYSIS_SAMPLE_RATE', 11025))  # tempo and beat tracking
+    SAMPLE_RATE = RENDER_SAMPLE_RATE
     BUFFER_SIZE = 2048
-    FADE_DURATION = 2.0  # seconds
\ No newline at end of file
+    FADE_DURATION = 2.0  # seconds
+    
+    # Analysis cache settings
+    ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', 2000))  # max cached tracks
+    
+    # Background job settings
+    JOB_DOWNLOAD_WORKERS = int(os.environ.get('JOB_DOWNLOAD_WORKERS', 4))  # I/O-bound threads
+    JOB_ANALYSIS_WORKERS = int(os.environ.get('JOB_ANALYSIS_WORKERS', 0)) or None  # processes, None = CPU count
+    JOB_TTL = 3600  # seconds to keep finished jobs
+    
+    # Multi-worker deployment: Socket.IO events between workers go through this
+    # queue (redis://..., amqp://...; local:// is an in-process stand-in for tests)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    
+    # Deck state (server-side; the session only holds a state ID)
+    # Shared in the database by default once workers share a message queue
+    DECK_STATE_BACKEND = os.environ.get('DECK_STATE_BACKEND') or ('sql' if SOCKETIO_MESSAGE_QUEUE else 'memory')
+    DECK_STATE_TTL = int(os.environ.get('DECK_STATE_TTL', 6 * 3600))  # seconds of inactivity
+    # Background job status and track references (which keep tracks from being
+    # evicted), shared in the database the same way
+    JOB_STATE_BACKEND = os.environ.get('JOB_STATE_BACKEND') or ('sql' if SOCKETIO_MESSAGE_QUEUE else 'memory')
+    TRACK_PIN_BACKEND = os.environ.get('TRACK_PIN_BACKEND') or ('sql' if SOCKETIO_MESSAGE_QUEUE else 'memory')
+    
+    # Real-time deck controls (Socket.IO)
+    SOCKET_TICK_HZ = int(os.environ.get('SOCKET_TICK_HZ', 30))  # coalesced control updates per second
+    
+    # Profiling: dump cProfile stats for sampled requests slower than this
+    # many seconds (0 disables profiling) into PROFILE_DIR
+    PROFILE_SLOW_REQUESTS = float(os.environ.get('PROFILE_SLOW_REQUESTS', 0))
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1))  # fraction of requests profiled
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
@@ -0,0 +1,7 @@
+from flask_socketio import SocketIO
+from flask_sqlalchemy import SQLAlchemy
+
+# Shared extension instances. Kept out of app.py so models and utils can
+# import them without re-importing app.py when it is run as __main__.
+db = SQLAlchemy()
+socketio = SocketIO()
@@ -0,0 +1,32 @@
+from extensions import db
+from datetime import datetime
+
+class TrackAnalysis(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False)
+    video_id = db.Column(db.String(64), index=True, nullable=False)
+    audio_hash = db.Column(db.String(64), index=True, nullable=False)
+    params_key = db.Column(db.String(64), index=True, nullable=False)
+    bpm = db.Column(db.Float, nullable=False)
+    duration = db.Column(db.Float)
+    sample_rate = db.Column(db.Integer)
+    beat_times = db.Column(db.LargeBinary)  # utils.beatgrid binary (older rows: float64 array bytes)
+    downbeats = db.Column(db.LargeBinary)  # utils.beatgrid binary (older rows: float64 array bytes)
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_accessed = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    waveform = db.relationship(
+        'TrackWaveform', uselist=False, cascade='all, delete-orphan', lazy='select'
+    )
+    
+    def __repr__(self):
+        return f'<TrackAnalysis {self.video_id} {self.bpm:.1f}>'
+
+
+class TrackWaveform(db.Model):
+    """Min/max/RMS peak tiers of an analyzed track (utils.waveform binary format)"""
+    id = db.Column(db.Integer, primary_key=True)
+    analysis_id = db.Column(
+        db.Integer, db.ForeignKey('track_analysis.id'), unique=True, nullable=False
+    )
+    data = db.Column(db.LargeBinary, nullable=False)
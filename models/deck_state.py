@@ -0,0 +1,18 @@
+from extensions import db
+from datetime import datetime
+
+class DeckState(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    state_id = db.Column(db.String(32), index=True, nullable=False)
+    deck_id = db.Column(db.String(32), nullable=False)
+    video_id = db.Column(db.String(64), nullable=False)
+    job_id = db.Column(db.String(32))  # set while the track is still loading
+    bpm = db.Column(db.Float)
+    duration = db.Column(db.Float)
+    beat_times = db.Column(db.LargeBinary)  # utils.beatgrid binary (older rows: float64 array bytes)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (db.UniqueConstraint('state_id', 'deck_id'),)
+    
+    def __repr__(self):
+        return f'<DeckState {self.state_id}/{self.deck_id} {self.video_id}>'
@@ -0,0 +1,16 @@
+from extensions import db
+
+class JobRecord(db.Model):
+    """Background job status shared by worker processes (utils.jobs, sql backend)"""
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(16), nullable=False)
+    stage = db.Column(db.String(32))
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    detail = db.Column(db.Text)  # JSON
+    created_at = db.Column(db.Float, nullable=False)  # epoch seconds, as Job
+    updated_at = db.Column(db.Float, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<JobRecord {self.id} {self.kind} {self.status}>'
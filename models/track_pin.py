@@ -0,0 +1,15 @@
+from extensions import db
+from datetime import datetime
+
+class TrackPin(db.Model):
+    """References one worker process holds on a stored track (utils.track_pins)"""
+    id = db.Column(db.Integer, primary_key=True)
+    track_id = db.Column(db.String(64), index=True, nullable=False)
+    owner = db.Column(db.String(128), index=True, nullable=False)  # host:pid
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('track_id', 'owner'),)
+    
+    def __repr__(self):
+        return f'<TrackPin {self.track_id} {self.owner} x{self.count}>'
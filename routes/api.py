@@ -1,12 +1,16 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
 import json
-from utils.youtube_dl import YouTubeLoader
-from utils.audio_processor import AudioProcessor
+from utils.audio_decoder import STREAM_FORMATS, encode_stream
+from utils.waveform import ZOOM_LEVELS, extract_tier, decode_peaks
+from utils.beatgrid import BeatGrid
+from utils.jobs import job_manager
+from utils.storage import storage_manager
+from utils.control_relay import control_relay
+from utils.services import services
+from config import Config
 import os
 
 api_bp = Blueprint('api', __name__)
-youtube_loader = YouTubeLoader()
-audio_processor = AudioProcessor()
 
 @api_bp.route('/search', methods=['GET'])
 def search_youtube():
@@ -16,101 +20,299 @@ def search_youtube():
     if not query:
         return jsonify({'error': 'No query provided'}), 400
     
-    results = youtube_loader.search_youtube(query, max_results=limit)
+    results = services.youtube_loader.search_youtube(query, max_results=limit)
     return jsonify({'results': results})
 
 @api_bp.route('/audio/info/<video_id>', methods=['GET'])
 def get_audio_info(video_id):
-    info = youtube_loader.get_audio_info(video_id)
+    info = services.youtube_loader.get_audio_info(video_id)
     if info:
         return jsonify(info)
     return jsonify({'error': 'Could not fetch audio info'}), 404
 
 @api_bp.route('/audio/analyze/<video_id>', methods=['POST'])
 def analyze_audio(video_id):
+    # ?async=1 queues the work and returns a job ID immediately
+    if request.args.get('async'):
+        job = job_manager.submit('analyze', _analyze_job, video_id)
+        return _job_accepted(job)
+    
     try:
-        # Download and analyze audio
-        audio_info = youtube_loader.download_audio(video_id)
-        if not audio_info:
-            return jsonify({'error': 'Failed to download audio'}), 500
-        
-        # Load and analyze
-        audio_data, sr = audio_processor.load_audio(audio_info['wav_path'])
-        
-        # Calculate BPM
-        bpm = audio_processor.calculate_bpm(audio_data)
-        
-        # Detect beats
-        beat_times, detected_tempo = audio_processor.detect_beat_positions(audio_data)
+        # Cached results skip the download; otherwise download and analyze
+        analysis, cached = services.track_pipeline.analyze(video_id)
+        return jsonify(_analysis_response(analysis, cached=cached))
         
-        # Cleanup
-        youtube_loader.cleanup(video_id)
-        
-        return jsonify({
-            'bpm': float(bpm),
-            'detected_tempo': float(detected_tempo),
-            'duration': audio_info['duration'],
-            'sample_rate': sr,
-            'beat_count': len(beat_times),
-            'first_beat': float(beat_times[0]) if len(beat_times) > 0 else 0
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _analyze_job(job, video_id):
+    progress, run_cpu = job_manager.callbacks(job)
+    analysis, cached = services.track_pipeline.analyze(
+        video_id, progress=progress, run_cpu=run_cpu, on_estimate=job_manager.estimates(job)
+    )
+    return _analysis_response(analysis, cached=cached)
+
+@api_bp.route('/audio/analyze_batch', methods=['POST'])
+def analyze_batch():
+    """Queue a crate of video IDs for parallel analysis; returns a job ID"""
+    from utils.batch_analyzer import check_items
+    
+    data = request.json or {}
+    video_ids = data.get('video_ids')
+    if not video_ids:
+        return jsonify({'error': 'No video IDs provided'}), 400
+    try:
+        check_items(video_ids)
+    except ValueError:
+        return jsonify({'error': 'video_ids must be a list of non-empty strings'}), 400
+    
+    job = job_manager.submit('analyze_batch', _analyze_batch_job, video_ids)
+    return _job_accepted(job)
+
+def _analyze_batch_job(job, video_ids):
+    def on_progress(done, total, item, error):
+        job_manager.update(job, 'analyzing', detail={'done': done, 'total': total, 'last': item})
+    
+    return services.batch_analyzer.run(
+        video_ids,
+        lambda fn, *args: job_manager.submit_cpu(job, fn, *args),
+        on_progress
+    )
+
+@api_bp.route('/audio/waveform/<video_id>', methods=['GET'])
+def get_waveform(video_id):
+    """
+    One zoom tier of a track's waveform overview (?zoom=256|1024|4096).
+    Binary by default: header, then int8 (min, max, rms) per pixel;
+    ?format=json returns the same values as lists.
+    """
+    zoom = request.args.get('zoom', 1024, type=int)
+    if zoom not in ZOOM_LEVELS:
+        return jsonify({'error': f'zoom must be one of {list(ZOOM_LEVELS)}'}), 400
+    
+    try:
+        data = extract_tier(services.track_pipeline.waveform(video_id), zoom)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if request.args.get('format') == 'json':
+        sample_rate, frames, tiers = decode_peaks(data)
+        peaks = tiers[zoom]
+        response = jsonify({
+            'sample_rate': sample_rate,
+            'frames': frames,
+            'samples_per_pixel': zoom,
+            'min': peaks[:, 0].tolist(),
+            'max': peaks[:, 1].tolist(),
+            'rms': peaks[:, 2].tolist()
         })
-        
+    else:
+        response = Response(data, mimetype='application/octet-stream')
+    
+    # Peaks only change if the track does
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+@api_bp.route('/audio/beatgrid/<video_id>', methods=['GET'])
+def get_beatgrid(video_id):
+    """
+    A track's beats as a compact beatgrid: tempo segments plus per-beat
+    residuals (see utils.beatgrid). Binary by default; ?format=json
+    returns the same fields, and ?format=times the expanded beat times.
+    """
+    try:
+        data = services.track_pipeline.beatgrid(video_id)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    fmt = request.args.get('format')
+    if fmt == 'json':
+        return jsonify(BeatGrid.from_bytes(data).to_dict())
+    if fmt == 'times':
+        return jsonify({'beat_times': BeatGrid.from_bytes(data).times().tolist()})
+    return Response(data, mimetype='application/octet-stream')
+
+def _analysis_response(analysis, cached=False):
+    beat_times = analysis['beat_times']
+    downbeats = analysis.get('downbeats', [])
+    phrases = analysis.get('phrases') or {}
+    return {
+        'bpm': float(analysis['bpm']),
+        'detected_tempo': float(analysis['bpm']),
+        'duration': analysis['duration'],
+        'sample_rate': analysis['sample_rate'],
+        'beat_count': len(beat_times),
+        'first_beat': float(beat_times[0]) if len(beat_times) > 0 else 0,
+        'first_downbeat': float(downbeats[0]) if len(downbeats) > 0 else 0,
+        'phrases': {str(bars): [float(t) for t in times] for bars, times in phrases.items()},
+        'cached': cached
+    }
 
 @api_bp.route('/mix', methods=['POST'])
 def mix_audio():
+    from utils.effects import check_effects
+    
     data = request.json
     video_id1 = data.get('video_id1')
     video_id2 = data.get('video_id2')
     crossfade_duration = data.get('crossfade_duration', 2.0)
-    
+    effects = data.get('effects')  # {'a': [effect specs], 'b': [...]}
+    tempo_sync = bool(data.get('tempo_sync'))  # stretch track 2 to track 1's BPM
+    align_phrases = bool(data.get('align_phrases'))  # fade on a phrase boundary of track 1
     try:
-        # Download both tracks
-        audio1_info = youtube_loader.download_audio(video_id1)
-        audio2_info = youtube_loader.download_audio(video_id2)
-        
-        # Load audio
-        audio1, sr1 = audio_processor.load_audio(audio1_info['wav_path'])
-        audio2, sr2 = audio_processor.load_audio(audio2_info['wav_path'])
-        
-        # Ensure same sample rate
-        if sr1 != sr2:
-            # Resample if needed (simplified)
-            audio2 = audio_processor.time_stretch(audio2, sr2/sr1)
-        
-        # Create crossfade
-        mixed = audio_processor.create_crossfade(
-            audio1, 
-            audio2, 
-            duration=crossfade_duration
+        check_effects(effects)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid effects: {e}'}), 400
+    output_path = os.path.join(
+        current_app.config['TEMP_AUDIO_FOLDER'],
+        f'mixed_{video_id1}_{video_id2}.wav'
+    )
+    
+    if request.args.get('async'):
+        job = job_manager.submit(
+            'mix', _mix_job, video_id1, video_id2, crossfade_duration, output_path, effects,
+            tempo_sync, align_phrases
         )
+        return _job_accepted(job)
+    
+    try:
+        return jsonify(_mix_job(
+            None, video_id1, video_id2, crossfade_duration, output_path, effects, tempo_sync,
+            align_phrases
+        ))
         
-        # Save mixed audio
-        output_path = os.path.join(
-            current_app.config['TEMP_AUDIO_FOLDER'],
-            f'mixed_{video_id1}_{video_id2}.wav'
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _mix_job(job, video_id1, video_id2, crossfade_duration, output_path, effects=None,
+             tempo_sync=False, align_phrases=False):
+    progress, run_cpu = job_manager.callbacks(job)
+    
+    # Decoded tracks are reused from the track store; crossfade and save
+    duration = services.track_pipeline.render_mix(
+        video_id1, video_id2, output_path, crossfade_duration,
+        progress=progress, run_cpu=run_cpu, effects=effects, tempo_sync=tempo_sync,
+        align_phrases=align_phrases
+    )
+    storage_manager.register(output_path, 'mix')
+    
+    # Return download URL
+    return {
+        'mixed_url': f'/api/download/{os.path.basename(output_path)}',
+        'duration': duration
+    }
+
+@api_bp.route('/mix/stream', methods=['GET'])
+def stream_mix():
+    """Render a mix on the fly as chunked WAV (with Range support) or compressed audio"""
+    from utils.mix_renderer import MixRenderer, wav_stream
+    from utils.effects import check_effects, deck_chains
+    from utils.track_pipeline import open_mix_sources, cue_samples
+    
+    video_id1 = request.args.get('video_id1')
+    video_id2 = request.args.get('video_id2')
+    crossfade_duration = float(request.args.get('crossfade_duration', 2.0))
+    fmt = request.args.get('format', 'wav')
+    
+    if not video_id1 or not video_id2:
+        return jsonify({'error': 'Both video IDs are required'}), 400
+    if fmt != 'wav' and fmt not in STREAM_FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    
+    # Optional per-deck effects as JSON: ?effects={"a": [...], "b": [...]}
+    try:
+        effects = json.loads(request.args.get('effects') or '{}')
+        check_effects(effects)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid effects: {e}'}), 400
+    
+    # Hold both tracks until the response is closed
+    services.track_store.acquire(video_id1)
+    services.track_store.acquire(video_id2)
+    try:
+        services.track_pipeline.ensure_track(video_id1)
+        services.track_pipeline.ensure_track(video_id2)
+        stretch = 1.0
+        if request.args.get('tempo_sync'):
+            stretch = services.track_pipeline.tempo_ratio(video_id1, video_id2)
+        cues = None
+        if request.args.get('align_phrases'):
+            cues = services.track_pipeline.mix_cues(video_id1, video_id2, crossfade_duration, stretch)
+        audio1, audio2, sr = open_mix_sources(
+            services.track_store, video_id1, video_id2, stretch=stretch
         )
-        audio_processor.save_to_wav(mixed, output_path)
-        
-        # Return download URL
-        return jsonify({
-            'mixed_url': f'/api/download/{os.path.basename(output_path)}',
-            'duration': len(mixed) / sr1
-        })
-        
     except Exception as e:
+        _release_tracks(video_id1, video_id2)
         return jsonify({'error': str(e)}), 500
     
-    finally:
-        # Cleanup
-        youtube_loader.cleanup(video_id1)
-        youtube_loader.cleanup(video_id2)
+    renderer = MixRenderer(sample_rate=sr, block_size=Config.BUFFER_SIZE)
+    effects1, effects2 = deck_chains(effects, sr)
+    cue1, cue2 = cue_samples(cues, sr)
+    
+    if fmt != 'wav':
+        blocks = renderer.render(audio1, audio2, crossfade_duration,
+                                 effects1=effects1, effects2=effects2, cue1=cue1, cue2=cue2)
+        response = Response(encode_stream(blocks, sr, fmt), mimetype=STREAM_FORMATS[fmt][2])
+        response.call_on_close(lambda: _release_tracks(video_id1, video_id2))
+        return response
+    
+    # WAV length is known up front, so byte ranges map directly to frames
+    num_frames = renderer.layout(len(audio1), len(audio2), crossfade_duration, cue1, cue2)[2]
+    total_bytes = 44 + num_frames * 4
+    byte_range = None
+    if request.range:
+        byte_range = request.range.range_for_length(total_bytes)
+        if byte_range is None:
+            _release_tracks(video_id1, video_id2)
+            return Response(status=416, headers={'Content-Range': f'bytes */{total_bytes}'})
+    
+    body = wav_stream(
+        lambda frame: renderer.render(audio1, audio2, crossfade_duration, start_frame=frame,
+                                      effects1=effects1, effects2=effects2, cue1=cue1, cue2=cue2),
+        num_frames, sr, byte_range
+    )
+    start, stop = byte_range or (0, total_bytes)
+    response = Response(body, status=206 if byte_range else 200, mimetype='audio/wav')
+    response.call_on_close(lambda: _release_tracks(video_id1, video_id2))
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Length'] = str(stop - start)
+    if byte_range:
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{total_bytes}'
+    return response
+
+def _release_tracks(*video_ids):
+    for video_id in video_ids:
+        services.track_store.release(video_id)
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job:
+        return jsonify(job.to_dict())
+    return jsonify({'error': 'Job not found'}), 404
+
+def _job_accepted(job):
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
+
+@api_bp.route('/storage', methods=['GET'])
+def storage_stats():
+    """Disk usage of temp audio, decoded tracks and mixes"""
+    return jsonify(storage_manager.stats())
+
+@api_bp.route('/rooms', methods=['GET'])
+def room_stats():
+    """Per-room Socket.IO clients and deck-control event rates"""
+    return jsonify(control_relay.stats())
 
 @api_bp.route('/download/<filename>', methods=['GET'])
 def download_audio(filename):
     filepath = os.path.join(current_app.config['TEMP_AUDIO_FOLDER'], filename)
-    if os.path.exists(filepath):
+    if storage_manager.touch(filepath):
         from flask import send_file
-        return send_file(filepath, as_attachment=True)
+        # conditional=True answers Range requests so players can seek
+        return send_file(os.path.abspath(filepath), as_attachment=True, conditional=True)
     return jsonify({'error': 'File not found'}), 404
\ No newline at end of file
@@ -1,17 +1,30 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from functools import wraps
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models.user import User
 import hashlib
 
 auth_bp = Blueprint('auth', __name__)
 
-# Simple in-memory user storage (use database in production)
-users = {
-    'admin': {
-        'password': '5e884898da28047151d0e56f8dc6292773603d0d6aabbdd62a11ef721d1542d8',  # 'password' hashed
-        'name': 'Administrator'
-    }
+# Users live in the database so every worker process sees the same accounts
+DEFAULT_USER = {
+    'username': 'admin',
+    'password_hash': '5e884898da28047151d0e56f8dc6292773603d0d6aabbdd62a11ef721d1542d8',  # 'password' hashed
+    'name': 'Administrator'
 }
 
+def seed_default_user():
+    """Create the default admin account on an empty user table"""
+    if User.query.first() is not None:
+        return
+    db.session.add(User(**DEFAULT_USER))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker seeded it first
+        db.session.rollback()
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -34,13 +47,14 @@ def login():
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         
         # Check credentials
-        if username in users and users[username]['password'] == password_hash:
+        user = User.query.filter_by(username=username).first()
+        if user and user.password_hash == password_hash:
             session['user_id'] = username
-            session['user_name'] = users[username]['name']
+            session['user_name'] = user.name
             return jsonify({
                 'success': True,
                 'username': username,
-                'name': users[username]['name']
+                'name': user.name
             })
         
         return jsonify({'error': 'Invalid credentials'}), 401
@@ -64,17 +78,24 @@ def register():
         if not username or not password:
             return jsonify({'error': 'Username and password required'}), 400
         
-        if username in users:
+        if User.query.filter_by(username=username).first():
             return jsonify({'error': 'Username already exists'}), 400
         
         # Hash password
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         
-        # Store user (in production, use database)
-        users[username] = {
-            'password': password_hash,
-            'name': name
-        }
+        db.session.add(User(
+            username=username,
+            password_hash=password_hash,
+            name=name,
+            email=data.get('email')
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Registered concurrently (possibly on another worker)
+            db.session.rollback()
+            return jsonify({'error': 'Username already exists'}), 400
         
         return jsonify({
             'success': True,
@@ -92,4 +113,4 @@ def check_auth():
             'username': session['user_id'],
             'name': session.get('user_name')
         })
-    return jsonify({'authenticated': False})
\ No newline at end of file
+    return jsonify({'authenticated': False})
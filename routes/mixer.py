@@ -1,12 +1,13 @@
-from flask import Blueprint, render_template, jsonify, request, session
-from flask_socketio import emit
-from utils.youtube_dl import YouTubeLoader
-from utils.audio_processor import AudioProcessor
-import json
+from flask import Blueprint, jsonify, request, session, redirect, url_for
+from utils.deck_store import new_state_id
+from utils.jobs import job_manager
+from utils.storage import storage_manager
+from utils.services import services
+from config import Config
+from datetime import datetime
+import os
 
 mixer_bp = Blueprint('mixer', __name__)
-youtube_loader = YouTubeLoader()
-audio_processor = AudioProcessor()
 
 @mixer_bp.route('/load_track', methods=['POST'])
 def load_track():
@@ -16,44 +17,76 @@ def load_track():
         deck_id = data.get('deck_id')
         video_id = data.get('video_id')
         
-        # Download and analyze track
-        track_info = youtube_loader.download_audio(video_id)
-        if not track_info:
-            return jsonify({'error': 'Failed to download audio'}), 500
-        
-        # Analyze BPM and beats
-        audio_data, sr = audio_processor.load_audio(track_info['wav_path'])
-        bpm = audio_processor.calculate_bpm(audio_data)
-        beat_times, detected_tempo = audio_processor.detect_beat_positions(audio_data)
-        
-        # Store in session
-        if 'tracks' not in session:
-            session['tracks'] = {}
-        
-        session['tracks'][deck_id] = {
-            'video_id': video_id,
-            'bpm': bpm,
-            'duration': track_info['duration'],
-            'wav_path': track_info['wav_path'],
-            'beat_times': beat_times.tolist() if hasattr(beat_times, 'tolist') else beat_times
-        }
-        session.modified = True
+        # ?async=1 queues the download/analysis; the deck resolves it later
+        if request.args.get('async'):
+            state_id = _deck_state_id()  # also the room that receives job progress
+            job = job_manager.submit('load_track', _load_track_job, video_id)
+            services.deck_store.put(state_id, deck_id, {'video_id': video_id, 'job_id': job.id})
+            return jsonify({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/api/jobs/{job.id}',
+                'deck_id': deck_id
+            }), 202
+        
+        track = _load_track_job(None, video_id)
+        
+        # Store server-side; the session only carries the deck state ID
+        services.deck_store.put(_deck_state_id(), deck_id, track)
         
         return jsonify({
             'success': True,
-            'bpm': float(bpm),
-            'duration': track_info['duration'],
+            'bpm': float(track['bpm']),
+            'duration': track['duration'],
             'deck_id': deck_id
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _load_track_job(job, video_id):
+    """Analyze a track (cached loads skip the download) and build its deck state"""
+    progress, run_cpu = job_manager.callbacks(job)
+    
+    analysis, cached = services.track_pipeline.analyze(
+        video_id, progress=progress, run_cpu=run_cpu, keep_audio=True,
+        on_estimate=job_manager.estimates(job)
+    )
+    beat_times = analysis['beat_times']
+    return {
+        'video_id': video_id,
+        'bpm': float(analysis['bpm']),
+        'duration': analysis['duration'],
+        'beat_times': beat_times.tolist() if hasattr(beat_times, 'tolist') else beat_times
+    }
+
+def _deck_state_id():
+    """This session's deck state ID, created on first use"""
+    if 'deck_state_id' not in session:
+        session['deck_state_id'] = new_state_id()
+    return session['deck_state_id']
+
+def _get_track(deck_id):
+    """Deck state from the deck store, resolving finished background loads"""
+    state_id = session.get('deck_state_id')
+    track = services.deck_store.get(state_id, deck_id) if state_id else None
+    if not track or 'job_id' not in track:
+        return track
+    
+    job = job_manager.get(track['job_id'])
+    if not job or job.status == 'failed':
+        raise RuntimeError(f"Loading track on deck {deck_id} failed")
+    if not job.finished:
+        return None
+    
+    services.deck_store.put(state_id, deck_id, job.result)
+    return services.deck_store.get(state_id, deck_id)
+
 @mixer_bp.route('/get_track_info/<video_id>', methods=['GET'])
 def get_track_info(video_id):
     """Get track information without downloading"""
     try:
-        info = youtube_loader.get_audio_info(video_id)
+        info = services.youtube_loader.get_audio_info(video_id)
         if info:
             return jsonify(info)
         return jsonify({'error': 'Track not found'}), 404
@@ -68,9 +101,9 @@ def sync_beats():
         deck_a_id = data.get('deck_a')
         deck_b_id = data.get('deck_b')
         
-        # Get track information from session
-        track_a = session.get('tracks', {}).get(deck_a_id)
-        track_b = session.get('tracks', {}).get(deck_b_id)
+        # Get track information from the deck store
+        track_a = _get_track(deck_a_id)
+        track_b = _get_track(deck_b_id)
         
         if not track_a or not track_b:
             return jsonify({'error': 'Both tracks must be loaded'}), 400
@@ -78,9 +111,16 @@ def sync_beats():
         # Calculate BPM ratio for synchronization
         bpm_ratio = track_a['bpm'] / track_b['bpm']
         
+        # Phase offset of deck B's beats once it plays at bpm_ratio
+        phase_offset, offset_samples = services.beat_detector.align_beats(
+            track_a['beat_times'], track_b['beat_times'], bpm_ratio=bpm_ratio
+        )
+        
         return jsonify({
             'success': True,
             'bpm_ratio': float(bpm_ratio),
+            'phase_offset': phase_offset,
+            'offset_samples': offset_samples,
             'deck_a_bpm': float(track_a['bpm']),
             'deck_b_bpm': float(track_b['bpm']),
             'pitch_adjustment': float((bpm_ratio - 1) * 100)
@@ -92,72 +132,105 @@ def sync_beats():
 @mixer_bp.route('/save_mix', methods=['POST'])
 def save_mix():
     """Save the current mix as a file"""
+    from utils.effects import check_effects
+    
     try:
         data = request.json
         deck_a_id = data.get('deck_a')
         deck_b_id = data.get('deck_b')
         crossfade_duration = data.get('crossfade_duration', 2.0)
+        effects = data.get('effects')  # {'a': [effect specs], 'b': [...]}
+        tempo_sync = bool(data.get('tempo_sync'))  # stretch deck B to deck A's BPM
+        align_phrases = bool(data.get('align_phrases'))  # fade on a phrase boundary of deck A
+        try:
+            check_effects(effects)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid effects: {e}'}), 400
         
         # Load audio files
-        track_a = session.get('tracks', {}).get(deck_a_id)
-        track_b = session.get('tracks', {}).get(deck_b_id)
+        track_a = _get_track(deck_a_id)
+        track_b = _get_track(deck_b_id)
         
         if not track_a or not track_b:
             return jsonify({'error': 'Both tracks must be loaded'}), 400
         
-        # Load audio data
-        audio1, sr1 = audio_processor.load_audio(track_a['wav_path'])
-        audio2, sr2 = audio_processor.load_audio(track_b['wav_path'])
-        
-        # Ensure same sample rate
-        if sr1 != sr2:
-            # Resample audio2 to match audio1
-            import librosa
-            audio2 = librosa.resample(audio2, orig_sr=sr2, target_sr=sr1)
-        
-        # Apply crossfade
-        mixed_audio = audio_processor.create_crossfade(
-            audio1, audio2, duration=crossfade_duration
-        )
-        
-        # Save mixed audio
-        import os
-        from datetime import datetime
         output_filename = f"mix_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-        output_path = os.path.join('static', 'mixes', output_filename)
-        
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        audio_processor.save_to_wav(mixed_audio, output_path)
-        
-        return jsonify({
-            'success': True,
-            'mix_url': f'/static/mixes/{output_filename}',
-            'duration': len(mixed_audio) / sr1
-        })
+        output_path = os.path.join(Config.MIX_FOLDER, output_filename)
+        
+        if request.args.get('async'):
+            job = job_manager.submit(
+                'save_mix', _save_mix_job, track_a, track_b, crossfade_duration, output_path,
+                effects, tempo_sync, align_phrases
+            )
+            return jsonify({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/api/jobs/{job.id}'
+            }), 202
+        
+        return jsonify(_save_mix_job(
+            None, track_a, track_b, crossfade_duration, output_path, effects, tempo_sync,
+            align_phrases
+        ))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@mixer_bp.route('/stream_mix', methods=['GET'])
+def stream_mix():
+    """Stream a mix of the two loaded decks while it renders"""
+    try:
+        track_a = _get_track(request.args.get('deck_a'))
+        track_b = _get_track(request.args.get('deck_b'))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if not track_a or not track_b:
+        return jsonify({'error': 'Both tracks must be loaded'}), 400
+    
+    return redirect(url_for(
+        'api.stream_mix',
+        video_id1=track_a['video_id'],
+        video_id2=track_b['video_id'],
+        crossfade_duration=request.args.get('crossfade_duration', 2.0),
+        format=request.args.get('format', 'wav'),
+        effects=request.args.get('effects'),
+        tempo_sync=request.args.get('tempo_sync'),
+        align_phrases=request.args.get('align_phrases')
+    ))
+
+def _save_mix_job(job, track_a, track_b, crossfade_duration, output_path, effects=None,
+                  tempo_sync=False, align_phrases=False):
+    progress, run_cpu = job_manager.callbacks(job)
+    
+    # Apply crossfade over memory-mapped tracks (cached loads are fetched here)
+    duration = services.track_pipeline.render_mix(
+        track_a['video_id'], track_b['video_id'], output_path, crossfade_duration,
+        progress=progress, run_cpu=run_cpu, effects=effects, tempo_sync=tempo_sync,
+        align_phrases=align_phrases
+    )
+    storage_manager.register(output_path, 'mix')
+    
+    return {
+        'success': True,
+        'mix_url': f'/static/mixes/{os.path.basename(output_path)}',
+        'duration': duration
+    }
+
 @mixer_bp.route('/get_mixes', methods=['GET'])
 def get_mixes():
     """Get list of saved mixes"""
-    import os
-    mixes_dir = os.path.join('static', 'mixes')
-    if not os.path.exists(mixes_dir):
-        return jsonify({'mixes': []})
+    mixes_dir = os.path.abspath(Config.MIX_FOLDER)
     
     mixes = []
-    for filename in os.listdir(mixes_dir):
-        if filename.endswith('.wav'):
-            filepath = os.path.join(mixes_dir, filename)
-            stat = os.stat(filepath)
+    for artifact in storage_manager.artifacts('mix'):
+        filename = os.path.basename(artifact['path'])
+        if os.path.dirname(artifact['path']) == mixes_dir and filename.endswith('.wav'):
             mixes.append({
                 'filename': filename,
                 'url': f'/static/mixes/{filename}',
-                'size': stat.st_size,
-                'created': stat.st_ctime
+                'size': artifact['size'],
+                'created': os.path.getctime(artifact['path'])
             })
     
     return jsonify({'mixes': sorted(mixes, key=lambda x: x['created'], reverse=True)})
@@ -165,9 +238,7 @@ def get_mixes():
 @mixer_bp.route('/delete_mix/<filename>', methods=['DELETE'])
 def delete_mix(filename):
     """Delete a saved mix"""
-    import os
-    filepath = os.path.join('static', 'mixes', filename)
-    if os.path.exists(filepath):
-        os.remove(filepath)
+    filepath = os.path.join(Config.MIX_FOLDER, filename)
+    if storage_manager.remove(filepath):
         return jsonify({'success': True})
     return jsonify({'error': 'File not found'}), 404
\ No newline at end of file
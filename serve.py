@@ -0,0 +1,110 @@
+"""
+Run the mixer as several eventlet worker processes.
+
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 \
+    DATABASE_URL=postgresql://... \
+    python serve.py --workers 4 --port 5000 --nginx
+
+Worker i listens on port + i. Socket.IO keeps per-connection state in
+the worker that accepted it, so the load balancer in front must be
+sticky (every request of a client, including long-polling and the
+websocket upgrade, goes to the same worker); --nginx prints an upstream
+block using ip_hash. Workers exchange Socket.IO events through
+SOCKETIO_MESSAGE_QUEUE and share users, analyses, deck state, job
+status and track references through DATABASE_URL.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from config import Config
+
+NGINX_TEMPLATE = """upstream dj_mixer {{
+    ip_hash;
+{servers}
+}}
+
+server {{
+    listen 80;
+    location / {{
+        proxy_pass http://dj_mixer;
+        proxy_http_version 1.1;
+        proxy_set_header Host $host;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection "upgrade";
+    }}
+}}"""
+
+def nginx_config(host, port, workers):
+    """Sticky nginx upstream for workers on port .. port + workers - 1"""
+    servers = '\n'.join(f'    server {host}:{port + i};' for i in range(workers))
+    return NGINX_TEMPLATE.format(servers=servers)
+
+def check_shared_state(workers):
+    """Errors that would make state diverge between workers"""
+    if workers < 2:
+        return []
+    errors = []
+    if not Config.SOCKETIO_MESSAGE_QUEUE:
+        errors.append('SOCKETIO_MESSAGE_QUEUE must be set so workers share Socket.IO events')
+    if Config.DECK_STATE_BACKEND != 'sql':
+        errors.append('DECK_STATE_BACKEND must be "sql" so workers share deck state')
+    if Config.JOB_STATE_BACKEND != 'sql':
+        errors.append('JOB_STATE_BACKEND must be "sql" so workers share background job status')
+    if Config.TRACK_PIN_BACKEND != 'sql':
+        errors.append('TRACK_PIN_BACKEND must be "sql" so no worker evicts a track another one uses')
+    if Config.SOCKETIO_MESSAGE_QUEUE and Config.SOCKETIO_MESSAGE_QUEUE.startswith('local://'):
+        errors.append('local:// only connects servers inside one process')
+    return errors
+
+def run_worker(host, port):
+    from app import create_app
+    from extensions import socketio
+
+    app = create_app()
+    socketio.run(app, host=host, port=port)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run DJ mixer worker processes')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 1)))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--nginx', action='store_true', help='print a sticky nginx config and exit')
+    args = parser.parse_args(argv)
+
+    if args.nginx:
+        print(nginx_config('127.0.0.1', args.port, args.workers))
+        return 0
+
+    errors = check_shared_state(args.workers)
+    if errors:
+        for error in errors:
+            print(f"Error: {error}", file=sys.stderr)
+        return 1
+
+    if args.workers == 1:
+        run_worker(args.host, args.port)
+        return 0
+
+    procs = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--workers', '1',
+                          '--host', args.host, '--port', str(args.port + i)])
+        for i in range(args.workers)
+    ]
+    print(f"Started {args.workers} workers on ports {args.port}-{args.port + args.workers - 1}")
+    try:
+        while all(proc.poll() is None for proc in procs):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in procs:
+            proc.wait()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
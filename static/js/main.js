@@ -261,10 +261,12 @@ function adjustPitch(deckId, percent) {
     djState.updateDeck(deckId, { pitch: parseInt(percent) });
 }
 
-function updateCrossfader(position) {
+function updateCrossfader(position, fromRemote = false) {
     audioEngine.setCrossfader(position);
     djState.mixer.crossfader = parseInt(position);
-    socket.emit('crossfader_change', { position: position });
+    if (!fromRemote) {
+        socket.emit('crossfader_change', { position: position });
+    }
     updateDisplay();
 }
 
@@ -381,13 +383,22 @@ function updateStatus(message, type = 'info') {
 
 // Socket Event Handlers
 function handleDeckUpdate(data) {
-    // Update state from other clients
-    console.log('Deck update received:', data);
+    // Updates from other clients only carry the fields that changed
+    for (const deckId of Object.keys(data.decks || {})) {
+        Object.assign(djState.decks[deckId], data.decks[deckId]);
+    }
+    if (data.mixer) {
+        const { effects, ...mixer } = data.mixer;
+        Object.assign(djState.mixer, mixer);
+        Object.assign(djState.mixer.effects, effects || {});
+    }
+    djState.updateDisplay();
 }
 
 function handleCrossfaderUpdate(data) {
     document.getElementById('crossfader').value = data.position;
-    updateCrossfader(data.position);
+    // Don't echo remote changes back to the room
+    updateCrossfader(data.position, true);
 }
 
 function handleSyncUpdate(data) {
@@ -0,0 +1,162 @@
+import hashlib
+import json
+from datetime import datetime
+import numpy as np
+from extensions import db
+from models.analysis import TrackAnalysis, TrackWaveform
+from utils.metrics import cache_result
+from utils.beatgrid import MAGIC as BEATGRID_MAGIC, BeatGrid, decode_beats, encode_beats
+
+# The downbeats beatgrid counts 32-bar phrases as its "bars", so the
+# phrase phase rides in its header's first downbeat field
+PHRASE_BARS = (8, 16, 32)
+
+def hash_audio(audio_data):
+    """Content hash of decoded audio samples"""
+    samples = np.ascontiguousarray(audio_data, dtype=np.float32)
+    return hashlib.blake2b(memoryview(samples).cast('B'), digest_size=16).hexdigest()
+
+def params_key(params):
+    """Stable hash of the analysis parameters"""
+    encoded = json.dumps(params, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+class AnalysisCache:
+    """
+    Persistent cache of BPM/beat analysis results.
+    Entries are keyed by video ID, audio content hash and analysis
+    parameters, and evicted least-recently-used once max_entries is reached.
+    Must be used inside an application context.
+    """
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+
+    def get(self, video_id, params):
+        """Look up a cached analysis by video ID (no download needed)"""
+        entry = TrackAnalysis.query.filter_by(
+            video_id=video_id,
+            params_key=params_key(params)
+        ).order_by(TrackAnalysis.last_accessed.desc()).first()
+        return cache_result('analysis', self._touch(entry))
+
+    def get_by_hash(self, audio_hash, params):
+        """Look up a cached analysis by decoded audio content"""
+        entry = TrackAnalysis.query.filter_by(
+            audio_hash=audio_hash,
+            params_key=params_key(params)
+        ).order_by(TrackAnalysis.last_accessed.desc()).first()
+        return cache_result('analysis_hash', self._touch(entry))
+
+    def get_waveform(self, video_id, params):
+        """Encoded waveform peaks cached with a video's analysis, or None"""
+        entry = self._latest(video_id, params)
+        if entry is None or entry.waveform is None:
+            return cache_result('waveform', None)
+        return cache_result('waveform', entry.waveform.data)
+
+    def get_beatgrid(self, video_id, params):
+        """Binary beatgrid (utils.beatgrid format) of a video's cached analysis, or None"""
+        entry = self._latest(video_id, params)
+        if entry is None or not entry.beat_times:
+            return cache_result('beatgrid', None)
+        if not entry.beat_times.startswith(BEATGRID_MAGIC):
+            # Stored before beatgrids: re-encode the raw float64 array
+            return cache_result('beatgrid', encode_beats(
+                decode_beats(entry.beat_times), entry.sample_rate or 44100, decode_beats(entry.downbeats)
+            ))
+        return cache_result('beatgrid', entry.beat_times)
+
+    def put_waveform(self, video_id, params, waveform):
+        """Attach waveform peaks to an analysis cached without them"""
+        entry = self._latest(video_id, params)
+        if entry is None:
+            return False
+        self._set_waveform(entry, waveform)
+        db.session.commit()
+        return True
+
+    def put(self, video_id, audio_hash, params, analysis):
+        """Store an analysis result and evict old entries"""
+        key = params_key(params)
+        cache_key = hashlib.blake2b(
+            f'{video_id}:{audio_hash}:{key}'.encode(), digest_size=32
+        ).hexdigest()
+
+        entry = TrackAnalysis.query.filter_by(cache_key=cache_key).first()
+        if entry is None:
+            entry = TrackAnalysis(
+                cache_key=cache_key,
+                video_id=video_id,
+                audio_hash=audio_hash,
+                params_key=key
+            )
+            db.session.add(entry)
+
+        entry.bpm = float(analysis['bpm'])
+        entry.duration = analysis.get('duration')
+        entry.sample_rate = analysis.get('sample_rate')
+        # Beatgrids: a few percent of the raw float64 arrays' size, exact to the sample
+        sample_rate = analysis.get('sample_rate') or 44100
+        downbeats = analysis.get('downbeats', [])
+        entry.beat_times = encode_beats(analysis['beat_times'], sample_rate, downbeats)
+        entry.downbeats = encode_beats(downbeats, sample_rate, beats_per_bar=PHRASE_BARS[-1],
+                                       first_downbeat=analysis.get('phrase_offset', 0))
+        if analysis.get('waveform') is not None:
+            self._set_waveform(entry, analysis['waveform'])
+        entry.last_accessed = datetime.utcnow()
+        db.session.commit()
+
+        self._evict()
+
+    def _latest(self, video_id, params):
+        return TrackAnalysis.query.filter_by(
+            video_id=video_id,
+            params_key=params_key(params)
+        ).order_by(TrackAnalysis.last_accessed.desc()).first()
+
+    def _set_waveform(self, entry, waveform):
+        if entry.waveform is None:
+            entry.waveform = TrackWaveform(data=waveform)
+        else:
+            entry.waveform.data = waveform
+
+    def _touch(self, entry):
+        """Mark an entry as recently used and return it as a dict"""
+        if entry is None:
+            return None
+        entry.hits = (entry.hits or 0) + 1
+        entry.last_accessed = datetime.utcnow()
+        db.session.commit()
+        return self._to_dict(entry)
+
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries"""
+        excess = TrackAnalysis.query.count() - self.max_entries
+        if excess <= 0:
+            return
+
+        stale = TrackAnalysis.query.order_by(
+            TrackAnalysis.last_accessed.asc()
+        ).limit(excess).all()
+        for entry in stale:
+            db.session.delete(entry)
+        db.session.commit()
+
+    def _to_dict(self, entry):
+        grid = None
+        if entry.downbeats and entry.downbeats.startswith(BEATGRID_MAGIC):
+            grid = BeatGrid.from_bytes(entry.downbeats)
+        downbeats = grid.times() if grid else decode_beats(entry.downbeats)
+        # Older rows stored downbeats one per "bar", without a phrase phase
+        phrase_offset = grid.first_downbeat if grid and grid.beats_per_bar == PHRASE_BARS[-1] else 0
+        return {
+            'video_id': entry.video_id,
+            'audio_hash': entry.audio_hash,
+            'bpm': entry.bpm,
+            'duration': entry.duration,
+            'sample_rate': entry.sample_rate,
+            'beat_times': decode_beats(entry.beat_times),
+            'downbeats': downbeats,
+            'phrases': {bars: downbeats[phrase_offset % bars::bars] for bars in PHRASE_BARS},
+            'phrase_offset': phrase_offset
+        }
@@ -0,0 +1,128 @@
+import os
+import subprocess
+import threading
+import numpy as np
+
+FFMPEG = 'ffmpeg'
+
+# format -> (ffmpeg muxer, codec, mimetype)
+STREAM_FORMATS = {
+    'mp3': ('mp3', 'libmp3lame', 'audio/mpeg'),
+    'ogg': ('ogg', 'libopus', 'audio/ogg')
+}
+
+def decode_audio(source, sample_rate=44100, headers=None, copy_to=None):
+    """
+    Decode a file or stream URL straight to a mono float32 array.
+    ffmpeg reads the source once, resamples to sample_rate and writes raw
+    PCM to a pipe, so no intermediate file is produced. If copy_to is
+    given, the original audio stream is also saved there without
+    re-encoding (a compact on-disk copy from the same read).
+    """
+    cmd = _input_args(source, headers)
+    if copy_to:
+        cmd += ['-map', '0:a:0', '-c', 'copy', '-y', copy_to]
+
+    cmd += [
+        '-map', '0:a:0',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-f', 'f32le',
+        'pipe:1'
+    ]
+
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        _remove_partial(copy_to)
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()}")
+
+    return np.frombuffer(proc.stdout, dtype=np.float32)
+
+def decode_audio_blocks(source, sample_rate=44100, headers=None, block_frames=65536):
+    """
+    Decode a file or stream URL to mono float32 and yield it in blocks of
+    block_frames samples (the last may be shorter) as ffmpeg produces them.
+    """
+    cmd = _input_args(source, headers) + [
+        '-map', '0:a:0',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-f', 'f32le',
+        'pipe:1'
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        block_bytes = block_frames * 4
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+    finally:
+        # The consumer may stop early
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+def copy_audio_stream(source, output_path, headers=None):
+    """Save the audio stream of a file or URL to output_path without re-encoding"""
+    cmd = _input_args(source, headers) + ['-map', '0:a:0', '-c', 'copy', '-y', output_path]
+
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        _remove_partial(output_path)
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()}")
+    return output_path
+
+def encode_stream(blocks, sample_rate, fmt='mp3', bitrate='192k'):
+    """
+    Encode float32 blocks with ffmpeg as they arrive and yield the
+    compressed bytes, for streaming responses.
+    """
+    muxer, codec, _ = STREAM_FORMATS[fmt]
+    cmd = [
+        FFMPEG, '-nostdin', '-hide_banner', '-loglevel', 'error',
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0',
+        '-c:a', codec, '-b:a', bitrate, '-f', muxer, 'pipe:1'
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+
+    def feed():
+        try:
+            for block in blocks:
+                proc.stdin.write(block.astype('<f4', copy=False).tobytes())
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    threading.Thread(target=feed, name='encode-feed', daemon=True).start()
+    try:
+        while True:
+            chunk = os.read(proc.stdout.fileno(), 65536)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        # Client may disconnect mid-stream
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+def _input_args(source, headers=None):
+    cmd = [FFMPEG, '-nostdin', '-hide_banner', '-loglevel', 'error']
+    if headers:
+        cmd += ['-headers', ''.join(f'{key}: {value}\r\n' for key, value in headers.items())]
+    return cmd + ['-i', source]
+
+def _remove_partial(path):
+    if path and os.path.exists(path):
+        os.remove(path)
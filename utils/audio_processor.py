@@ -1,20 +1,136 @@
 import numpy as np
-from pydub import AudioSegment
-from pydub.effects import speedup, normalize
 import librosa
-import soundfile as sf
-import io
-from scipy import signal
-from scipy.io import wavfile
+from utils.audio_decoder import decode_audio
+from utils.waveform import compute_peaks, encode_peaks
+from utils.metrics import span
+from config import Config
+
+# scipy-backed modules (beat detection, effects, time stretching) are
+# imported where they are used, so the web tier can build an
+# AudioProcessor for cache keys without loading the DSP stack
 
 class AudioProcessor:
-    def __init__(self, sample_rate=44100):
-        self.sample_rate = sample_rate
+    ANALYSIS_VERSION = 5
+    FRAME_SECONDS = 512 / 44100  # analysis hop, kept at any analysis rate
+    
+    def __init__(self, sample_rate=None, analysis_sample_rate=None, hop_length=None):
+        self.sample_rate = sample_rate or Config.RENDER_SAMPLE_RATE
+        self.analysis_sample_rate = analysis_sample_rate or Config.ANALYSIS_SAMPLE_RATE
+        # A fixed 512-sample hop is 46 ms at 11025 Hz: too coarse for the
+        # beats to land inside calibrate_beats' search window
+        self.hop_length = hop_length or max(1, int(round(self.FRAME_SECONDS * self.analysis_sample_rate)))
+    
+    def settings(self):
+        """Constructor arguments, for rebuilding this processor in a worker process"""
+        return {
+            'sample_rate': self.sample_rate,
+            'analysis_sample_rate': self.analysis_sample_rate,
+            'hop_length': self.hop_length
+        }
+    
+    def analysis_params(self):
+        """Parameters that affect analysis results (used as cache key)"""
+        return {
+            'version': self.ANALYSIS_VERSION,
+            'sample_rate': self.sample_rate,
+            'analysis_sample_rate': self.analysis_sample_rate,
+            'hop_length': self.hop_length
+        }
+    
+    def analyze(self, audio_data):
+        """
+        Single-pass track analysis.
+        Computes one mel spectrogram at the analysis sample rate and
+        derives the onset envelope, tempo, beats, downbeats, phrases and
+        the energy profile from it. Beats are then snapped to their
+        attacks in the full-rate signal and the tempo refined from them,
+        so a low analysis rate costs no beat or BPM precision.
+        Returns a dict with bpm, beat_times, downbeats, phrases
+        ({bars: boundary times}), phrase_offset, energy, waveform
+        (encoded min/max/RMS peak tiers), duration and sample_rate.
+        """
+        from utils.beat_detector import BeatDetector
+        
+        sr = self.analysis_sample_rate
+        hop_length = self.hop_length
+        if sr != self.sample_rate:
+            with span('analyze.resample'):
+                y = librosa.resample(audio_data, orig_sr=self.sample_rate, target_sr=sr)
+        else:
+            y = audio_data
+        
+        with span('analyze.onset'):
+            # Window and hop keep their 44.1 kHz durations; onset_strength
+            # needs n_fft to compensate the centered framing
+            n_fft = 4 * hop_length
+            mel = librosa.feature.melspectrogram(y=y, sr=sr, n_fft=n_fft, hop_length=hop_length)
+            onset_env = librosa.onset.onset_strength(
+                S=librosa.power_to_db(mel), sr=sr, n_fft=n_fft, hop_length=hop_length
+            )
+        detector = BeatDetector(sample_rate=self.sample_rate)
+        with span('analyze.beat_track'):
+            tempo = detector.global_tempo(onset_env, sr, hop_length) or 120.0
+            _, beat_frames = librosa.beat.beat_track(
+                onset_envelope=onset_env,
+                sr=sr,
+                hop_length=hop_length,
+                bpm=tempo
+            )
+        beat_times = librosa.frames_to_time(beat_frames, sr=sr, hop_length=hop_length)
+        
+        # Back to render-rate sample positions
+        beat_samples = detector.calibrate_beats(audio_data, beat_times)
+        beat_times = beat_samples / self.sample_rate
+        tempo = detector.refine_tempo(beat_samples, tempo)
+        
+        with span('analyze.structure'):
+            structure = detector.bar_structure(beat_times, mel, sr, hop_length)
+        
+        # RMS per hop-sized block, same frame grid as the onset envelope
+        with span('analyze.energy'):
+            n_frames = len(y) // hop_length
+            frames = y[:n_frames * hop_length].reshape(n_frames, hop_length)
+            energy = np.sqrt(np.mean(frames ** 2, axis=1))
+        
+        # Waveform overview tiers from the full-rate signal
+        with span('analyze.waveform'):
+            waveform = encode_peaks(compute_peaks(audio_data), self.sample_rate, len(audio_data))
+        
+        return {
+            'bpm': tempo,
+            'beat_times': beat_times,
+            'downbeats': structure['downbeats'],
+            'phrases': structure['phrases'],
+            'phrase_offset': structure['phrase_offset'],
+            'energy': energy,
+            'energy_hop': hop_length / sr,  # seconds per energy frame
+            'waveform': waveform,
+            'duration': len(audio_data) / self.sample_rate,
+            'sample_rate': self.sample_rate
+        }
+        
+    def progressive(self, on_estimate=None):
+        """
+        Progressive beat tracker for full-rate audio as it decodes, framed
+        on the same time grid as analyze() (hop scaled to sample_rate) and
+        with its mel bands limited to the analysis rate's, so both see the
+        same onsets
+        """
+        from utils.beat_detector import BeatDetector
+        
+        hop_length = int(round(self.hop_length * self.sample_rate / self.analysis_sample_rate))
+        return BeatDetector(sample_rate=self.sample_rate).progressive(
+            on_estimate=on_estimate, hop_length=hop_length, fmax=self.analysis_sample_rate / 2
+        )
         
     def load_audio(self, file_path):
-        """Load audio file using librosa"""
-        y, sr = librosa.load(file_path, sr=self.sample_rate, mono=True)
-        return y, sr
+        """Decode audio file to mono float32 in a single ffmpeg pass"""
+        try:
+            return decode_audio(file_path, sample_rate=self.sample_rate), self.sample_rate
+        except FileNotFoundError:
+            # ffmpeg not installed; fall back to librosa
+            y, sr = librosa.load(file_path, sr=self.sample_rate, mono=True)
+            return y, sr
     
     def calculate_bpm(self, audio_data):
         """Calculate BPM using librosa"""
@@ -36,8 +152,9 @@ class AudioProcessor:
         return beat_times, tempo
     
     def time_stretch(self, audio_data, factor):
-        """Time stretching without pitch change"""
-        return librosa.effects.time_stretch(audio_data, rate=factor)
+        """Time stretching without pitch change (streaming WSOLA)"""
+        from utils.time_stretch import TimeStretcher
+        return TimeStretcher(audio_data, factor).render()
     
     def pitch_shift(self, audio_data, semitones):
         """Pitch shifting"""
@@ -47,45 +164,38 @@ class AudioProcessor:
             n_steps=semitones
         )
     
-    def apply_filter(self, audio_data, filter_type='lowpass', cutoff=1000):
-        """Apply audio filter"""
-        nyquist = self.sample_rate / 2
-        normal_cutoff = cutoff / nyquist
+    def apply_filter(self, audio_data, filter_type='lowpass', cutoff=1000, block_size=None):
+        """Apply audio filter block by block (cached SOS design, state carried over)"""
+        from utils.effects import EffectsChain, Filter, FILTER_KINDS
         
-        if filter_type == 'lowpass':
-            b, a = signal.butter(4, normal_cutoff, btype='low', analog=False)
-        elif filter_type == 'highpass':
-            b, a = signal.butter(4, normal_cutoff, btype='high', analog=False)
-        elif filter_type == 'bandpass':
-            b, a = signal.butter(4, [normal_cutoff/2, normal_cutoff*1.5], btype='band', analog=False)
-        else:
+        if filter_type not in FILTER_KINDS:
             return audio_data
         
-        filtered = signal.filtfilt(b, a, audio_data)
-        return filtered
+        chain = EffectsChain([Filter(filter_type, cutoff, sample_rate=self.sample_rate)],
+                             sample_rate=self.sample_rate)
+        return chain.apply(audio_data, block_size or Config.BUFFER_SIZE)
     
     def create_crossfade(self, audio1, audio2, duration=2.0):
-        """Create crossfade between two audio segments"""
+        """
+        Create crossfade between two audio segments.
+        Inputs may be read-only memmaps; the only allocation is the output.
+        """
         # Ensure same length
         min_len = min(len(audio1), len(audio2))
         audio1 = audio1[:min_len]
         audio2 = audio2[:min_len]
         
         # Create fade curves
-        fade_out = np.linspace(1, 0, int(self.sample_rate * duration))
-        fade_in = np.linspace(0, 1, int(self.sample_rate * duration))
-        
-        # Apply fades
-        audio1_faded = audio1.copy()
-        audio2_faded = audio2.copy()
-        
-        fade_len = len(fade_out)
-        audio1_faded[-fade_len:] *= fade_out
-        audio2_faded[:fade_len] *= fade_in
+        fade_len = min(int(self.sample_rate * duration), min_len)
+        fade_out = np.linspace(1, 0, fade_len, dtype=np.float32)
+        fade_in = np.linspace(0, 1, fade_len, dtype=np.float32)
         
-        # Mix
-        mixed = audio1_faded + audio2_faded
-        return mixed
+        # Mix, then take the faded-out part of each track back out
+        mixed = np.add(audio1, audio2, dtype=np.float32)
+        if fade_len:
+            mixed[-fade_len:] -= audio1[-fade_len:] * (1 - fade_out)
+            mixed[:fade_len] -= audio2[:fade_len] * (1 - fade_in)
+        return np.asarray(mixed)
     
     def normalize_audio(self, audio_data):
         """Normalize audio to -1 to 1 range"""
@@ -96,4 +206,5 @@ class AudioProcessor:
     
     def save_to_wav(self, audio_data, filename):
         """Save audio data to WAV file"""
+        from scipy.io import wavfile
         wavfile.write(filename, self.sample_rate, audio_data)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import time
+from concurrent.futures import as_completed
+from utils.audio_processor import AudioProcessor
+from utils.analysis_cache import hash_audio
+from utils.youtube_dl import YouTubeLoader
+
+def check_items(items):
+    """Raise ValueError unless items is a list of non-empty strings"""
+    if not isinstance(items, (list, tuple)) or not all(isinstance(item, str) and item.strip() for item in items):
+        raise ValueError('Crate items must be a list of non-empty strings')
+
+def item_key(item, allow_files=False):
+    """Cache key for a crate entry: local files by absolute path, else the video ID"""
+    if allow_files and os.path.isfile(item):
+        return f"file:{os.path.abspath(item)}"
+    return item
+
+def analyze_item(item, processor_kwargs, temp_folder, allow_files=False, progress=None):
+    """
+    Ingest and analyze one crate entry with per-stage timings
+    (safe to run in a worker process)
+    """
+    processor = AudioProcessor(**processor_kwargs)
+    timings = {}
+
+    start = time.perf_counter()
+    if allow_files and os.path.isfile(item):
+        audio_data, sr = processor.load_audio(item)
+    else:
+        track_info = YouTubeLoader(temp_folder).download_audio(
+            item, sample_rate=processor.sample_rate
+        )
+        if not track_info:
+            raise RuntimeError(f"Failed to download audio for {item}")
+        audio_data = track_info['audio']
+    timings['ingest'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    audio_hash = hash_audio(audio_data)
+    timings['hash'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analysis = processor.analyze(audio_data)
+    timings['analyze'] = time.perf_counter() - start
+
+    # The energy profile is not cached; don't ship it back to the parent
+    analysis.pop('energy', None)
+    return audio_hash, analysis, timings
+
+class BatchAnalyzer:
+    """
+    Analyze a crate of video IDs and/or local files in parallel.
+    Results go to the persistent analysis cache as each track finishes,
+    so an interrupted run resumes with only the unfinished tracks.
+    Local file paths are only accepted with allow_files (the CLI), never
+    from HTTP requests. Must be used inside an application context.
+    """
+    def __init__(self, audio_processor, analysis_cache, temp_folder='temp_audio',
+                 allow_files=False):
+        self.audio_processor = audio_processor
+        self.analysis_cache = analysis_cache
+        self.temp_folder = temp_folder
+        self.allow_files = allow_files
+
+    def pending(self, items):
+        """Items without a cached analysis for the current parameters"""
+        params = self.audio_processor.analysis_params()
+        return [item for item in items if self.analysis_cache.get(item_key(item, self.allow_files), params) is None]
+
+    def run(self, items, submit, on_progress=None):
+        """
+        Analyze all pending items. submit(fn, *args) must return a future,
+        e.g. ProcessPoolExecutor.submit. on_progress(done, total, item, error)
+        is called after each track. Returns a throughput/timing report.
+        Raises ValueError unless items is a list of non-empty strings.
+        """
+        check_items(items)
+        items = list(dict.fromkeys(items))
+        todo = self.pending(items)
+        params = self.audio_processor.analysis_params()
+        report = {
+            'total': len(items),
+            'skipped': len(items) - len(todo),
+            'analyzed': 0,
+            'failed': {},
+            'stage_seconds': {'ingest': 0.0, 'hash': 0.0, 'analyze': 0.0}
+        }
+
+        started = time.perf_counter()
+        futures = {
+            submit(analyze_item, item, self.audio_processor.settings(),
+                   self.temp_folder, self.allow_files): item
+            for item in todo
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            item = futures[future]
+            error = None
+            try:
+                audio_hash, analysis, timings = future.result()
+                self.analysis_cache.put(item_key(item, self.allow_files), audio_hash, params, analysis)
+                report['analyzed'] += 1
+                for stage, seconds in timings.items():
+                    report['stage_seconds'][stage] += seconds
+            except Exception as e:
+                error = str(e)
+                report['failed'][item] = error
+            if on_progress:
+                on_progress(done, len(todo), item, error)
+
+        elapsed = time.perf_counter() - started
+        report['elapsed'] = elapsed
+        report['tracks_per_minute'] = report['analyzed'] / elapsed * 60 if elapsed > 0 else 0.0
+        report['stage_mean_seconds'] = {
+            stage: seconds / report['analyzed'] if report['analyzed'] else 0.0
+            for stage, seconds in report['stage_seconds'].items()
+        }
+        return report
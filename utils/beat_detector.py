@@ -1,22 +1,48 @@
 import numpy as np
 import librosa
-import librosa.display
 from scipy import signal
-from scipy.ndimage import maximum_filter
+from scipy.ndimage import maximum_filter1d, gaussian_filter1d
+from utils.metrics import span
+from utils.beatgrid import BeatGrid, first_downbeat_index
 
 class BeatDetector:
-    def __init__(self, sample_rate=44100):
+    PULSE_WIDTH = 0.01  # seconds, std-dev of the Gaussian beat pulses used by align_beats
+    ATTACK_RESOLUTION = 0.001  # seconds, power frames used by calibrate_beats
+    BASS_CUTOFF = 150.0  # Hz, top of the band whose energy marks downbeats
+    PHRASE_BARS = (8, 16, 32)
+    
+    def __init__(self, sample_rate=44100, analysis_sample_rate=None):
         self.sample_rate = sample_rate
+        # extract_beats tracks at this rate and calibrates back to sample_rate
+        self.analysis_sample_rate = analysis_sample_rate or sample_rate
         
+    def progressive(self, on_estimate=None, hop_length=512, first_estimate=30.0,
+                    refine_every=30.0, fmax=None):
+        """Start a progressive analysis fed with decoded audio as it arrives"""
+        return ProgressiveBeatTracker(
+            sample_rate=self.sample_rate,
+            hop_length=hop_length,
+            fmax=fmax,
+            first_estimate=first_estimate,
+            refine_every=refine_every,
+            on_estimate=on_estimate
+        )
+    
+    @span('beats.extract')
     def extract_beats(self, audio_data, bpm=None):
         """
         Extract beat positions from audio data
         Returns beat positions in seconds
         """
+        sr = self.analysis_sample_rate
+        y = audio_data
+        if sr != self.sample_rate:
+            y = librosa.resample(audio_data, orig_sr=self.sample_rate, target_sr=sr)
+        
         # Compute onset envelope
         onset_env = librosa.onset.onset_strength(
-            y=audio_data, 
-            sr=self.sample_rate,
+            y=y, 
+            sr=sr,
             hop_length=512,
             aggregate=np.median
         )
@@ -28,7 +54,7 @@ class BeatDetector:
             # Estimate tempo
             tempo, _ = librosa.beat.beat_track(
                 onset_envelope=onset_env,
-                sr=self.sample_rate,
+                sr=sr,
                 hop_length=512
             )
             if isinstance(tempo, np.ndarray):
@@ -37,90 +63,275 @@ class BeatDetector:
         # Detect beats
         beat_frames = librosa.beat.beat_track(
             onset_envelope=onset_env,
-            sr=self.sample_rate,
+            sr=sr,
             hop_length=512,
             start_bpm=tempo,
             tightness=100
         )[1]
         
-        # Convert frames to time
-        beat_times = librosa.frames_to_time(beat_frames, sr=self.sample_rate, hop_length=512)
+        # Convert frames to time, calibrated to full-rate sample positions
+        beat_times = librosa.frames_to_time(beat_frames, sr=sr, hop_length=512)
+        beat_samples = self.calibrate_beats(audio_data, beat_times)
+        if not bpm:
+            tempo = self.refine_tempo(beat_samples, tempo)
         
-        return beat_times, tempo
+        return beat_samples / self.sample_rate, tempo
+    
+    def global_tempo(self, onset_env, sr, hop_length=512, stride=0.1, ac_size=8.0):
+        """
+        Tempo of the whole track, as librosa.feature.tempo estimates it
+        from the mean autocorrelation tempogram, but with a tempogram
+        window every `stride` seconds instead of every frame: the windows
+        span ac_size seconds, so the mean hardly changes while the cost
+        drops by the stride in frames.
+        """
+        onset_env = np.asarray(onset_env, dtype=np.float64)
+        win = int(librosa.time_to_frames(ac_size, sr=sr, hop_length=hop_length))
+        step = max(1, int(round(stride * sr / hop_length)))
+        # Centered windows, padded as librosa.feature.tempogram does
+        padded = np.pad(onset_env, win // 2, mode='linear_ramp', end_values=0)
+        frames = librosa.util.frame(padded, frame_length=win, hop_length=step)
+        frames = frames[:, :(len(onset_env) - 1) // step + 1]
+        window = signal.get_window('hann', win, fftbins=True)
+        tempogram = librosa.util.normalize(
+            librosa.autocorrelate(frames * window[:, np.newaxis], axis=0), norm=np.inf, axis=0
+        )
+        tempo = librosa.feature.tempo(tg=tempogram, sr=sr, hop_length=hop_length)
+        return float(np.atleast_1d(tempo)[0])
+    
+    def calibrate_beats(self, audio_data, beat_times, before=0.07, after=0.02):
+        """
+        Snap beat times to sample positions at self.sample_rate.
+        Onset envelopes place beats up to a frame late (more at low
+        analysis rates, whose FFT windows are longer), and only to the
+        frame grid. Each beat moves to the sharpest power rise in the
+        full-rate signal between `before` seconds ahead of it and `after`
+        seconds behind; beats with no rise nearby keep their position.
+        """
+        beat_times = np.asarray(beat_times, dtype=np.float64)
+        positions = np.round(beat_times * self.sample_rate).astype(np.int64)
+        hop = max(1, int(round(self.ATTACK_RESOLUTION * self.sample_rate)))
+        n_hops = len(audio_data) // hop
+        if len(positions) == 0 or n_hops < 2:
+            return positions
+        
+        hops = np.asarray(audio_data[:n_hops * hop]).reshape(n_hops, hop)
+        rise = np.diff(np.einsum('ij,ij->i', hops, hops, dtype=np.float64), prepend=0.0)
+        
+        offsets = np.arange(-int(round(before / self.ATTACK_RESOLUTION)),
+                            int(round(after / self.ATTACK_RESOLUTION)) + 1)
+        windows = np.clip(positions[:, None] // hop + offsets, 0, n_hops - 1)
+        candidates = rise[windows]
+        best = windows[np.arange(len(windows)), candidates.argmax(axis=1)]
+        return np.where(candidates.max(axis=1) > 0, best * hop, positions)
+    
+    def refine_tempo(self, beat_samples, tempo, max_deviation=0.06):
+        """
+        BPM from the mean interval of calibrated beats, which resolves
+        tempo far more finely than the tempogram's bins. Intervals off the
+        median by more than 10% (skipped or doubled beats) are ignored;
+        the estimate is kept only within max_deviation of `tempo`.
+        """
+        intervals = np.diff(np.asarray(beat_samples, dtype=np.float64)) / self.sample_rate
+        if len(intervals) < 8:
+            return tempo
+        median = np.median(intervals)
+        steady = intervals[np.abs(intervals - median) < 0.1 * median]
+        if len(steady) == 0:
+            return tempo
+        refined = 60.0 / steady.mean()
+        if abs(refined - tempo) > max_deviation * tempo:
+            return tempo
+        return float(refined)
     
     def calculate_beat_phase(self, audio_data, beat_times):
         """Calculate beat phase alignment"""
-        beat_samples = (beat_times * self.sample_rate).astype(int)
+        beat_samples = (np.asarray(beat_times) * self.sample_rate).astype(int)
+        half_window = int(0.05 * self.sample_rate) // 2  # 50ms window
+        
+        starts = np.clip(beat_samples - half_window, 0, len(audio_data))
+        ends = np.clip(beat_samples + half_window, 0, len(audio_data))
+        lengths = ends - starts
         
-        # Calculate RMS energy at each beat
-        beat_energies = []
-        window_size = int(0.05 * self.sample_rate)  # 50ms window
+        # RMS energy at each beat, full windows gathered in one strided view
+        window_len = 2 * half_window
+        energy = np.zeros(len(beat_samples))
+        full = lengths == window_len
+        if full.any():
+            windows = np.lib.stride_tricks.sliding_window_view(audio_data, window_len)[starts[full]]
+            energy[full] = np.einsum('ij,ij->i', windows, windows, dtype=np.float64)
         
-        for beat_sample in beat_samples:
-            start = max(0, beat_sample - window_size // 2)
-            end = min(len(audio_data), beat_sample + window_size // 2)
-            segment = audio_data[start:end]
-            if len(segment) > 0:
-                energy = np.sqrt(np.mean(segment ** 2))
-                beat_energies.append(energy)
-            else:
-                beat_energies.append(0)
+        # Windows cut off by either end of the track
+        for i in np.flatnonzero(~full & (lengths > 0)):
+            segment = np.asarray(audio_data[starts[i]:ends[i]], dtype=np.float64)
+            energy[i] = np.dot(segment, segment)
         
-        return np.array(beat_energies)
+        return np.sqrt(energy / np.maximum(lengths, 1))
     
-    def find_downbeats(self, audio_data, beat_times, tempo):
-        """Identify downbeats (first beat of each bar)"""
-        # Assuming 4/4 time signature
-        beats_per_bar = 4
+    @span('beats.downbeats')
+    def find_downbeats(self, audio_data, beat_times, tempo=None, *, beats_per_bar=4):
+        """
+        Identify downbeats (first beat of each bar) from the audio.
+        Computes the mel spectrogram bar_structure needs at the analysis
+        rate; analyze() shares the one behind its onset envelope instead.
+        tempo is accepted for existing callers and not used: the bar
+        phase comes from the audio.
+        """
+        sr = self.analysis_sample_rate
+        y = audio_data
+        if sr != self.sample_rate:
+            y = librosa.resample(audio_data, orig_sr=self.sample_rate, target_sr=sr)
+        mel = librosa.feature.melspectrogram(y=y, sr=sr, hop_length=512)
+        return self.bar_structure(beat_times, mel, sr, 512, beats_per_bar)['downbeats']
+    
+    def bar_structure(self, beat_times, mel, sr, hop_length=512, beats_per_bar=4):
+        """
+        Downbeats and phrase boundaries from a mel power spectrogram.
+        Each candidate bar phase is scored by the mean, over the beats it
+        would make downbeats, of three features sampled at every beat:
+        bass energy, the bass share of the total (a kick alone outweighs
+        a kick under a snare) and the spectral change from the previous
+        beat (notes and chords change on the bar). Phrases are found the
+        same way one level up: a bar's novelty is the spectral distance
+        between the two bars after it and the two before, and the 8-bar
+        phase with the highest mean novelty wins, then the 16- and 32-bar
+        phases that contain it. All of it is a few array passes over the
+        spectrogram, a small fraction of the cost of beat tracking.
+        Returns a dict with downbeats (seconds), bar_phase (index of the
+        first downbeat among the beats), phrases ({bars: boundary times})
+        and phrase_offset (index of the first 32-bar boundary among the
+        downbeats; the shorter phrases' offsets are it modulo their length).
+        """
+        beat_times = np.asarray(beat_times, dtype=np.float64)
+        n_frames = mel.shape[1]
+        if len(beat_times) < 2 * beats_per_bar or n_frames < 2:
+            downbeats = beat_times[::beats_per_bar]
+            return {
+                'downbeats': downbeats,
+                'bar_phase': 0,
+                'phrases': {bars: downbeats[::bars] for bars in self.PHRASE_BARS},
+                'phrase_offset': 0
+            }
+        
+        frames = librosa.time_to_frames(beat_times, sr=sr, hop_length=hop_length)
+        frames = np.maximum.accumulate(np.clip(frames, 0, n_frames - 1))
+        log_mel = librosa.power_to_db(mel)
+        
+        # Bass and total energy at each beat's attack (loudest frame around it)
+        centers = librosa.mel_frequencies(n_mels=mel.shape[0] + 2, fmax=sr / 2)[1:-1]
+        bands = np.vstack([mel[centers < self.BASS_CUTOFF].sum(axis=0), mel.sum(axis=0)])
+        bands = maximum_filter1d(bands, 4, axis=1, origin=-1)
+        bass, total = np.log1p(bands / (bands.mean(axis=1, keepdims=True) + 1e-10))[:, frames]
+        
+        # Spectral change between consecutive beat-synchronous spectra
+        spectra = self._segment_means(log_mel, frames)
+        change = np.concatenate([[0.0], np.linalg.norm(np.diff(spectra, axis=1), axis=0)])
         
-        # Calculate bar positions
-        beat_interval = 60 / tempo
-        bar_positions = []
+        score = _standardize(bass) + _standardize(bass - total) + _standardize(change)
+        phase_scores = [score[phase::beats_per_bar].mean() for phase in range(beats_per_bar)]
+        bar_phase = int(np.argmax(phase_scores))
+        bar_beats = np.arange(bar_phase, len(beat_times), beats_per_bar)
+        downbeats = beat_times[bar_beats]
         
-        for i, beat_time in enumerate(beat_times):
-            if i % beats_per_bar == 0:
-                bar_positions.append(beat_time)
+        # Novelty at each bar line: the two bars after it against the two before
+        bars = self._segment_means(log_mel, frames[bar_beats]).T
+        n_bars = len(bars)
+        sums = np.vstack([np.zeros(bars.shape[1]), np.cumsum(bars, axis=0)])
+        index = np.arange(n_bars)
+        lo, hi = np.maximum(index - 2, 0), np.minimum(index + 2, n_bars)
+        before = (sums[index] - sums[lo]) / np.maximum(index - lo, 1)[:, None]
+        after = (sums[hi] - sums[index]) / np.maximum(hi - index, 1)[:, None]
+        novelty = np.linalg.norm(after - before, axis=1)
+        # Nothing precedes the first bar; a track's start usually opens a phrase
+        novelty[0] = novelty[1:].max() if n_bars > 1 else 0.0
         
-        return np.array(bar_positions)
+        offset, step = 0, 1
+        for length in self.PHRASE_BARS:
+            offset = max(range(offset, length, step),
+                         key=lambda o: novelty[o::length].mean() if o < n_bars else -np.inf)
+            step = length
+        
+        return {
+            'downbeats': downbeats,
+            'bar_phase': bar_phase,
+            'phrases': {length: downbeats[offset % length::length] for length in self.PHRASE_BARS},
+            'phrase_offset': offset
+        }
+    
+    def _segment_means(self, log_mel, frames):
+        """Mean spectrum from each frame index to the next (the last runs to the end)"""
+        counts = np.diff(np.append(frames, log_mel.shape[1]))
+        return np.add.reduceat(log_mel, frames, axis=1) / np.maximum(counts, 1)
     
-    def align_beats(self, beat_times_a, beat_times_b):
-        """Align beats between two tracks"""
+    @span('beats.align')
+    def align_beats(self, beat_times_a, beat_times_b, bpm_ratio=1.0, max_lag=None,
+                    resolution=0.001, window=60.0):
+        """
+        Find the time shift that lines track B's beats up with track A's.
+        Track B's beats are first scaled by bpm_ratio (bpm_a / bpm_b, the
+        rate B is played at). Gaussian beat pulse trains of both tracks
+        are cross-correlated via FFT over lags within +/- max_lag (default:
+        half of A's beat interval), then the best lag is refined from the
+        residuals of matched beats.
+        Returns (time_shift, shift_samples): seconds / samples to add to
+        B's scaled beat times, or (None, None) if either track has no beats.
+        """
+        beat_times_a = np.asarray(beat_times_a, dtype=np.float64)
+        beat_times_b = np.asarray(beat_times_b, dtype=np.float64) / bpm_ratio
         if len(beat_times_a) == 0 or len(beat_times_b) == 0:
             return None, None
         
-        # Find optimal time shift using cross-correlation
-        max_len = max(len(beat_times_a), len(beat_times_b))
-        beat_vector_a = np.zeros(max_len)
-        beat_vector_b = np.zeros(max_len)
+        interval_a = np.median(np.diff(beat_times_a)) if len(beat_times_a) > 1 else 0.5
+        if max_lag is None:
+            max_lag = interval_a / 2
         
-        for i, t in enumerate(beat_times_a[:max_len]):
-            beat_vector_a[i] = 1
+        # Pulse trains over a bounded window at `resolution` seconds per bin
+        start = min(beat_times_a[0], beat_times_b[0])
+        length = int(min(window, max(beat_times_a[-1], beat_times_b[-1]) - start + max_lag) / resolution) + 1
+        max_lag_bins = int(np.ceil(max_lag / resolution))
+        pulses_a = self._pulse_train(beat_times_a - start, length, resolution)
+        pulses_b = self._pulse_train(beat_times_b - start, length, resolution)
         
-        for i, t in enumerate(beat_times_b[:max_len]):
-            beat_vector_b[i] = 1
+        # correlation[k] peaks where B shifted by lag k bins matches A
+        correlation = signal.correlate(pulses_a, pulses_b, mode='full', method='fft')
+        lags = np.arange(-(length - 1), length)
+        in_window = np.abs(lags) <= max_lag_bins
+        coarse_shift = lags[in_window][np.argmax(correlation[in_window])] * resolution
         
-        # Cross-correlation
-        correlation = np.correlate(beat_vector_a, beat_vector_b, mode='full')
-        best_shift = np.argmax(correlation) - (max_len - 1)
+        # Refine: mean residual of B beats that land near an A beat
+        shifted_b = beat_times_b + coarse_shift
+        nearest = np.clip(np.searchsorted(beat_times_a, shifted_b), 1, len(beat_times_a) - 1)
+        left, right = beat_times_a[nearest - 1], beat_times_a[nearest]
+        matched = np.where(shifted_b - left < right - shifted_b, left, right)
+        if len(beat_times_a) == 1:
+            matched = np.full_like(shifted_b, beat_times_a[0])
+        residuals = matched - shifted_b
+        close = np.abs(residuals) <= min(interval_a / 4, 5 * self.PULSE_WIDTH)
         
-        # Calculate required time shift
-        avg_beat_interval_a = np.mean(np.diff(beat_times_a[:10])) if len(beat_times_a) > 1 else 0.5
-        time_shift = best_shift * avg_beat_interval_a
+        time_shift = coarse_shift
+        if close.any():
+            time_shift += np.median(residuals[close])
         
-        return time_shift, best_shift
+        return float(time_shift), int(round(time_shift * self.sample_rate))
+    
+    def _pulse_train(self, beat_times, length, resolution):
+        """Gaussian-smoothed beat impulses sampled every `resolution` seconds"""
+        pulses = np.zeros(length)
+        indices = np.round(beat_times / resolution).astype(int)
+        np.add.at(pulses, indices[(indices >= 0) & (indices < length)], 1.0)
+        return gaussian_filter1d(pulses, self.PULSE_WIDTH / resolution)
     
     def create_beat_grid(self, audio_data, bpm, first_beat_time=0):
         """Create a regular beat grid"""
-        beat_interval = 60 / bpm
         duration = len(audio_data) / self.sample_rate
-        
-        beat_times = []
-        current_time = first_beat_time
-        while current_time < duration:
-            beat_times.append(current_time)
-            current_time += beat_interval
-        
-        return np.array(beat_times)
+        return BeatGrid.regular(bpm, duration, first_beat_time, sample_rate=self.sample_rate).times()
+    
+    def fit_beat_grid(self, beat_times, downbeats=None, tolerance=0.01):
+        """Compact BeatGrid of detected beats (see utils.beatgrid)"""
+        return BeatGrid.from_beats(
+            beat_times, tolerance=tolerance, sample_rate=self.sample_rate,
+            first_downbeat=first_downbeat_index(beat_times, downbeats)
+        )
     
     def quantize_to_grid(self, audio_data, bpm, quantization_strength=0.5):
         """Quantize audio to beat grid"""
@@ -145,19 +356,20 @@ class BeatDetector:
         
         return result
     
+    @span('beats.energy_peaks')
     def detect_energy_peaks(self, audio_data, threshold=0.1):
         """Detect energy peaks for manual beat detection"""
-        # Compute RMS energy
+        # Compute RMS energy: sum of squares per hop, then per frame of 4 hops
         frame_length = 2048
         hop_length = 512
+        hops_per_frame = frame_length // hop_length
         
-        energy = []
-        for i in range(0, len(audio_data) - frame_length, hop_length):
-            frame = audio_data[i:i + frame_length]
-            rms = np.sqrt(np.mean(frame ** 2))
-            energy.append(rms)
-        
-        energy = np.array(energy)
+        num_frames = len(range(0, len(audio_data) - frame_length, hop_length))
+        num_hops = num_frames + hops_per_frame - 1 if num_frames else 0
+        hops = np.asarray(audio_data[:num_hops * hop_length]).reshape(num_hops, hop_length)
+        hop_power = np.einsum('ij,ij->i', hops, hops, dtype=np.float64)
+        frame_power = np.convolve(hop_power, np.ones(hops_per_frame), mode='valid')
+        energy = np.sqrt(frame_power / frame_length)
         
         # Find peaks
         peaks = signal.find_peaks(energy, height=threshold)[0]
@@ -165,4 +377,184 @@ class BeatDetector:
         # Convert to time
         peak_times = peaks * hop_length / self.sample_rate
         
-        return peak_times, energy
\ No newline at end of file
+        return peak_times, energy
+
+def _standardize(values):
+    """Zero mean, unit variance (all zeros if the values are constant)"""
+    std = values.std()
+    return (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+class ProgressiveBeatTracker:
+    """
+    Incremental tempo and beat tracking over audio that is still decoding.
+    feed() extends the onset envelope with only the newly arrived samples
+    (the mel-flux envelope librosa.onset.onset_strength computes, framed
+    the same way), carrying the unfinished frame and the previous mel
+    frame between calls. onset_strength clips decibels to top_db below
+    the loudest mel bin of the whole signal; here the floor follows the
+    loudest bin so far, so quiet frames before the track's peak can come
+    out slightly higher. Once first_estimate seconds have arrived, tempo
+    and beats are estimated from the envelope so far and passed to
+    on_estimate, then re-estimated every refine_every seconds and once
+    more by finish(). The tempogram behind the tempo estimate is also
+    accumulated incrementally, so time to the first BPM does not depend
+    on track length.
+    """
+    def __init__(self, sample_rate=44100, hop_length=512, n_fft=None, n_mels=128,
+                 first_estimate=30.0, refine_every=30.0, on_estimate=None, top_db=80.0,
+                 fmax=None):
+        self.sample_rate = sample_rate
+        self.hop_length = hop_length
+        self.n_fft = n_fft or hop_length * 4
+        self.top_db = top_db
+        self.first_estimate = first_estimate
+        self.refine_every = refine_every
+        self.on_estimate = on_estimate
+        self.window = signal.get_window('hann', self.n_fft).astype(np.float32)
+        self.mel_basis = librosa.filters.mel(
+            sr=sample_rate, n_fft=self.n_fft, n_mels=n_mels, fmax=fmax
+        )
+        
+        # Centered framing: the signal starts after n_fft // 2 zeros
+        self._pending = np.zeros(self.n_fft // 2, dtype=np.float32)
+        self._prev_db = None
+        self._db_max = -np.inf
+        # Lag + centering compensation, as in onset_strength
+        self._envelope = [np.zeros(1 + self.n_fft // (2 * hop_length), dtype=np.float32)]
+        self.frames = 0
+        self.samples = 0
+        self.estimates = 0
+        self._next_estimate = first_estimate
+        self._tg_sum = None
+        self._tg_next = 0
+        self.result = None
+    
+    @property
+    def seconds(self):
+        return self.samples / self.sample_rate
+    
+    @property
+    def onset_envelope(self):
+        if len(self._envelope) > 1:
+            self._envelope = [np.concatenate(self._envelope)]
+        # The lag padding leaves two trailing values past the last frame
+        return self._envelope[0][:self.frames]
+    
+    def feed(self, samples):
+        """Add decoded samples; returns a new estimate if one was published"""
+        samples = np.asarray(samples, dtype=np.float32)
+        self.samples += len(samples)
+        self._extend(samples)
+        
+        if self.seconds >= self._next_estimate:
+            self._next_estimate = self.seconds + self.refine_every
+            return self._publish(final=False)
+        return None
+    
+    def finish(self):
+        """Flush the centered framing padding and publish the final estimate"""
+        self._extend(np.zeros(self.n_fft // 2, dtype=np.float32))
+        return self._publish(final=True)
+    
+    @span('beats.progressive_estimate')
+    def estimate(self):
+        """Tempo and beat times from the envelope so far"""
+        envelope = self.onset_envelope
+        bpm = self._tempo(envelope)
+        _, beat_frames = librosa.beat.beat_track(
+            onset_envelope=envelope, sr=self.sample_rate, hop_length=self.hop_length, bpm=bpm
+        )
+        beat_samples = self._peak_positions(envelope, beat_frames) * self.hop_length
+        beat_times = beat_samples / self.sample_rate
+        # The tempogram only resolves tempo to its lag bins (129.2 next to
+        # 123.0); the tracked beats follow the onsets, so their mean
+        # interval gives the finer BPM, as in extract_beats
+        bpm = BeatDetector(sample_rate=self.sample_rate).refine_tempo(beat_samples, bpm)
+        return {
+            'bpm': bpm,
+            'beat_times': beat_times,
+            'seconds_analyzed': self.seconds
+        }
+    
+    def _tempo(self, envelope):
+        """
+        Global tempo from a running sum of autocorrelation tempogram frames.
+        Only frames completed since the last estimate are computed, so a
+        refinement costs the same however much audio has been decoded.
+        """
+        win = int(librosa.time_to_frames(8.0, sr=self.sample_rate, hop_length=self.hop_length))
+        if len(envelope) < win:
+            tempo = librosa.feature.tempo(
+                onset_envelope=envelope, sr=self.sample_rate, hop_length=self.hop_length
+            )
+            return float(np.atleast_1d(tempo)[0])
+        
+        # Each tempogram frame needs a full window of envelope frames
+        # after it; with none completed since, reuse the running sum
+        if len(envelope) - self._tg_next >= win:
+            tg = librosa.feature.tempogram(
+                onset_envelope=envelope[self._tg_next:], sr=self.sample_rate,
+                hop_length=self.hop_length, win_length=win, center=False
+            )
+            self._tg_next += tg.shape[1]
+            self._tg_sum = tg.sum(axis=1) if self._tg_sum is None else self._tg_sum + tg.sum(axis=1)
+        tempo = librosa.feature.tempo(
+            tg=self._tg_sum[:, np.newaxis] / self._tg_next, sr=self.sample_rate,
+            hop_length=self.hop_length, aggregate=None
+        )
+        return float(np.atleast_1d(tempo)[0])
+    
+    @staticmethod
+    def _peak_positions(envelope, frames):
+        """
+        Fractional frame of the onset peak at each beat frame, from a
+        parabola through the frame and its neighbours. Whole frames alone
+        quantize beat intervals too coarsely to refine the tempo.
+        """
+        frames = np.asarray(frames, dtype=np.int64)
+        if len(envelope) < 3 or len(frames) == 0:
+            return frames.astype(np.float64)
+        
+        centre = np.clip(frames, 1, len(envelope) - 2)
+        left, mid, right = envelope[centre - 1], envelope[centre], envelope[centre + 1]
+        curvature = left - 2 * mid + right
+        peak = curvature < 0
+        offset = np.zeros(len(frames))
+        offset[peak] = 0.5 * (left[peak] - right[peak]) / curvature[peak]
+        return frames + np.where(frames == centre, np.clip(offset, -0.5, 0.5), 0.0)
+    
+    def _extend(self, samples):
+        buffer = np.concatenate([self._pending, samples])
+        count = 1 + (len(buffer) - self.n_fft) // self.hop_length if len(buffer) >= self.n_fft else 0
+        if count == 0:
+            self._pending = buffer
+            return
+        
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:count]
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        mel_db = 10 * np.log10(np.maximum(self.mel_basis @ power.T, 1e-10))
+        # power_to_db's top_db clipping, against the loudest bin so far
+        self._db_max = max(self._db_max, float(mel_db.max()))
+        mel_db = np.maximum(mel_db, self._db_max - self.top_db)
+        
+        if self._prev_db is not None:
+            mel_db_with_prev = np.hstack([self._prev_db, mel_db])
+        else:
+            mel_db_with_prev = mel_db
+        flux = np.maximum(0.0, np.diff(mel_db_with_prev, axis=1)).mean(axis=0)
+        
+        self._envelope.append(flux.astype(np.float32))
+        self._prev_db = mel_db[:, -1:]
+        self._pending = buffer[count * self.hop_length:]
+        self.frames += count
+    
+    def _publish(self, final):
+        if not final and self.frames < 2:
+            return None
+        result = self.estimate()
+        result['final'] = final
+        self.estimates += 1
+        self.result = result
+        if self.on_estimate:
+            self.on_estimate(result)
+        return result
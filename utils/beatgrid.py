@@ -0,0 +1,244 @@
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b'BGRD'
+VERSION = 2
+FLAG_RESIDUALS = 1
+_HEADER = struct.Struct('<4sBBHIIII')  # magic, version, flags, beats per bar, first downbeat, beats, segments, sample_rate
+# Version 1 stored beats per bar and first downbeat as single bytes
+_HEADERS = {1: struct.Struct('<4sBBBBIII'), VERSION: _HEADER}
+_SEGMENT = struct.Struct('<Idd')  # first beat index, anchor time, seconds per beat
+
+class BeatGrid:
+    """
+    Beat positions as piecewise-constant tempo segments.
+    Each segment is (first beat index, anchor time, seconds per beat);
+    beat i of a segment starting at beat s falls at anchor + (i - s) *
+    interval. Optional per-beat residuals (seconds, float32) hold what
+    the segments do not, so a fitted grid reproduces the detected beats
+    exactly. Lookups search the materialized beat times, O(log n).
+    """
+    def __init__(self, segments, count, residuals=None, beats_per_bar=4, first_downbeat=0,
+                 sample_rate=44100):
+        self.segments = np.asarray(segments, dtype=np.float64).reshape(-1, 3)
+        self.count = int(count)
+        self.residuals = None if residuals is None else np.asarray(residuals, dtype=np.float32)
+        self.beats_per_bar = beats_per_bar
+        self.first_downbeat = first_downbeat
+        self.sample_rate = sample_rate
+        self._times = None
+
+    @classmethod
+    def regular(cls, bpm, duration, first_beat_time=0.0, **kwargs):
+        """Constant-tempo grid from first_beat_time to the end of the track"""
+        interval = 60.0 / bpm
+        count = max(0, int(np.ceil((duration - first_beat_time) / interval)))
+        # Rounding can put the last computed beat at or past the end
+        while count and first_beat_time + (count - 1) * interval >= duration:
+            count -= 1
+        return cls([(0, first_beat_time, interval)], count, **kwargs)
+
+    @classmethod
+    def from_beats(cls, beat_times, tolerance=0.01, residuals=True, **kwargs):
+        """
+        Fit segments to detected beat times: each segment is the longest
+        run of beats a straight line fits within tolerance seconds. With
+        residuals, the remaining per-beat offsets are kept too.
+        """
+        beat_times = np.asarray(beat_times, dtype=np.float64)
+        n = len(beat_times)
+        if n == 0:
+            return cls(np.empty((0, 3)), 0, **kwargs)
+        if n == 1:
+            return cls([(0, beat_times[0], 0.5)], 1, **kwargs)
+
+        segments = []
+        start = 0
+        while start < n - 1:
+            end = _longest_fit(beat_times, start, tolerance)
+            index = np.arange(end - start)
+            interval, anchor = np.polyfit(index, beat_times[start:end], 1)
+            segments.append((start, anchor, interval))
+            start = end - 1 if end < n else n
+        grid = cls(segments, n, **kwargs)
+
+        if residuals:
+            offsets = beat_times - grid._grid_times()
+            if np.abs(offsets).max() > 0.5 / grid.sample_rate:
+                grid.residuals = offsets.astype(np.float32)
+                grid._times = None
+        return grid
+
+    @property
+    def bpm(self):
+        """Tempo of the longest segment"""
+        if len(self.segments) == 0:
+            return 0.0
+        lengths = np.diff(np.append(self.segments[:, 0], self.count))
+        return 60.0 / self.segments[int(np.argmax(lengths)), 2]
+
+    def times(self):
+        """Every beat time in seconds (float64, computed once)"""
+        if self._times is None:
+            times = self._grid_times()
+            if self.residuals is not None:
+                times = times + self.residuals
+            self._times = times
+        return self._times
+
+    def downbeats(self):
+        """Times of the first beat of every bar"""
+        return self.times()[self.first_downbeat % self.beats_per_bar::self.beats_per_bar]
+
+    def position(self, t):
+        """Fractional beat index at time(s) t, linear between beats"""
+        times = self.times()
+        t = np.asarray(t, dtype=np.float64)
+        if len(times) < 2:
+            return np.zeros_like(t)
+        i = np.clip(np.searchsorted(times, t, side='right') - 1, 0, len(times) - 2)
+        return i + (t - times[i]) / (times[i + 1] - times[i])
+
+    def time_at(self, position):
+        """Time of fractional beat index(es), linear between beats"""
+        times = self.times()
+        position = np.asarray(position, dtype=np.float64)
+        if len(times) < 2:
+            return np.full(position.shape, times[0] if len(times) else 0.0)
+        i = np.clip(np.floor(position).astype(np.int64), 0, len(times) - 2)
+        return times[i] + (position - i) * (times[i + 1] - times[i])
+
+    def nearest_beat(self, t):
+        """(index, time) of the beat closest to time(s) t"""
+        times = self.times()
+        i = _nearest(times, np.asarray(t, dtype=np.float64))
+        return i, times[i]
+
+    def nearest_bar(self, t):
+        """(beat index, time) of the downbeat closest to time(s) t"""
+        downbeats = self.downbeats()
+        j = _nearest(downbeats, np.asarray(t, dtype=np.float64))
+        return self.first_downbeat % self.beats_per_bar + j * self.beats_per_bar, downbeats[j]
+
+    def snap(self, t, division=1):
+        """Quantize time(s) t to the nearest 1/division of a beat"""
+        return self.time_at(np.round(self.position(t) * division) / division)
+
+    def to_bytes(self):
+        """
+        Binary format: header, one (first beat, anchor, interval) record
+        per segment, then if present the residuals as zlib-compressed
+        delta-encoded int32 sample offsets.
+        """
+        if not 0 < self.beats_per_bar <= 0xFFFF or self.first_downbeat < 0:
+            raise ValueError(
+                f"Cannot store beats_per_bar={self.beats_per_bar}, first_downbeat={self.first_downbeat}"
+            )
+        flags = FLAG_RESIDUALS if self.residuals is not None else 0
+        parts = [_HEADER.pack(MAGIC, VERSION, flags, self.beats_per_bar, self.first_downbeat,
+                              self.count, len(self.segments), int(self.sample_rate))]
+        parts.extend(_SEGMENT.pack(int(start), anchor, interval) for start, anchor, interval in self.segments)
+        if self.residuals is not None:
+            samples = np.round(self.residuals.astype(np.float64) * self.sample_rate).astype(np.int32)
+            parts.append(zlib.compress(np.diff(samples, prepend=np.int32(0)).astype('<i4').tobytes()))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        header = _HEADERS.get(data[4]) if len(data) > 4 else None
+        if data[:4] != MAGIC or header is None:
+            raise ValueError('Not a beatgrid')
+        _, _, flags, beats_per_bar, first_downbeat, count, n_segments, sample_rate = \
+            header.unpack_from(data)
+
+        offset = header.size
+        segments = [_SEGMENT.unpack_from(data, offset + i * _SEGMENT.size) for i in range(n_segments)]
+        offset += n_segments * _SEGMENT.size
+        residuals = None
+        if flags & FLAG_RESIDUALS:
+            deltas = np.frombuffer(zlib.decompress(data[offset:]), dtype='<i4')
+            residuals = np.cumsum(deltas, dtype=np.int64) / sample_rate
+        return cls(segments, count, residuals=residuals, beats_per_bar=beats_per_bar,
+                   first_downbeat=first_downbeat, sample_rate=sample_rate)
+
+    def to_dict(self):
+        """JSON form: segments as [first beat, anchor, interval] plus residuals in seconds"""
+        return {
+            'beats': self.count,
+            'bpm': float(self.bpm),
+            'beats_per_bar': self.beats_per_bar,
+            'first_downbeat': self.first_downbeat,
+            'segments': [[int(start), anchor, interval] for start, anchor, interval in self.segments.tolist()],
+            'residuals': None if self.residuals is None else self.residuals.tolist()
+        }
+
+    def _grid_times(self):
+        if len(self.segments) == 1:
+            _, anchor, interval = self.segments[0]
+            return anchor + np.arange(self.count) * interval
+        starts = np.append(self.segments[:, 0], self.count).astype(np.int64)
+        lengths = np.diff(starts)
+        segment = np.repeat(np.arange(len(self.segments)), lengths)
+        index = np.arange(self.count) - starts[segment]
+        return self.segments[segment, 1] + index * self.segments[segment, 2]
+
+def _nearest(values, t):
+    """Index of the element of sorted values closest to each t"""
+    if len(values) < 2:
+        return np.zeros(np.shape(t), dtype=np.int64)
+    i = np.clip(np.searchsorted(values, t), 1, len(values) - 1)
+    return np.where(t - values[i - 1] <= values[i] - t, i - 1, i)
+
+def _longest_fit(beat_times, start, tolerance):
+    """End (exclusive) of the longest run from start that one line fits within tolerance"""
+    def fits(end):
+        index = np.arange(end - start)
+        slope, intercept = np.polyfit(index, beat_times[start:end], 1)
+        return np.abs(beat_times[start:end] - (intercept + slope * index)).max() <= tolerance
+
+    n = len(beat_times)
+    good, step = min(start + 2, n), 2
+    # Gallop, then binary search between the last fit and the first miss
+    while good < n:
+        probe = min(start + step * 2, n)
+        if not fits(probe):
+            bad = probe
+            break
+        good, step = probe, step * 2
+    else:
+        return good
+    while bad - good > 1:
+        middle = (good + bad) // 2
+        if fits(middle):
+            good = middle
+        else:
+            bad = middle
+    return good
+
+def first_downbeat_index(beat_times, downbeats, beats_per_bar=4):
+    """Bar phase: index (mod beats_per_bar) of the beat nearest the first downbeat"""
+    if downbeats is None or len(downbeats) == 0 or len(beat_times) == 0:
+        return 0
+    return int(np.abs(np.asarray(beat_times) - downbeats[0]).argmin()) % beats_per_bar
+
+def encode_beats(beat_times, sample_rate=44100, downbeats=None, beats_per_bar=4, tolerance=0.01,
+                 first_downbeat=None):
+    """
+    Binary beatgrid of detected beats, with the bar phase taken from
+    downbeats unless first_downbeat gives it directly
+    """
+    if first_downbeat is None:
+        first_downbeat = first_downbeat_index(beat_times, downbeats, beats_per_bar)
+    return BeatGrid.from_beats(
+        beat_times, tolerance=tolerance, sample_rate=sample_rate, beats_per_bar=beats_per_bar,
+        first_downbeat=first_downbeat
+    ).to_bytes()
+
+def decode_beats(data):
+    """Beat times of a binary beatgrid, or of a legacy raw float64 array"""
+    if not data:
+        return np.empty(0, dtype=np.float64)
+    if data[:4] == MAGIC:
+        return BeatGrid.from_bytes(data).times()
+    return np.frombuffer(data, dtype=np.float64)
@@ -0,0 +1,59 @@
+import numpy as np
+
+class BlockSource:
+    """
+    Array-like view of a signal that is produced block by block.
+    blocks(start) must yield consecutive float32 blocks beginning at
+    sample start. Supports len() and contiguous slicing: forward reads
+    continue the generator, reads before the retained history (or far
+    ahead of it) restart it at the requested sample.
+    """
+    def __init__(self, length, blocks, history=65536):
+        self.length = length
+        self.blocks = blocks
+        self.history = history
+        self._gen = None
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._buf_start = 0
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop, step = key.indices(self.length)
+        if step != 1:
+            raise ValueError('BlockSource only supports contiguous slices')
+        if stop <= start:
+            return np.zeros(0, dtype=np.float32)
+
+        buf_end = self._buf_start + len(self._buf)
+        if self._gen is None or start < self._buf_start or start > buf_end + self.history:
+            self._restart(start)
+
+        parts = [self._buf]
+        buf_end = self._buf_start + len(self._buf)
+        while buf_end < stop:
+            block = next(self._gen, None)
+            if block is None:
+                # Generator ended early; the rest of the signal is silence
+                block = np.zeros(stop - buf_end, dtype=np.float32)
+            parts.append(block)
+            buf_end += len(block)
+        if len(parts) > 1:
+            self._buf = np.concatenate(parts)
+
+        out = self._buf[start - self._buf_start:stop - self._buf_start].copy()
+
+        # Keep only the history needed for overlapping reads
+        drop = start - self.history - self._buf_start
+        if drop > 0:
+            self._buf = self._buf[drop:]
+            self._buf_start += drop
+        return out
+
+    def _restart(self, start):
+        self._gen = iter(self.blocks(start))
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._buf_start = start
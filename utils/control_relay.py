@@ -0,0 +1,164 @@
+import threading
+import time
+from config import Config
+from extensions import socketio
+from utils.metrics import SOCKET_EVENTS, metrics
+
+def _diff(old, new):
+    """Fields of new that differ from old, recursing into nested dicts"""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+    changed = {}
+    for key, value in new.items():
+        if key not in old:
+            changed[key] = value
+        elif old[key] != value:
+            changed[key] = _diff(old[key], value)
+    return changed
+
+class RoomStats:
+    """Event counters for one room, reported as events per second over the last window"""
+    def __init__(self):
+        self.clients = set()
+        self.received = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.delivered = 0  # messages x recipients
+        self.rates = {}
+
+    def roll(self, elapsed):
+        self.rates = {
+            'received_per_s': self.received / elapsed,
+            'sent_per_s': self.sent / elapsed,
+            'coalesced_per_s': self.coalesced / elapsed,
+            'delivered_per_s': self.delivered / elapsed
+        }
+        self.received = self.sent = self.coalesced = self.delivered = 0
+
+class ControlRelay:
+    """
+    Room-scoped fan-out of deck control events.
+    Each client joins the room of its mixing session and updates only
+    reach that room. High-frequency controls are coalesced: only the
+    latest value per control is kept and flushed once per tick (tick_hz),
+    and full deck states are sent as deltas against what the room last
+    received. Per-room event rates are kept for stats().
+    """
+    def __init__(self, socketio, tick_hz=30, stats_window=1.0):
+        self.socketio = socketio
+        self.interval = 1.0 / tick_hz
+        self.stats_window = stats_window
+        self.pending = {}  # room -> {(event, key): (data, sid)}
+        self.sent_state = {}  # room -> last deck state sent
+        self.rooms = {}  # room -> RoomStats
+        self._lock = threading.Lock()
+        self._ticker = None
+        self._window_start = time.monotonic()
+
+    def join(self, room, sid):
+        with self._lock:
+            self.rooms.setdefault(room, RoomStats()).clients.add(sid)
+
+    def leave(self, room, sid):
+        with self._lock:
+            stats = self.rooms.get(room)
+            if stats is None:
+                return
+            stats.clients.discard(sid)
+            if not stats.clients:
+                del self.rooms[room]
+                self.pending.pop(room, None)
+                self.sent_state.pop(room, None)
+
+    def submit(self, room, event, data, sid, key=None):
+        """Queue an update for the next tick, replacing any pending value of the same control"""
+        with self._lock:
+            stats = self.rooms.setdefault(room, RoomStats())
+            stats.received += 1
+            updates = self.pending.setdefault(room, {})
+            coalesced = (event, key) in updates
+            if coalesced:
+                stats.coalesced += 1
+            updates[(event, key)] = (data, sid)
+        SOCKET_EVENTS.inc(event=event, direction='received')
+        if coalesced:
+            SOCKET_EVENTS.inc(event=event, direction='coalesced')
+        self._start()
+
+    def send(self, room, event, data, sid):
+        """Relay a discrete (non-coalesced) event to the room right away"""
+        with self._lock:
+            stats = self.rooms.setdefault(room, RoomStats())
+            stats.received += 1
+        SOCKET_EVENTS.inc(event=event, direction='received')
+        self._emit(room, event, data, sid)
+
+    def snapshot(self, room):
+        """Last full deck state sent to a room, for clients joining late"""
+        with self._lock:
+            return self.sent_state.get(room)
+
+    def flush(self):
+        """Emit every room's pending updates"""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        for room, updates in pending.items():
+            for (event, _), (data, sid) in updates.items():
+                if event == 'deck_update':
+                    data = self._delta(room, data)
+                    if not data:
+                        continue
+                self._emit(room, event, data, sid)
+
+    def stats(self):
+        """{room: {clients, received/sent/coalesced/delivered per second}}"""
+        with self._lock:
+            self._roll()
+            return {
+                room: dict(stats.rates, clients=len(stats.clients))
+                for room, stats in self.rooms.items()
+            }
+
+    def _delta(self, room, state):
+        with self._lock:
+            previous = self.sent_state.get(room)
+            self.sent_state[room] = state
+        if previous is None:
+            return state
+        return _diff(previous, state)
+
+    def _emit(self, room, event, data, sid):
+        self.socketio.emit(event, data, to=room, skip_sid=sid)
+        SOCKET_EVENTS.inc(event=event, direction='sent')
+        with self._lock:
+            stats = self.rooms.get(room)
+            if stats:
+                stats.sent += 1
+                stats.delivered += max(len(stats.clients) - 1, 0)
+            self._roll()
+
+    def _roll(self):
+        """Close the stats window once it has elapsed (caller holds the lock)"""
+        elapsed = time.monotonic() - self._window_start
+        if elapsed >= self.stats_window:
+            for stats in self.rooms.values():
+                stats.roll(elapsed)
+            self._window_start += elapsed
+
+    def _start(self):
+        with self._lock:
+            if self._ticker is not None:
+                return
+            self._ticker = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            self.flush()
+
+control_relay = ControlRelay(socketio, tick_hz=Config.SOCKET_TICK_HZ)
+
+metrics.gauge('socketio_rooms', 'Session rooms with connected clients',
+              collect=lambda: len(control_relay.rooms))
+metrics.gauge('socketio_clients', 'Connected Socket.IO clients',
+              collect=lambda: sum(len(stats.clients) for stats in list(control_relay.rooms.values())))
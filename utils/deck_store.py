@@ -0,0 +1,158 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+from extensions import db
+from models.deck_state import DeckState
+from utils.beatgrid import decode_beats, encode_beats
+
+def new_state_id():
+    return uuid.uuid4().hex
+
+def _compact(deck):
+    """Copy of a deck with beat_times as a float64 array"""
+    deck = dict(deck)
+    if deck.get('beat_times') is not None:
+        deck['beat_times'] = np.asarray(deck['beat_times'], dtype=np.float64)
+    return deck
+
+class DeckStore:
+    """
+    Server-side deck state, keyed by a per-session state ID.
+    The Flask session only carries the state ID; each deck holds
+    video_id, bpm, duration and beat_times (float64 array), or
+    video_id and job_id while a background load is running.
+    Idle states expire after ttl seconds.
+    """
+    def __init__(self, ttl=6 * 3600):
+        self.ttl = ttl
+
+    def get(self, state_id, deck_id):
+        raise NotImplementedError
+
+    def put(self, state_id, deck_id, deck):
+        raise NotImplementedError
+
+    def clear(self, state_id):
+        raise NotImplementedError
+
+    def loaded_video_ids(self):
+        """Video IDs on any live deck (pinned by the storage manager)"""
+        raise NotImplementedError
+
+class MemoryDeckStore(DeckStore):
+    """Deck state in a process-local dict"""
+    def __init__(self, ttl=6 * 3600):
+        super().__init__(ttl)
+        self.states = {}
+        self._lock = threading.Lock()
+
+    def get(self, state_id, deck_id):
+        with self._lock:
+            self._prune()
+            state = self.states.get(state_id)
+            if state is None:
+                return None
+            state['expires'] = time.time() + self.ttl
+            deck = state['decks'].get(deck_id)
+            return dict(deck) if deck else None
+
+    def put(self, state_id, deck_id, deck):
+        with self._lock:
+            self._prune()
+            state = self.states.setdefault(state_id, {'decks': {}})
+            state['decks'][deck_id] = _compact(deck)
+            state['expires'] = time.time() + self.ttl
+
+    def clear(self, state_id):
+        with self._lock:
+            self.states.pop(state_id, None)
+
+    def loaded_video_ids(self):
+        with self._lock:
+            self._prune()
+            return {
+                deck['video_id']
+                for state in self.states.values()
+                for deck in state['decks'].values()
+            }
+
+    def _prune(self):
+        now = time.time()
+        for state_id in [s for s, state in self.states.items() if state['expires'] < now]:
+            del self.states[state_id]
+
+class SQLDeckStore(DeckStore):
+    """
+    Deck state in the DeckState table, shared by all worker processes.
+    Must be used inside an application context.
+    """
+    def get(self, state_id, deck_id):
+        entry = DeckState.query.filter_by(state_id=state_id, deck_id=deck_id).first()
+        if entry is None:
+            return None
+        if entry.updated_at < datetime.utcnow() - timedelta(seconds=self.ttl):
+            self._prune()
+            return None
+        
+        entry.updated_at = datetime.utcnow()
+        db.session.commit()
+        return self._to_dict(entry)
+
+    def put(self, state_id, deck_id, deck):
+        entry = DeckState.query.filter_by(state_id=state_id, deck_id=deck_id).first()
+        if entry is None:
+            entry = DeckState(state_id=state_id, deck_id=deck_id)
+            db.session.add(entry)
+        
+        deck = _compact(deck)
+        entry.video_id = deck['video_id']
+        entry.job_id = deck.get('job_id')
+        entry.bpm = deck.get('bpm')
+        entry.duration = deck.get('duration')
+        beat_times = deck.get('beat_times')
+        entry.beat_times = encode_beats(beat_times) if beat_times is not None else None
+        entry.updated_at = datetime.utcnow()
+        db.session.commit()
+        
+        self._prune()
+
+    def clear(self, state_id):
+        DeckState.query.filter_by(state_id=state_id).delete()
+        db.session.commit()
+
+    def loaded_video_ids(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        rows = db.session.query(DeckState.video_id).filter(
+            DeckState.updated_at >= cutoff
+        ).distinct()
+        return {video_id for video_id, in rows}
+
+    def _prune(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        DeckState.query.filter(DeckState.updated_at < cutoff).delete()
+        db.session.commit()
+
+    def _to_dict(self, entry):
+        deck = {'video_id': entry.video_id}
+        if entry.job_id:
+            deck['job_id'] = entry.job_id
+            return deck
+        deck.update({
+            'bpm': entry.bpm,
+            'duration': entry.duration,
+            'beat_times': decode_beats(entry.beat_times)
+        })
+        return deck
+
+DECK_STORES = {
+    'memory': MemoryDeckStore,
+    'sql': SQLDeckStore
+}
+
+def create_deck_store(backend='memory', ttl=6 * 3600):
+    """Build the deck store for the DECK_STATE_BACKEND setting"""
+    if backend not in DECK_STORES:
+        raise ValueError(f"Unknown deck state backend: {backend}")
+    return DECK_STORES[backend](ttl=ttl)
@@ -0,0 +1,243 @@
+from functools import lru_cache
+import numpy as np
+from scipy import signal
+
+FILTER_KINDS = ('lowpass', 'highpass', 'bandpass')
+
+@lru_cache(maxsize=1024)
+def filter_sos(kind, cutoff, sample_rate, order=4):
+    """Butterworth second-order sections, cached per (kind, cutoff, rate, order)"""
+    nyquist = sample_rate / 2
+    if kind == 'lowpass':
+        return signal.butter(order, cutoff / nyquist, btype='low', output='sos')
+    if kind == 'highpass':
+        return signal.butter(order, cutoff / nyquist, btype='high', output='sos')
+    if kind == 'bandpass':
+        band = [_clip_freq(cutoff / 2, sample_rate) / nyquist, _clip_freq(cutoff * 1.5, sample_rate) / nyquist]
+        return signal.butter(order, band, btype='band', output='sos')
+    raise ValueError(f"Unknown filter type: {kind}")
+
+@lru_cache(maxsize=1024)
+def eq_sos(low_db, mid_db, high_db, sample_rate, low_freq=250.0, mid_freq=1000.0,
+           high_freq=4000.0, mid_q=0.7):
+    """Three biquads (low shelf, mid peak, high shelf) as second-order sections"""
+    return np.vstack([
+        _biquad('lowshelf', low_freq, low_db, sample_rate),
+        _biquad('peaking', mid_freq, mid_db, sample_rate, mid_q),
+        _biquad('highshelf', high_freq, high_db, sample_rate)
+    ])
+
+def _biquad(kind, freq, gain_db, sample_rate, q=0.7071):
+    """RBJ audio EQ cookbook biquad as one normalized SOS row"""
+    a = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * freq / sample_rate
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2 * q)
+    sqrt_a = np.sqrt(a)
+
+    if kind == 'peaking':
+        b = [1 + alpha * a, -2 * cos_w0, 1 - alpha * a]
+        den = [1 + alpha / a, -2 * cos_w0, 1 - alpha / a]
+    elif kind == 'lowshelf':
+        b = [a * ((a + 1) - (a - 1) * cos_w0 + 2 * sqrt_a * alpha),
+             2 * a * ((a - 1) - (a + 1) * cos_w0),
+             a * ((a + 1) - (a - 1) * cos_w0 - 2 * sqrt_a * alpha)]
+        den = [(a + 1) + (a - 1) * cos_w0 + 2 * sqrt_a * alpha,
+               -2 * ((a - 1) + (a + 1) * cos_w0),
+               (a + 1) + (a - 1) * cos_w0 - 2 * sqrt_a * alpha]
+    else:
+        b = [a * ((a + 1) + (a - 1) * cos_w0 + 2 * sqrt_a * alpha),
+             -2 * a * ((a - 1) + (a + 1) * cos_w0),
+             a * ((a + 1) + (a - 1) * cos_w0 - 2 * sqrt_a * alpha)]
+        den = [(a + 1) - (a - 1) * cos_w0 + 2 * sqrt_a * alpha,
+               2 * ((a - 1) - (a + 1) * cos_w0),
+               (a + 1) - (a - 1) * cos_w0 - 2 * sqrt_a * alpha]
+    return np.array(b + den) / den[0]
+
+def _clip_freq(freq, sample_rate):
+    """Keep a frequency inside (10 Hz, 0.99 * Nyquist)"""
+    return min(max(float(freq), 10.0), sample_rate / 2 * 0.99)
+
+def _round_freq(freq):
+    """3 significant digits, so sweeps reuse cached designs"""
+    return float(f'{freq:.3g}')
+
+class Effect:
+    """
+    A stateful block processor.
+    automation maps a parameter name to (seconds, value) breakpoints;
+    EffectsChain sets the interpolated value at the start of every block.
+    """
+    name = None
+
+    def __init__(self, sample_rate=44100, automation=None):
+        self.sample_rate = sample_rate
+        self.automation = automation or {}
+
+    def set(self, **params):
+        for key, value in params.items():
+            setattr(self, key, value)
+
+    def automate(self, seconds):
+        if self.automation:
+            self.set(**{
+                param: float(np.interp(seconds, [t for t, _ in points], [v for _, v in points]))
+                for param, points in self.automation.items()
+            })
+
+    def process(self, block):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+class _SOSEffect(Effect):
+    """Runs sosfilt with state carried from block to block"""
+    def __init__(self, sample_rate=44100, automation=None):
+        super().__init__(sample_rate, automation)
+        self._zi = None
+
+    def sos(self):
+        raise NotImplementedError
+
+    def process(self, block):
+        sos = self.sos()
+        if self._zi is None or self._zi.shape[0] != sos.shape[0]:
+            self._zi = np.zeros((sos.shape[0], 2))
+        out, self._zi = signal.sosfilt(sos, block, zi=self._zi)
+        return out.astype(np.float32, copy=False)
+
+    def reset(self):
+        self._zi = None
+
+class Filter(_SOSEffect):
+    """Butterworth lowpass/highpass/bandpass (cutoff is the band centre for bandpass)"""
+    name = 'filter'
+
+    def __init__(self, kind='lowpass', cutoff=1000.0, order=4, sample_rate=44100, automation=None):
+        super().__init__(sample_rate, automation)
+        if kind not in FILTER_KINDS:
+            raise ValueError(f"Unknown filter type: {kind}")
+        self.kind = kind
+        self.cutoff = cutoff
+        self.order = order
+
+    def sos(self):
+        cutoff = _round_freq(_clip_freq(self.cutoff, self.sample_rate))
+        return filter_sos(self.kind, cutoff, self.sample_rate, self.order)
+
+class ThreeBandEQ(_SOSEffect):
+    """DJ-style low/mid/high EQ; gains in dB"""
+    name = 'eq'
+
+    def __init__(self, low=0.0, mid=0.0, high=0.0, sample_rate=44100, automation=None):
+        super().__init__(sample_rate, automation)
+        self.low = low
+        self.mid = mid
+        self.high = high
+
+    def sos(self):
+        # Quarter-dB steps keep the coefficient cache small during sweeps
+        return eq_sos(round(self.low * 4) / 4, round(self.mid * 4) / 4,
+                      round(self.high * 4) / 4, self.sample_rate)
+
+class Gain(Effect):
+    """Gain in dB, ramped across each block to avoid zipper noise"""
+    name = 'gain'
+
+    def __init__(self, db=0.0, sample_rate=44100, automation=None):
+        super().__init__(sample_rate, automation)
+        self.db = db
+        self._last = None
+
+    def process(self, block):
+        gain = 10 ** (self.db / 20)
+        start = gain if self._last is None else self._last
+        self._last = gain
+        if start == gain:
+            return (block * np.float32(gain)).astype(np.float32, copy=False)
+        ramp = np.linspace(start, gain, len(block), endpoint=False, dtype=np.float32)
+        return block * ramp
+
+    def reset(self):
+        self._last = None
+
+EFFECTS = {effect.name: effect for effect in (Filter, ThreeBandEQ, Gain)}
+
+class EffectsChain:
+    """
+    Effects applied in order to consecutive blocks of one signal.
+    Parameter automation is evaluated once per block, filter
+    coefficients come from a cache and filter state carries over between
+    blocks, so a full render is a single linear, constant-memory pass.
+    """
+    def __init__(self, effects=None, sample_rate=44100):
+        self.effects = list(effects or [])
+        self.sample_rate = sample_rate
+        self.position = 0  # frames processed so far
+
+    @classmethod
+    def from_spec(cls, specs, sample_rate=44100):
+        """
+        Build a chain from JSON-style specs, e.g.
+        [{'type': 'filter', 'kind': 'lowpass', 'cutoff': 800,
+          'automation': {'cutoff': [[0, 200], [8, 18000]]}}]
+        """
+        effects = []
+        for spec in specs or []:
+            if not isinstance(spec, dict):
+                raise ValueError(f"Effect spec must be an object, not {spec!r}")
+            params = dict(spec)
+            kind = params.pop('type', None)
+            if kind not in EFFECTS:
+                raise ValueError(f"Unknown effect: {kind}")
+            effects.append(EFFECTS[kind](sample_rate=sample_rate, **params))
+        return cls(effects, sample_rate)
+
+    def process(self, block):
+        seconds = self.position / self.sample_rate
+        self.position += len(block)
+        for effect in self.effects:
+            effect.automate(seconds)
+            block = effect.process(block)
+        return np.asarray(block, dtype=np.float32)
+
+    def seek(self, frame):
+        """Restart at frame with cleared filter state"""
+        self.position = frame
+        for effect in self.effects:
+            effect.reset()
+
+    def apply(self, audio_data, block_size=2048):
+        """Process a whole signal block by block into one output array"""
+        self.seek(0)
+        out = np.empty(len(audio_data), dtype=np.float32)
+        for start in range(0, len(audio_data), block_size):
+            end = min(start + block_size, len(audio_data))
+            out[start:end] = self.process(audio_data[start:end])
+        return out
+
+def deck_chains(spec, sample_rate=44100):
+    """(chain_a, chain_b) from {'a': [...], 'b': [...]} effect specs; None where unset"""
+    spec = spec or {}
+    if not isinstance(spec, dict):
+        raise ValueError("Effects must map decks 'a' and 'b' to lists of effect specs")
+    return tuple(
+        EffectsChain.from_spec(spec[deck], sample_rate) if spec.get(deck) else None
+        for deck in ('a', 'b')
+    )
+
+def check_effects(spec, sample_rate=44100):
+    """
+    Raise ValueError if deck effect specs cannot be built, or if their
+    chains fail on audio (bad parameter values or automation points),
+    so requests are rejected before any track is loaded or rendered
+    """
+    try:
+        for chain in deck_chains(spec, sample_rate):
+            if chain is not None:
+                chain.process(np.zeros(64, dtype=np.float32))
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(str(e)) from e
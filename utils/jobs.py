@@ -0,0 +1,277 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from flask import current_app, has_request_context, session
+from config import Config
+from extensions import db, socketio
+from models.job import JobRecord
+from utils.metrics import SOCKET_EVENTS, metrics
+
+# Set in analysis worker processes by _init_worker
+_progress_queue = None
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+    # Stage timings and counters recorded here are applied in the parent
+    metrics.forward_to(lambda name, labels, value: progress_queue.put((None, (name, labels, value))))
+
+def _call_in_worker(job_id, fn, args):
+    """Run fn in a worker process, forwarding stage updates to the parent"""
+    def progress(stage):
+        _progress_queue.put((job_id, stage))
+    return fn(*args, progress=progress)
+
+JOBS = metrics.counter('jobs_total', 'Background jobs finished, by kind and status', ('kind', 'status'))
+JOB_SECONDS = metrics.histogram('job_duration_seconds', 'Background job run time', ('kind',))
+
+class Job:
+    def __init__(self, kind, room=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.room = room  # Socket.IO room that receives progress, None = everyone
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.result = None
+        self.error = None
+        self.detail = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'result': self.result,
+            'error': self.error,
+            'detail': self.detail,
+            'created': self.created_at,
+            'updated': self.updated_at
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        """Read-only copy of a job another worker process runs (JobRecord row)"""
+        job = cls(record.kind)
+        job.id = record.id
+        job.status = record.status
+        job.stage = record.stage
+        job.result = json.loads(record.result) if record.result else None
+        job.error = record.error
+        job.detail = json.loads(record.detail) if record.detail else None
+        job.created_at = record.created_at
+        job.updated_at = record.updated_at
+        return job
+
+def _to_json(value):
+    return json.dumps(value, default=lambda o: o.tolist() if hasattr(o, 'tolist') else str(o))
+
+class JobManager:
+    """
+    Background jobs for downloads, analysis and mix rendering.
+    Each job runs in a bounded thread pool (I/O-bound downloads) and hands
+    CPU-bound work to a bounded process pool via run_cpu(). Stage changes
+    are emitted as 'job_progress' Socket.IO events to the submitting
+    session's room. With the 'sql' backend every stage change is also
+    written to the JobRecord table, so get() finds jobs submitted to
+    any worker process.
+    """
+    def __init__(self, socketio, download_workers=4, analysis_workers=None, job_ttl=3600,
+                 backend='memory'):
+        if backend not in ('memory', 'sql'):
+            raise ValueError(f"Unknown job state backend: {backend}")
+        self.socketio = socketio
+        self.download_workers = download_workers
+        self.analysis_workers = analysis_workers or os.cpu_count() or 1
+        self.job_ttl = job_ttl
+        self.backend = backend
+        self.jobs = {}
+        self._app = None
+        self._lock = threading.Lock()
+        self._thread_pool = None
+        self._process_pool = None
+        self._progress_queue = None
+
+    def submit(self, kind, fn, *args):
+        """
+        Run fn(job, *args) in the background and return the Job immediately.
+        fn runs inside the current application context; its return value
+        becomes job.result. Progress goes to the submitting session's room.
+        """
+        app = current_app._get_current_object()
+        room = session.get('deck_state_id') if has_request_context() else None
+        job = Job(kind, room)
+        with self._lock:
+            self._app = app
+            self._prune()
+            self.jobs[job.id] = job
+        self._save(job, prune=True)
+
+        self._threads().submit(self._run, app, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None and self.backend == 'sql' and job_id:
+            record = db.session.get(JobRecord, job_id)
+            if record is not None:
+                job = Job.from_record(record)
+        return job
+
+    def update(self, job, stage, status='running', detail=None):
+        """Record a stage change and send it to the job's room"""
+        job.stage = stage
+        job.status = status
+        if detail is not None:
+            job.detail = detail
+        job.updated_at = time.time()
+        self._save(job)
+        self.socketio.emit('job_progress', job.to_dict(), to=job.room)
+        SOCKET_EVENTS.inc(event='job_progress', direction='sent')
+
+    def submit_cpu(self, job, fn, *args):
+        """Queue fn(*args, progress=...) in the process pool and return its future"""
+        return self._processes().submit(_call_in_worker, job.id, fn, args)
+
+    def run_cpu(self, job, fn, *args):
+        """Run fn(*args, progress=...) in the process pool and wait for it"""
+        return self.submit_cpu(job, fn, *args).result()
+
+    def callbacks(self, job):
+        """(progress, run_cpu) hooks for TrackPipeline; (None, None) runs inline"""
+        if job is None:
+            return None, None
+        progress = lambda stage: self.update(job, stage)
+        run_cpu = lambda fn, *args: self.run_cpu(job, fn, *args)
+        return progress, run_cpu
+
+    def estimates(self, job):
+        """
+        on_estimate hook for TrackPipeline.analyze: publishes provisional
+        tempo/beats as the job's detail (job_progress event and job status)
+        """
+        if job is None:
+            return None
+        def publish(estimate):
+            self.update(job, job.stage, detail={'estimate': {
+                'bpm': float(estimate['bpm']),
+                'beat_times': [float(t) for t in estimate['beat_times']],
+                'seconds_analyzed': estimate['seconds_analyzed'],
+                'final': estimate['final']
+            }})
+        return publish
+
+    def shutdown(self):
+        if self._thread_pool:
+            self._thread_pool.shutdown(wait=False)
+        if self._process_pool:
+            self._process_pool.shutdown(wait=False)
+        if self._progress_queue:
+            self._progress_queue.put(None)
+
+    def _save(self, job, prune=False):
+        """Write the job's state to the JobRecord table (sql backend)"""
+        if self.backend != 'sql' or self._app is None:
+            return
+        with self._app.app_context():
+            try:
+                record = db.session.get(JobRecord, job.id)
+                if record is None:
+                    record = JobRecord(id=job.id, kind=job.kind, created_at=job.created_at)
+                    db.session.add(record)
+                record.status = job.status
+                record.stage = job.stage
+                record.result = None if job.result is None else _to_json(job.result)
+                record.error = job.error
+                record.detail = None if job.detail is None else _to_json(job.detail)
+                record.updated_at = job.updated_at
+                if prune:
+                    JobRecord.query.filter(
+                        JobRecord.status.in_(('done', 'failed')),
+                        JobRecord.updated_at < time.time() - self.job_ttl
+                    ).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error saving job {job.id}: {e}")
+
+    def _run(self, app, job, fn, args):
+        with app.app_context():
+            try:
+                job.result = fn(job, *args)
+                self.update(job, 'done', status='done')
+            except Exception as e:
+                traceback.print_exc()
+                job.error = str(e)
+                self.update(job, 'failed', status='failed')
+            JOBS.inc(kind=job.kind, status=job.status)
+            JOB_SECONDS.observe(job.updated_at - job.created_at, kind=job.kind)
+
+    def _threads(self):
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.download_workers,
+                    thread_name_prefix='job'
+                )
+            return self._thread_pool
+
+    def _processes(self):
+        with self._lock:
+            if self._process_pool is None:
+                self._progress_queue = multiprocessing.Queue()
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.analysis_workers,
+                    initializer=_init_worker,
+                    initargs=(self._progress_queue,)
+                )
+                threading.Thread(
+                    target=self._forward_progress,
+                    name='job-progress',
+                    daemon=True
+                ).start()
+            return self._process_pool
+
+    def _forward_progress(self):
+        """Relay stage updates from worker processes to Socket.IO, and their metrics"""
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                break
+            job_id, payload = message
+            if job_id is None:
+                metrics.apply(*payload)
+                continue
+            job = self.get(job_id)
+            if job and not job.finished:
+                self.update(job, payload)
+
+    def _prune(self):
+        """Forget finished jobs older than job_ttl (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+job_manager = JobManager(
+    socketio,
+    download_workers=Config.JOB_DOWNLOAD_WORKERS,
+    analysis_workers=Config.JOB_ANALYSIS_WORKERS,
+    job_ttl=Config.JOB_TTL,
+    backend=Config.JOB_STATE_BACKEND
+)
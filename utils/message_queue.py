@@ -0,0 +1,49 @@
+import copy
+import queue
+import threading
+from socketio import PubSubManager
+
+class LocalQueueManager(PubSubManager):
+    """
+    In-process stand-in for a Socket.IO message queue.
+    Every manager on the same channel in this process receives each
+    published message, the same way workers sharing a Redis or AMQP queue
+    do, so multi-worker fan-out can be exercised without a broker.
+    """
+    name = 'local'
+    _channels = {}
+    _channels_lock = threading.Lock()
+
+    def __init__(self, channel='socketio', write_only=False, logger=None, poll_interval=0.01):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue()
+        with self._channels_lock:
+            self._channels.setdefault(channel, []).append(self._queue)
+
+    def _publish(self, data):
+        with self._channels_lock:
+            subscribers = list(self._channels.get(self.channel, []))
+        for subscriber in subscribers:
+            subscriber.put(copy.deepcopy(data))
+
+    def _listen(self):
+        while True:
+            try:
+                yield self._queue.get_nowait()
+            except queue.Empty:
+                # Cooperative wait, so green threads keep running
+                self.server.sleep(self.poll_interval)
+
+def socketio_queue_options(url):
+    """
+    Socket.IO init_app() options for a message queue URL: local:// uses
+    LocalQueueManager, anything else (redis://, amqp://, kafka://, zmq+...)
+    is passed to Flask-SocketIO as message_queue. None means one process.
+    """
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        channel = url[len('local://'):] or 'socketio'
+        return {'client_manager': LocalQueueManager(channel=channel)}
+    return {'message_queue': url}
@@ -0,0 +1,324 @@
+import bisect
+import cProfile
+import functools
+import os
+import random
+import re
+import threading
+import time
+
+# Request and stage latencies range from sub-millisecond cache hits to
+# minute-long downloads and analyses
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """One metric family: a name, help text and a value per label set"""
+    kind = 'untyped'
+
+    def __init__(self, registry, name, help, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+                for key, value in values]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if self.registry.forward(self.name, labels, amount):
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    """
+    Current value per label set. With collect, values are read when the
+    metrics are rendered: collect() returns a number (no labels) or a
+    dict of {label values tuple: number}.
+    """
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help, labels=(), collect=None):
+        super().__init__(registry, name, help, labels)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        if self.collect is None:
+            return super()._samples()
+        try:
+            values = self.collect()
+        except Exception as e:
+            print(f"Metrics collect error for {self.name}: {e}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+                for key, value in sorted(values.items())]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if self.registry.forward(self.name, labels, value):
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (last is +Inf), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels):
+        """(count, sum) observed for a label set"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return (state[2], state[1]) if state else (0, 0.0)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class MetricsRegistry:
+    """
+    Process-wide metrics in the Prometheus text exposition format.
+    Counters and histograms updated in an analysis worker process are
+    sent to the parent through forward_to() instead of being recorded
+    locally, so /metrics covers work done in the process pool too.
+    """
+    def __init__(self, prefix='djmixer_'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._forward = None
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=(), collect=None):
+        return self._register(Gauge, name, help, labels, collect=collect)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, labels, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(self.prefix + name)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+    def forward_to(self, send):
+        """Send updates to send(name, labels, value) instead of recording them"""
+        self._forward = send
+
+    def forward(self, name, labels, value):
+        if self._forward is None:
+            return False
+        self._forward(name, labels, value)
+        return True
+
+    def apply(self, name, labels, value):
+        """Record an update forwarded from another process"""
+        metric = self._metrics.get(name)
+        if isinstance(metric, Counter):
+            metric.inc(value, **labels)
+        elif isinstance(metric, Histogram):
+            metric.observe(value, **labels)
+
+    def _register(self, cls, name, help, labels, **kwargs):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, help, labels, **kwargs)
+            return metric
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    'stage_duration_seconds', 'Time spent in each download and analysis stage', ('stage',)
+)
+CACHE_REQUESTS = metrics.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit/miss)', ('cache', 'result')
+)
+DOWNLOAD_BYTES = metrics.counter(
+    'download_bytes_total', 'Compressed audio bytes downloaded'
+)
+DECODED_SECONDS = metrics.counter(
+    'decoded_audio_seconds_total', 'Seconds of audio decoded from downloaded streams'
+)
+SOCKET_EVENTS = metrics.counter(
+    'socketio_events_total', 'Socket.IO events received, coalesced and sent', ('event', 'direction')
+)
+REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency until the response starts',
+    ('method', 'endpoint', 'status')
+)
+PROFILES_WRITTEN = metrics.counter(
+    'profiles_written_total', 'cProfile dumps written for slow sampled requests'
+)
+
+class span:
+    """
+    Time a stage into the stage_duration_seconds histogram, as a context
+    manager (with span('analyze.onset'): ...) or a decorator.
+    """
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self._start, stage=self.stage)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(self.stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+def cache_result(cache, value):
+    """Count a lookup as a hit or miss and return the looked up value"""
+    CACHE_REQUESTS.inc(cache=cache, result='miss' if value is None else 'hit')
+    return value
+
+class RequestProfiler:
+    """
+    Opt-in cProfile hook: a sample_rate fraction of requests is profiled
+    and the profile is dumped to folder when the request took at least
+    threshold seconds. One request is profiled at a time, since only one
+    profiler can be active per interpreter; under eventlet the profile
+    also contains whatever other green threads ran meanwhile.
+    """
+    def __init__(self, threshold, sample_rate=0.1, folder='profiles'):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.folder = folder
+        self._busy = threading.Lock()
+
+    def start(self):
+        """A running profiler for this request, or None if it is not sampled"""
+        if random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (a debugger, coverage) is already active
+            self._busy.release()
+            return None
+        return profiler
+
+    def stop(self, profiler, elapsed, label):
+        """Stop profiling; dump the stats if the request was slow"""
+        profiler.disable()
+        self._busy.release()
+        if elapsed < self.threshold:
+            return None
+        os.makedirs(self.folder, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'request'
+        path = os.path.join(self.folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{elapsed * 1000:.0f}ms-{name}.prof")
+        profiler.dump_stats(path)
+        PROFILES_WRITTEN.inc()
+        return path
+
+def instrument_app(app, profiler=None):
+    """Time every request into http_request_duration_seconds, profiling sampled slow ones"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_profiler = profiler.start() if profiler else None
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else '<unmatched>'
+        REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint,
+                                status=response.status_code)
+
+        running = g.pop('metrics_profiler', None)
+        if running:
+            path = profiler.stop(running, elapsed, f'{request.method} {request.path}')
+            if path:
+                print(f"Slow request {request.method} {request.path} ({elapsed:.3f}s) profiled to {path}")
+        return response
+
+    @app.teardown_request
+    def _stop_profiler(exc):
+        # Requests that raised never reach after_request
+        running = g.pop('metrics_profiler', None)
+        if running:
+            profiler.stop(running, 0.0, '')
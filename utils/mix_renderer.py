@@ -0,0 +1,125 @@
+import struct
+import numpy as np
+import soundfile as sf
+
+class MixRenderer:
+    """
+    Streaming crossfade renderer.
+    Reads both sources in fixed-size blocks, applies the gain curves per
+    block and yields float32 blocks, so memory stays constant regardless
+    of mix length. Track B starts fade_duration before track A ends.
+    Optional EffectsChains process each deck's signal before the fade;
+    their automation runs on that deck's own timeline.
+    """
+    def __init__(self, sample_rate=44100, block_size=2048):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+
+    def layout(self, len1, len2, fade_duration=2.0, cue1=None, cue2=0):
+        """Return (fade_len, start2, total_len) in samples"""
+        cue2 = min(max(cue2, 0), len2)
+        fade_len = max(0, min(int(self.sample_rate * fade_duration), len1, len2 - cue2))
+        if cue1 is None:
+            start2 = len1 - fade_len
+        else:
+            start2 = min(max(cue1, 0), len1)
+            fade_len = min(fade_len, len1 - start2)
+        return fade_len, start2, start2 + len2 - cue2
+
+    def render(self, audio1, audio2, fade_duration=2.0, curve='linear', start_frame=0,
+               effects1=None, effects2=None, cue1=None, cue2=0):
+        """Yield float32 blocks of audio1 crossfaded into audio2, from start_frame on"""
+        fade_len, start2, total_len = self.layout(len(audio1), len(audio2), fade_duration, cue1, cue2)
+        end1 = start2 + fade_len
+        cue2 = min(max(cue2, 0), len(audio2))
+        
+        # Seeking restarts the effects with cleared filter state
+        if effects1:
+            effects1.seek(min(start_frame, end1))
+        if effects2:
+            effects2.seek(cue2 + max(start_frame - start2, 0))
+
+        for start in range(start_frame, total_len, self.block_size):
+            end = min(start + self.block_size, total_len)
+            block = np.zeros(end - start, dtype=np.float32)
+
+            # Track A: full level until the fade starts, then fading out
+            hi = min(end, end1)
+            if start < hi:
+                gain = self._gain(start - start2, hi - start2, fade_len, curve, fade_in=False)
+                part = audio1[start:hi]
+                if effects1:
+                    part = effects1.process(part)
+                block[:hi - start] = part * gain
+
+            # Track B: fading in from start2, then full level
+            lo = max(start, start2)
+            if lo < end:
+                gain = self._gain(lo - start2, end - start2, fade_len, curve, fade_in=True)
+                part = audio2[cue2 + lo - start2:cue2 + end - start2]
+                if effects2:
+                    part = effects2.process(part)
+                block[lo - start:] += part * gain
+
+            yield block
+
+    def _gain(self, lo, hi, fade_len, curve, fade_in):
+        """Gain for positions lo..hi relative to the start of the fade"""
+        if hi <= 0 or lo >= fade_len:
+            # Block lies before the fade (track A) or after it (track B)
+            return np.float32(1.0)
+
+        position = np.clip((np.arange(lo, hi, dtype=np.float32) + 1) / (fade_len + 1), 0, 1)
+        if not fade_in:
+            position = 1 - position
+        if curve == 'equal_power':
+            return np.sin(position * (np.pi / 2)).astype(np.float32)
+        return position
+
+def write_wav(blocks, output_path, sample_rate):
+    """Stream float32 blocks into a WAV file; returns the number of frames"""
+    frames = 0
+    with sf.SoundFile(output_path, 'w', samplerate=sample_rate, channels=1, subtype='FLOAT') as f:
+        for block in blocks:
+            f.write(block)
+            frames += len(block)
+    return frames
+
+def wav_header(num_frames, sample_rate, channels=1):
+    """44-byte header for a float32 WAV with a known frame count"""
+    data_size = num_frames * channels * 4
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 3, channels, sample_rate,
+        sample_rate * channels * 4, channels * 4, 32,
+        b'data', data_size
+    )
+
+def wav_stream(render, num_frames, sample_rate, byte_range=None):
+    """
+    Yield a float32 WAV as bytes (header, then blocks) for chunked responses.
+    render(start_frame) must yield float32 blocks from that frame on.
+    byte_range=(start, stop) serves only that part of the file, so Range
+    requests seek without rendering the audio before them.
+    """
+    header = wav_header(num_frames, sample_rate)
+    start, stop = byte_range or (0, len(header) + num_frames * 4)
+
+    if start < len(header):
+        yield header[start:min(stop, len(header))]
+
+    data_start = max(start - len(header), 0)
+    remaining = stop - len(header) - data_start
+    if remaining <= 0:
+        return
+
+    first_frame, skip = divmod(data_start, 4)
+    for block in render(first_frame):
+        chunk = block.astype('<f4', copy=False).tobytes()[skip:]
+        skip = 0
+        if len(chunk) >= remaining:
+            yield chunk[:remaining]
+            return
+        remaining -= len(chunk)
+        yield chunk
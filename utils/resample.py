@@ -0,0 +1,57 @@
+from math import gcd
+import numpy as np
+from scipy import signal
+from utils.block_source import BlockSource
+
+def resample(audio_data, orig_sr, target_sr):
+    """Polyphase (anti-aliased) resampling of a whole signal to float32"""
+    if orig_sr == target_sr:
+        return np.asarray(audio_data, dtype=np.float32)
+    g = gcd(int(orig_sr), int(target_sr))
+    return signal.resample_poly(
+        np.asarray(audio_data, dtype=np.float32), int(target_sr) // g, int(orig_sr) // g
+    ).astype(np.float32)
+
+class Resampler:
+    """
+    Streaming polyphase resampler.
+    The input is processed in chunks whose length is a multiple of the
+    decimation factor, each with enough neighbouring samples to cover the
+    filter, so the output matches resampling the whole signal at once
+    while memory stays bounded. Seeking restarts at any output sample.
+    """
+    def __init__(self, audio_data, orig_sr, target_sr, chunk_size=16384):
+        g = gcd(int(orig_sr), int(target_sr))
+        self.audio_data = audio_data
+        self.up = int(target_sr) // g
+        self.down = int(orig_sr) // g
+        self.chunk = self.down * max(1, chunk_size // self.down)
+        # resample_poly's filter spans 10 * max(up, down) taps each side at the upsampled rate
+        context = 10 * max(self.up, self.down) / self.up + 1
+        self.pad = self.down * int(np.ceil(context / self.down))
+        self.length = -(-len(audio_data) * self.up // self.down)
+
+    def __len__(self):
+        return self.length
+
+    def blocks(self, start=0):
+        """Yield float32 output blocks from output sample start"""
+        n = len(self.audio_data)
+        chunk_out = self.chunk * self.up // self.down
+        index = start // chunk_out
+        skip = start - index * chunk_out
+
+        for s in range(index * self.chunk, n, self.chunk):
+            e = min(s + self.chunk, n)
+            lo, hi = max(s - self.pad, 0), min(e + self.pad, n)
+            y = signal.resample_poly(
+                np.asarray(self.audio_data[lo:hi], dtype=np.float32), self.up, self.down
+            )
+            offset = (s - lo) * self.up // self.down
+            count = min(chunk_out, self.length - s * self.up // self.down)
+            block = y[offset + skip:offset + count].astype(np.float32)
+            skip = 0
+            yield block
+
+    def source(self):
+        return BlockSource(self.length, self.blocks)
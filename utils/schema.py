@@ -0,0 +1,87 @@
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateColumn
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+def upgrade_schema():
+    """
+    Bring tables created by older versions up to the current models.
+    db.create_all() only creates missing tables, so columns added to a
+    model since are added here with ALTER TABLE, and columns a model no
+    longer requires lose their NOT NULL. Safe to run from several
+    workers at once: a change another worker made first is skipped.
+    Must be called inside an application context, after create_all().
+    """
+    for table in db.metadata.sorted_tables:
+        columns = _columns(table.name)
+        if columns is None:
+            continue
+
+        for column in table.columns:
+            if column.name not in columns:
+                _add_column(table, column)
+            elif column.nullable and not columns[column.name]['nullable']:
+                _drop_not_null(table, column)
+
+def _columns(table_name):
+    inspector = inspect(db.engine)
+    if not inspector.has_table(table_name):
+        return None
+    return {column['name']: column for column in inspector.get_columns(table_name)}
+
+def _add_column(table, column):
+    if column.primary_key or (not column.nullable and column.server_default is None):
+        raise RuntimeError(
+            f"Table {table.name} needs a {column.name} column that cannot be added to existing rows"
+        )
+    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+    preparer = db.engine.dialect.identifier_preparer
+    _execute(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}',
+             lambda: column.name in _columns(table.name))
+    logger.info("Added column %s.%s", table.name, column.name)
+
+def _drop_not_null(table, column):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        try:
+            _rebuild_sqlite_table(table)
+        except (OperationalError, ProgrammingError):
+            if not _columns(table.name)[column.name]['nullable']:
+                raise
+    else:
+        preparer = db.engine.dialect.identifier_preparer
+        name, column_name = preparer.format_table(table), preparer.format_column(column)
+        if dialect == 'mysql':
+            type_ = column.type.compile(dialect=db.engine.dialect)
+            statement = f'ALTER TABLE {name} MODIFY {column_name} {type_} NULL'
+        else:
+            statement = f'ALTER TABLE {name} ALTER COLUMN {column_name} DROP NOT NULL'
+        _execute(statement, lambda: _columns(table.name)[column.name]['nullable'])
+    logger.info("Made column %s.%s nullable", table.name, column.name)
+
+def _rebuild_sqlite_table(table):
+    """SQLite cannot alter a column's constraints: copy the rows into a fresh table"""
+    preparer = db.engine.dialect.identifier_preparer
+    name = preparer.format_table(table)
+    old = preparer.quote(f'_old_{table.name}')
+    columns = ', '.join(preparer.format_column(column) for column in table.columns)
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE {name} RENAME TO {old}'))
+        # Indexes keep their names when their table is renamed
+        for index in table.indexes:
+            connection.execute(text(f'DROP INDEX IF EXISTS {preparer.quote(index.name)}'))
+        table.create(connection)
+        connection.execute(text(f'INSERT INTO {name} ({columns}) SELECT {columns} FROM {old}'))
+        connection.execute(text(f'DROP TABLE {old}'))
+
+def _execute(statement, done):
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(text(statement))
+    except (OperationalError, ProgrammingError):
+        # Another worker may have applied the same change first
+        if not done():
+            raise
@@ -0,0 +1,93 @@
+import os
+import threading
+from config import Config
+from utils.storage import storage_manager
+
+class ServiceRegistry:
+    """
+    Process-wide services shared by the blueprints and the CLI, each
+    built on first use. Importing a route module constructs nothing;
+    the loader, processor and pipeline (and whatever they import) are
+    created once per process, the first time a request needs them.
+    """
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory):
+        self._factories[name] = factory
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._factories:
+            raise AttributeError(name)
+        return self.get(name)
+
+    def loaded(self):
+        """Names of the services constructed so far"""
+        return sorted(self._instances)
+
+    def reset(self, name=None):
+        """Forget one (or every) instance so it is rebuilt on next use"""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+def _youtube_loader():
+    from utils.youtube_dl import YouTubeLoader
+    return YouTubeLoader(temp_folder=Config.TEMP_AUDIO_FOLDER, storage=storage_manager)
+
+def _audio_processor():
+    from utils.audio_processor import AudioProcessor
+    return AudioProcessor()
+
+def _beat_detector():
+    from utils.beat_detector import BeatDetector
+    return BeatDetector(sample_rate=Config.RENDER_SAMPLE_RATE, analysis_sample_rate=Config.ANALYSIS_SAMPLE_RATE)
+
+def _analysis_cache():
+    from utils.analysis_cache import AnalysisCache
+    return AnalysisCache(max_entries=Config.ANALYSIS_CACHE_SIZE)
+
+def _track_store():
+    from utils.track_store import TrackStore
+    return TrackStore(os.path.join(Config.TEMP_AUDIO_FOLDER, 'tracks'), storage=storage_manager)
+
+def _track_pipeline():
+    from utils.track_pipeline import TrackPipeline
+    return TrackPipeline(
+        services.youtube_loader, services.audio_processor, services.analysis_cache,
+        services.track_store, block_size=Config.BUFFER_SIZE
+    )
+
+def _batch_analyzer():
+    from utils.batch_analyzer import BatchAnalyzer
+    return BatchAnalyzer(services.audio_processor, services.analysis_cache, Config.TEMP_AUDIO_FOLDER)
+
+def _deck_store():
+    from utils.deck_store import create_deck_store
+    return create_deck_store(Config.DECK_STATE_BACKEND, Config.DECK_STATE_TTL)
+
+services = ServiceRegistry()
+services.register('youtube_loader', _youtube_loader)
+services.register('audio_processor', _audio_processor)
+services.register('beat_detector', _beat_detector)
+services.register('analysis_cache', _analysis_cache)
+services.register('track_store', _track_store)
+services.register('track_pipeline', _track_pipeline)
+services.register('batch_analyzer', _batch_analyzer)
+services.register('deck_store', _deck_store)
+
+# Tracks loaded on a deck are never evicted
+storage_manager.add_pin_source(lambda: services.deck_store.loaded_video_ids())
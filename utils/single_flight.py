@@ -0,0 +1,88 @@
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key.
+    The first caller runs fn; callers arriving while it is in flight wait
+    for it and get the same result (or exception). Nothing is cached once
+    the call returns.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return (result, shared); shared is True for callers that waited"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class RefCounter:
+    """
+    Reference counts for shared resources.
+    release() runs the resource's pending cleanup only when the last
+    holder lets go; cleanup requested while it is held is deferred.
+    """
+    def __init__(self):
+        self._counts = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def release(self, key):
+        with self._lock:
+            count = self._counts.get(key, 0) - 1
+            if count > 0:
+                self._counts[key] = count
+                return
+            self._counts.pop(key, None)
+            # Cleanup runs under the lock so nobody acquires a half-removed resource
+            cleanup = self._pending.pop(key, None)
+            if cleanup:
+                cleanup()
+
+    def in_use(self, key):
+        with self._lock:
+            return self._counts.get(key, 0) > 0
+
+    def held(self):
+        """Keys with at least one reference"""
+        with self._lock:
+            return set(self._counts)
+
+    def cleanup(self, key, fn):
+        """Run fn now if key is unused, otherwise on its last release"""
+        with self._lock:
+            if self._counts.get(key, 0) > 0:
+                self._pending[key] = fn
+                return False
+            fn()
+            return True
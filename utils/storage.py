@@ -0,0 +1,228 @@
+import glob
+import logging
+import os
+import threading
+import time
+from config import Config
+from utils.track_store import TrackStore
+
+logger = logging.getLogger(__name__)
+
+class StorageManager:
+    """
+    Lifecycle of the audio artifacts on disk: downloaded sources in the
+    temp folder, decoded tracks in the track store and rendered mixes.
+    Every artifact is registered when written and touched when read;
+    once the total size exceeds quota_bytes the least recently used
+    artifacts are evicted. Tracks loaded on a deck or in use by a
+    renderer are pinned and never evicted. Leftover partial files are
+    reclaimed by scan() on startup.
+    """
+    def __init__(self, temp_folder='temp_audio', mix_folder=os.path.join('static', 'mixes'),
+                 quota_bytes=10 * 1024 ** 3):
+        self.temp_folder = temp_folder
+        self.mix_folder = mix_folder
+        self.quota_bytes = quota_bytes
+        self.tracks = TrackStore(os.path.join(temp_folder, 'tracks'))
+        self.entries = {}  # abs path -> {'category', 'size', 'last_access'}
+        self.pin_sources = []
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self._lock = threading.RLock()
+        os.makedirs(mix_folder, exist_ok=True)
+
+    def add_pin_source(self, fn):
+        """fn() returns video IDs whose downloads and tracks must be kept"""
+        self.pin_sources.append(fn)
+
+    def register(self, path, category=None):
+        """Record a newly written artifact and enforce the quota"""
+        path = os.path.abspath(path)
+        try:
+            size = self._size(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.entries[path] = {
+                'category': category or self._category(path),
+                'size': size,
+                'last_access': time.time()
+            }
+        self.enforce(keep=path)
+
+    def touch(self, path):
+        """Mark an artifact as used; returns False if it does not exist"""
+        path = os.path.abspath(path)
+        if not os.path.isfile(path):
+            self.forget(path)
+            return False
+        with self._lock:
+            if path not in self.entries:
+                self.entries[path] = {
+                    'category': self._category(path),
+                    'size': self._size(path),
+                    'last_access': time.time()
+                }
+            self.entries[path]['last_access'] = time.time()
+        return True
+
+    def forget(self, path):
+        with self._lock:
+            self.entries.pop(os.path.abspath(path), None)
+
+    def remove(self, path):
+        """Delete an artifact (tracks in use are removed on their last release)"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self.entries.pop(path, None)
+            category = entry['category'] if entry else self._category(path)
+            if category == 'track':
+                self.tracks.remove(self._video_id(path))
+            elif os.path.exists(path):
+                os.remove(path)
+            else:
+                return False
+        return True
+
+    def artifacts(self, category=None):
+        """Registered artifacts, most recently used first"""
+        with self._lock:
+            items = [
+                dict(entry, path=path)
+                for path, entry in self.entries.items()
+                if category is None or entry['category'] == category
+            ]
+        return sorted(items, key=lambda item: item['last_access'], reverse=True)
+
+    def usage(self):
+        with self._lock:
+            return sum(entry['size'] for entry in self.entries.values())
+
+    def enforce(self, keep=None):
+        """Evict least recently used, unpinned artifacts (except keep) until under quota"""
+        with self._lock:
+            excess = self.usage() - self.quota_bytes
+            if excess <= 0:
+                return 0
+
+            pinned = self._pinned()
+            freed = 0
+            for path, entry in sorted(self.entries.items(), key=lambda item: item[1]['last_access']):
+                if freed >= excess:
+                    break
+                if path == keep:
+                    continue
+                if entry['category'] != 'mix' and (pinned is None or self._video_id(path) in pinned):
+                    continue
+                self.remove(path)
+                freed += entry['size']
+                self.evictions += 1
+                self.evicted_bytes += entry['size']
+            return freed
+
+    def scan(self, orphan_age=300):
+        """
+        Rebuild the index from disk (on startup): reclaim partial writes
+        and track files missing their data or sidecar, register the rest
+        and enforce the quota. Returns the number of orphans removed.
+        Orphans modified in the last orphan_age seconds are left alone,
+        since another worker process may still be writing them.
+        """
+        orphans = glob.glob(os.path.join(self.temp_folder, '*.tmp'))
+        orphans += glob.glob(os.path.join(self.tracks.folder, '*.tmp'))
+        orphans += glob.glob(os.path.join(self.mix_folder, '*.tmp'))
+        for npy in glob.glob(os.path.join(self.tracks.folder, '*.npy')):
+            if not os.path.exists(npy[:-4] + '.json'):
+                orphans.append(npy)
+        for meta in glob.glob(os.path.join(self.tracks.folder, '*.json')):
+            if not os.path.exists(meta[:-5] + '.npy'):
+                orphans.append(meta)
+
+        cutoff = time.time() - orphan_age
+        orphans = [path for path in orphans if os.path.getmtime(path) < cutoff]
+        for path in orphans:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error removing orphaned file {path}: {e}")
+
+        files = [
+            path for path in glob.glob(os.path.join(self.temp_folder, '*'))
+            if os.path.isfile(path) and not path.endswith('.tmp')
+        ]
+        files += [
+            path for path in glob.glob(os.path.join(self.tracks.folder, '*.npy'))
+            if os.path.exists(path[:-4] + '.json')
+        ]
+        files += [
+            path for path in glob.glob(os.path.join(self.mix_folder, '*'))
+            if os.path.isfile(path) and not path.endswith('.tmp')
+        ]
+        with self._lock:
+            self.entries = {}
+            for path in files:
+                path = os.path.abspath(path)
+                stat = os.stat(path)
+                self.entries[path] = {
+                    'category': self._category(path),
+                    'size': self._size(path),
+                    'last_access': max(stat.st_atime, stat.st_mtime)
+                }
+        self.enforce()
+        return len(orphans)
+
+    def stats(self):
+        with self._lock:
+            pinned = self._pinned()
+            categories = {}
+            for entry in self.entries.values():
+                stats = categories.setdefault(entry['category'], {'files': 0, 'bytes': 0})
+                stats['files'] += 1
+                stats['bytes'] += entry['size']
+            return {
+                'used_bytes': self.usage(),
+                'quota_bytes': self.quota_bytes,
+                'files': len(self.entries),
+                'categories': categories,
+                'pinned': sorted(pinned) if pinned is not None else None,
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes
+            }
+
+    def _pinned(self):
+        """
+        Video IDs in use here or by another worker, or None if a pin
+        source cannot be read: then every track is treated as pinned.
+        """
+        pinned = set(self.tracks.in_use_ids())
+        for source in self.pin_sources:
+            try:
+                pinned.update(source())
+            except Exception:
+                logger.exception("Error reading pinned tracks; not evicting tracks")
+                return None
+        return pinned
+
+    def _category(self, path):
+        folder = os.path.dirname(path)
+        if folder == os.path.abspath(self.tracks.folder):
+            return 'track'
+        if folder == os.path.abspath(self.mix_folder) or os.path.basename(path).startswith('mixed_'):
+            return 'mix'
+        return 'download'
+
+    def _size(self, path):
+        """File size; tracks include their JSON sidecar"""
+        size = os.path.getsize(path)
+        if path.endswith('.npy') and os.path.exists(path[:-4] + '.json'):
+            size += os.path.getsize(path[:-4] + '.json')
+        return size
+
+    def _video_id(self, path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+storage_manager = StorageManager(
+    temp_folder=Config.TEMP_AUDIO_FOLDER,
+    mix_folder=Config.MIX_FOLDER,
+    quota_bytes=Config.STORAGE_QUOTA_BYTES
+)
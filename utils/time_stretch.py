@@ -0,0 +1,105 @@
+import numpy as np
+from scipy import signal
+from utils.block_source import BlockSource
+
+def tempo_ratio(target_bpm, source_bpm, low=0.75, high=1.5):
+    """
+    Stretch rate that plays source_bpm at target_bpm, folded by octaves
+    so half- and double-time detections still match.
+    """
+    rate = float(target_bpm) / float(source_bpm)
+    while rate < low:
+        rate *= 2
+    while rate > high:
+        rate /= 2
+    return rate
+
+class TimeStretcher:
+    """
+    Streaming WSOLA (waveform-similarity overlap-add) time stretcher.
+    rate > 1 speeds the audio up, pitch is unchanged. Each Hann-windowed
+    frame is taken near its nominal input position, shifted by up to
+    `search` samples to best match the natural continuation of the
+    previous frame, and overlap-added with 50% overlap. Only one frame of
+    overlap state is kept, so output is produced block by block.
+    Every `sync` frames the search restarts from the nominal position, so
+    seeking is exact: at most `sync` frames are re-run to resume anywhere.
+    """
+    def __init__(self, audio_data, rate, frame_size=2048, search=512, sync=32):
+        if rate <= 0:
+            raise ValueError('Stretch rate must be positive')
+        self.audio_data = audio_data
+        self.rate = float(rate)
+        self.frame_size = frame_size
+        self.hop = frame_size // 2
+        self.search = search
+        self.sync = sync
+        self.window = signal.get_window('hann', frame_size).astype(np.float32)
+        self.length = int(round(len(audio_data) / self.rate))
+
+    def __len__(self):
+        return self.length
+
+    def blocks(self, start=0):
+        """Yield float32 output blocks (one hop each) from output sample start"""
+        hop, n = self.hop, self.frame_size
+        first = start // hop
+        # Resume from the sync point before the frame preceding `first`
+        k = 0 if first == 0 else ((first - 1) // self.sync) * self.sync
+        skip = start - first * hop
+
+        overlap = np.zeros(n, dtype=np.float32)
+        if k == 0:
+            # Complement the first window so the output starts at full level
+            overlap[:hop] = self._read(0, hop) * self.window[hop:]
+
+        prev = None
+        while k * hop < self.length:
+            pos = self._position(k, prev)
+            overlap += self._read(pos, pos + n) * self.window
+            chunk = overlap[:hop].copy()
+            overlap[:-hop] = overlap[hop:]
+            overlap[-hop:] = 0
+            prev = pos
+
+            if k >= first:
+                end = min(hop, self.length - k * hop)
+                yield chunk[skip:end]
+                skip = 0
+            k += 1
+
+    def render(self):
+        """Stretch the whole signal into one array"""
+        out = np.empty(self.length, dtype=np.float32)
+        filled = 0
+        for block in self.blocks():
+            out[filled:filled + len(block)] = block
+            filled += len(block)
+        return out
+
+    def source(self):
+        return BlockSource(self.length, self.blocks)
+
+    def _position(self, k, prev):
+        """Input position of frame k, aligned to the previous frame"""
+        nominal = int(round(k * self.hop * self.rate))
+        if k == 0:
+            return 0
+        if prev is None or k % self.sync == 0:
+            prev = int(round((k - 1) * self.hop * self.rate))
+
+        template = self._read(prev + self.hop, prev + self.hop + self.frame_size)
+        region = self._read(nominal - self.search, nominal + self.search + self.frame_size)
+        scores = signal.correlate(region, template, mode='valid', method='fft')
+        return max(nominal - self.search + int(np.argmax(scores)), 0)
+
+    def _read(self, lo, hi):
+        """Input samples lo..hi, zero-padded outside the signal"""
+        n = len(self.audio_data)
+        if lo >= 0 and hi <= n:
+            return np.asarray(self.audio_data[lo:hi], dtype=np.float32)
+        out = np.zeros(hi - lo, dtype=np.float32)
+        a, b = max(lo, 0), min(hi, n)
+        if a < b:
+            out[a - lo:b - lo] = self.audio_data[a:b]
+        return out
@@ -0,0 +1,92 @@
+import os
+import socket
+import threading
+from datetime import datetime
+from extensions import db
+from models.track_pin import TrackPin
+
+def process_owner():
+    """This process's owner key in the TrackPin table"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class SQLTrackPins:
+    """
+    Track references shared by every worker process, in the TrackPin
+    table: one row per (track, process) holding that process's count.
+    StorageManager treats a track with any row as pinned, so a worker
+    enforcing the disk quota never evicts a track another worker is
+    streaming or rendering. The database is reached through app's
+    context, so release() also works after the request has ended.
+    """
+    def __init__(self, app, owner=None):
+        self.app = app
+        self.owner = owner or process_owner()
+        self._lock = threading.Lock()
+
+    def acquire(self, track_id):
+        self._add(track_id, 1)
+
+    def release(self, track_id):
+        self._add(track_id, -1)
+
+    def pinned_ids(self):
+        with self.app.app_context():
+            rows = db.session.query(TrackPin.track_id).filter(TrackPin.count > 0).distinct()
+            return {track_id for track_id, in rows}
+
+    def reap(self):
+        """
+        Drop the rows of processes on this host that are gone (and any
+        left under this process's own key by an earlier process with the
+        same PID); returns the number of owners reaped. Rows of other
+        hosts are left to those hosts' workers.
+        """
+        host = self.owner.rsplit(':', 1)[0]
+        with self._lock, self.app.app_context():
+            owners = {owner for owner, in db.session.query(TrackPin.owner).distinct()}
+            dead = []
+            for owner in owners:
+                owner_host, _, pid = owner.rpartition(':')
+                if owner_host == host and (owner == self.owner or not _alive(int(pid))):
+                    dead.append(owner)
+            if dead:
+                TrackPin.query.filter(TrackPin.owner.in_(dead)).delete(synchronize_session=False)
+                db.session.commit()
+            return len(dead)
+
+    def _add(self, track_id, delta):
+        with self._lock, self.app.app_context():
+            pin = TrackPin.query.filter_by(track_id=track_id, owner=self.owner).first()
+            if pin is None:
+                if delta < 0:
+                    return
+                pin = TrackPin(track_id=track_id, owner=self.owner, count=0)
+                db.session.add(pin)
+
+            pin.count += delta
+            if pin.count <= 0:
+                db.session.delete(pin)
+            else:
+                pin.updated_at = datetime.utcnow()
+            db.session.commit()
+
+TRACK_PINS = {
+    'sql': SQLTrackPins
+}
+
+def create_track_pins(backend, app):
+    """Shared pins for the TRACK_PIN_BACKEND setting; None keeps references per process"""
+    if backend == 'memory':
+        return None
+    if backend not in TRACK_PINS:
+        raise ValueError(f"Unknown track pin backend: {backend}")
+    return TRACK_PINS[backend](app)
@@ -0,0 +1,318 @@
+import os
+import numpy as np
+from utils.audio_processor import AudioProcessor
+from utils.analysis_cache import hash_audio, params_key
+from utils.track_store import TrackStore
+from utils.single_flight import SingleFlight
+from utils.waveform import compute_peaks, encode_peaks
+from utils.metrics import CACHE_REQUESTS, span
+
+# Shared by every pipeline in the process, so the API and mixer
+# blueprints coalesce their downloads too
+_flights = SingleFlight()
+
+def analyze_audio_data(audio_data, processor_kwargs, progress=None):
+    """Analyze decoded audio (safe to run in a worker process)"""
+    processor = AudioProcessor(**processor_kwargs)
+
+    _report(progress, 'analyzing')
+    with span('analyze'):
+        return hash_audio(audio_data), processor.analyze(audio_data)
+
+def decode_and_analyze(file_path, processor_kwargs, progress=None):
+    """Decode and analyze an audio file (safe to run in a worker process)"""
+    processor = AudioProcessor(**processor_kwargs)
+
+    _report(progress, 'decoding')
+    with span('decode'):
+        audio_data, sr = processor.load_audio(file_path)
+    audio_hash = hash_audio(audio_data)
+
+    _report(progress, 'analyzing')
+    with span('analyze'):
+        analysis = processor.analyze(audio_data)
+    return audio_hash, analysis
+
+def render_mix_file(track_id1, track_id2, store_folder, output_path, crossfade_duration,
+                    block_size=2048, effects=None, stretch=1.0, cues=None, progress=None):
+    """
+    Crossfade two stored tracks into output_path block by block, with
+    optional per-deck effect specs, track 2 time-stretched by `stretch`
+    and optional (cue1, cue2) seconds where the fade starts in track 1
+    and track 2 enters from (safe to run in a worker process)
+    """
+    from utils.mix_renderer import MixRenderer, write_wav
+    from utils.effects import deck_chains
+
+    _report(progress, 'mixing')
+    audio1, audio2, sr1 = open_mix_sources(
+        TrackStore(store_folder), track_id1, track_id2, stretch=stretch
+    )
+
+    renderer = MixRenderer(sample_rate=sr1, block_size=block_size)
+    effects1, effects2 = deck_chains(effects, sr1)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    cue1, cue2 = cue_samples(cues, sr1)
+    blocks = renderer.render(audio1, audio2, crossfade_duration,
+                             effects1=effects1, effects2=effects2, cue1=cue1, cue2=cue2)
+    with span('render_mix'):
+        frames = write_wav(blocks, output_path, sr1)
+    return frames / sr1
+
+def open_mix_sources(store, track_id1, track_id2, stretch=1.0):
+    """
+    Views of two stored tracks at a common rate: (audio1, audio2, sr).
+    Track 2 is resampled to track 1's rate and time-stretched by
+    `stretch` on the fly, block by block, as the renderer reads it.
+    """
+    from utils.resample import Resampler
+    from utils.time_stretch import TimeStretcher
+
+    audio1, meta1 = store.open(track_id1)
+    audio2, meta2 = store.open(track_id2)
+    if audio1 is None or audio2 is None:
+        raise RuntimeError('Track audio is not available')
+    sr1, sr2 = meta1['sample_rate'], meta2['sample_rate']
+
+    if sr1 != sr2:
+        audio2 = Resampler(audio2, sr2, sr1).source()
+    if stretch and stretch != 1.0:
+        audio2 = TimeStretcher(audio2, stretch).source()
+    return audio1, audio2, sr1
+
+def cue_samples(cues, sample_rate):
+    """(cue1, cue2) in seconds to MixRenderer cue arguments in samples"""
+    if not cues:
+        return None, 0
+    return int(round(cues[0] * sample_rate)), int(round(cues[1] * sample_rate))
+
+def phrase_cues(analysis1, analysis2, crossfade_duration, stretch=1.0, phrase_bars=16):
+    """
+    (cue1, cue2) in seconds for a phrase-aligned crossfade: the fade
+    starts on the last phrase boundary of track 1 that leaves room for
+    it (phrase_bars-long phrases, else 8-bar ones, else any downbeat)
+    and track 2 enters on its first downbeat, at its stretched rate.
+    None if track 1 has no boundary early enough.
+    """
+    latest = analysis1['duration'] - crossfade_duration
+    phrases = analysis1.get('phrases') or {}
+    for boundaries in (phrases.get(phrase_bars), phrases.get(8), analysis1.get('downbeats')):
+        boundaries = np.asarray(boundaries if boundaries is not None else [])
+        fitting = boundaries[boundaries <= latest]
+        if len(fitting):
+            break
+    else:
+        return None
+    cue1 = float(fitting[-1])
+
+    downbeats = np.asarray(analysis2.get('downbeats', []))
+    cue2 = float(downbeats[0]) / (stretch or 1.0) if len(downbeats) else 0.0
+    return cue1, cue2
+
+def _report(progress, stage):
+    if progress:
+        progress(stage)
+
+class TrackPipeline:
+    """
+    Download -> decode -> analyze -> cache pipeline shared by the
+    blueprints and background jobs.
+    CPU-bound steps go through run_cpu(fn, *args) so jobs can move them
+    to a process pool; by default they run inline. Concurrent requests
+    for the same video share one in-flight download and analysis.
+    """
+    def __init__(self, youtube_loader, audio_processor, analysis_cache, track_store,
+                 block_size=2048):
+        self.youtube_loader = youtube_loader
+        self.audio_processor = audio_processor
+        self.analysis_cache = analysis_cache
+        self.track_store = track_store
+        self.block_size = block_size
+
+    def analyze(self, video_id, progress=None, run_cpu=None, keep_audio=False, on_estimate=None):
+        """
+        Return (analysis, cached) for a video.
+        The stream is decoded once in memory; with keep_audio the decoded
+        track is also written to the track store for mixing. Cached
+        analyses skip the download. With on_estimate, provisional tempo
+        and beats are tracked while the stream decodes and passed to it
+        (first after ~30 s of audio); the cached result still comes from
+        the full analysis.
+        """
+        params = self.audio_processor.analysis_params()
+
+        analysis = self.analysis_cache.get(video_id, params)
+        if analysis is not None:
+            return analysis, True
+
+        key = ('analyze', video_id, params_key(params))
+        analysis, shared = _flights.do(
+            key, self._download_and_analyze, video_id, params, progress, run_cpu, keep_audio,
+            on_estimate
+        )
+        CACHE_REQUESTS.inc(cache='inflight', result='hit' if shared else 'miss')
+        if shared and keep_audio:
+            # The request we joined may not have kept the decoded audio
+            self.ensure_track(video_id, progress)
+
+        return analysis, False
+
+    def _download_and_analyze(self, video_id, params, progress, run_cpu, keep_audio,
+                              on_estimate=None):
+        # Another request may have finished while this one was queued
+        analysis = self.analysis_cache.get(video_id, params)
+        if analysis is not None:
+            return analysis
+
+        _report(progress, 'downloading')
+        if on_estimate:
+            track_info = self._stream_and_estimate(video_id, on_estimate)
+        else:
+            track_info = self.youtube_loader.download_audio(
+                video_id,
+                sample_rate=self.audio_processor.sample_rate
+            )
+        if not track_info:
+            raise RuntimeError('Failed to download audio')
+
+        if keep_audio:
+            self.track_store.put(video_id, track_info['audio'], track_info['sample_rate'])
+
+        run_cpu = run_cpu or self._inline(progress)
+        audio_hash, analysis = run_cpu(
+            analyze_audio_data, track_info['audio'], self.audio_processor.settings()
+        )
+        self.analysis_cache.put(video_id, audio_hash, params, analysis)
+        return analysis
+
+    def _stream_and_estimate(self, video_id, on_estimate):
+        """Decode the stream block by block, feeding a progressive beat tracker"""
+        sample_rate = self.audio_processor.sample_rate
+        tracker = self.audio_processor.progressive(on_estimate)
+        blocks = []
+        try:
+            for block in self.youtube_loader.stream_audio(video_id, sample_rate=sample_rate):
+                tracker.feed(block)
+                blocks.append(block)
+        except Exception as e:
+            raise RuntimeError(f"Failed to download audio for {video_id}: {e}") from e
+
+        if not blocks:
+            return None
+        # Flush the framing padding and publish the final estimate
+        tracker.finish()
+        return {'audio': np.concatenate(blocks), 'sample_rate': sample_rate}
+
+    def ensure_track(self, video_id, progress=None):
+        """Make sure the decoded track is in the track store, downloading if needed"""
+        stored = self.track_store.exists(video_id, self.audio_processor.sample_rate)
+        CACHE_REQUESTS.inc(cache='track', result='hit' if stored else 'miss')
+        if stored:
+            return video_id
+
+        key = ('track', os.path.abspath(self.track_store.folder), video_id)
+        _flights.do(key, self._download_track, video_id, progress)
+        return video_id
+
+    def _download_track(self, video_id, progress):
+        if self.track_store.exists(video_id, self.audio_processor.sample_rate):
+            return
+
+        _report(progress, 'downloading')
+        track_info = self.youtube_loader.download_audio(
+            video_id,
+            sample_rate=self.audio_processor.sample_rate
+        )
+        if not track_info:
+            raise RuntimeError(f"Failed to download audio for {video_id}")
+
+        self.track_store.put(video_id, track_info['audio'], track_info['sample_rate'])
+
+    def waveform(self, video_id, progress=None, run_cpu=None):
+        """Encoded waveform peak tiers for a video, analyzing it if needed"""
+        params = self.audio_processor.analysis_params()
+
+        waveform = self.analysis_cache.get_waveform(video_id, params)
+        if waveform is not None:
+            return waveform
+
+        analysis, cached = self.analyze(video_id, progress=progress, run_cpu=run_cpu)
+        waveform = self.analysis_cache.get_waveform(video_id, params)
+        if waveform is not None:
+            return waveform
+
+        # Analyzed before waveforms were cached: compute them from the stored track
+        self.track_store.acquire(video_id)
+        try:
+            self.ensure_track(video_id, progress)
+            audio_data, meta = self.track_store.open(video_id)
+            if audio_data is None:
+                raise RuntimeError('Track audio is not available')
+            waveform = encode_peaks(compute_peaks(audio_data), meta['sample_rate'], len(audio_data))
+        finally:
+            self.track_store.release(video_id)
+
+        self.analysis_cache.put_waveform(video_id, params, waveform)
+        return waveform
+
+    def beatgrid(self, video_id, progress=None, run_cpu=None):
+        """Binary beatgrid (utils.beatgrid format) of a video, analyzing it if needed"""
+        params = self.audio_processor.analysis_params()
+
+        data = self.analysis_cache.get_beatgrid(video_id, params)
+        if data is None:
+            self.analyze(video_id, progress=progress, run_cpu=run_cpu)
+            data = self.analysis_cache.get_beatgrid(video_id, params)
+        if data is None:
+            raise RuntimeError('Beatgrid is not available')
+        return data
+
+    def tempo_ratio(self, video_id1, video_id2, progress=None, run_cpu=None):
+        """Stretch rate that brings video 2 to video 1's analyzed BPM"""
+        from utils.time_stretch import tempo_ratio
+
+        analysis1, _ = self.analyze(video_id1, progress=progress, run_cpu=run_cpu)
+        analysis2, _ = self.analyze(video_id2, progress=progress, run_cpu=run_cpu)
+        return tempo_ratio(analysis1['bpm'], analysis2['bpm'])
+
+    def mix_cues(self, video_id1, video_id2, crossfade_duration, stretch=1.0,
+                 progress=None, run_cpu=None):
+        """Phrase-aligned (cue1, cue2) seconds for a mix of two videos (see phrase_cues)"""
+        analysis1, _ = self.analyze(video_id1, progress=progress, run_cpu=run_cpu)
+        analysis2, _ = self.analyze(video_id2, progress=progress, run_cpu=run_cpu)
+        return phrase_cues(analysis1, analysis2, crossfade_duration, stretch)
+
+    def render_mix(self, video_id1, video_id2, output_path, crossfade_duration,
+                   progress=None, run_cpu=None, effects=None, tempo_sync=False,
+                   align_phrases=False):
+        """
+        Render a crossfade mix of two stored tracks and return its duration.
+        With tempo_sync, track 2 is time-stretched to track 1's BPM; with
+        align_phrases, the fade starts on a phrase boundary of track 1 and
+        track 2 enters on its first downbeat.
+        """
+        stretch = 1.0
+        if tempo_sync:
+            stretch = self.tempo_ratio(video_id1, video_id2, progress, run_cpu)
+        cues = None
+        if align_phrases:
+            cues = self.mix_cues(video_id1, video_id2, crossfade_duration, stretch, progress, run_cpu)
+
+        # Hold both tracks from download to the end of the render
+        self.track_store.acquire(video_id1)
+        self.track_store.acquire(video_id2)
+        try:
+            self.ensure_track(video_id1, progress)
+            self.ensure_track(video_id2, progress)
+
+            run_cpu = run_cpu or self._inline(progress)
+            return run_cpu(
+                render_mix_file, video_id1, video_id2, self.track_store.folder,
+                output_path, crossfade_duration, self.block_size, effects, stretch, cues
+            )
+        finally:
+            self.track_store.release(video_id1)
+            self.track_store.release(video_id2)
+
+    def _inline(self, progress):
+        return lambda fn, *args: fn(*args, progress=progress)
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from utils.single_flight import RefCounter
+
+# Shared by every TrackStore in the process, keyed by track file path
+_refs = RefCounter()
+# References other worker processes can see (utils.track_pins), if set
+_shared_pins = None
+
+def share_pins(pins):
+    """Also record track references in pins, for multi-worker deployments"""
+    global _shared_pins
+    _shared_pins = pins
+
+class TrackStore:
+    """
+    Decoded tracks kept on disk as raw float32 .npy files.
+    Each track has a small JSON sidecar (sample rate, length, extra
+    metadata) and is opened as a read-only np.memmap, so mixing and
+    analysis code gets zero-copy views instead of freshly decoded arrays.
+    Readers hold a reference (acquire/release); remove() on a track that
+    is in use is deferred until the last reference is released.
+    """
+    def __init__(self, folder, storage=None):
+        self.folder = folder
+        self.storage = storage
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, track_id):
+        return os.path.join(self.folder, f"{track_id}.npy")
+
+    def meta_path(self, track_id):
+        return os.path.join(self.folder, f"{track_id}.json")
+
+    def exists(self, track_id, sample_rate=None):
+        meta = self.metadata(track_id)
+        if meta is None or not os.path.exists(self.path(track_id)):
+            return False
+        return sample_rate is None or meta['sample_rate'] == sample_rate
+
+    def put(self, track_id, audio_data, sample_rate, **metadata):
+        """Write a decoded track; readers never see a partial file"""
+        # Per-writer temp names, so concurrent writers never share a file
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        tmp_path = self.path(track_id) + suffix
+        stored = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=np.float32, shape=(len(audio_data),)
+        )
+        stored[:] = audio_data
+        stored.flush()
+        del stored
+
+        meta = dict(metadata)
+        meta.update({
+            'sample_rate': int(sample_rate),
+            'frames': int(len(audio_data)),
+            'duration': len(audio_data) / sample_rate,
+            'created': time.time()
+        })
+        with open(self.meta_path(track_id) + suffix, 'w') as f:
+            json.dump(meta, f)
+
+        os.replace(tmp_path, self.path(track_id))
+        os.replace(self.meta_path(track_id) + suffix, self.meta_path(track_id))
+        if self.storage:
+            self.storage.register(self.path(track_id), 'track')
+        return meta
+
+    def open(self, track_id):
+        """Return (memmap, metadata) for a stored track, or (None, None)"""
+        meta = self.metadata(track_id)
+        if meta is None:
+            return None, None
+        try:
+            audio = np.load(self.path(track_id), mmap_mode='r')
+        except FileNotFoundError:
+            return None, None
+        if self.storage:
+            self.storage.touch(self.path(track_id))
+        return audio, meta
+
+    def metadata(self, track_id):
+        try:
+            with open(self.meta_path(track_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def acquire(self, track_id):
+        """Hold a reference so the track is not removed while in use"""
+        if _shared_pins is not None:
+            _shared_pins.acquire(track_id)
+        _refs.acquire(os.path.abspath(self.path(track_id)))
+
+    def release(self, track_id):
+        _refs.release(os.path.abspath(self.path(track_id)))
+        if _shared_pins is not None:
+            try:
+                _shared_pins.release(track_id)
+            except Exception as e:
+                print(f"Error releasing shared pin on track {track_id}: {e}")
+
+    def in_use(self, track_id):
+        return _refs.in_use(os.path.abspath(self.path(track_id)))
+
+    def in_use_ids(self):
+        """IDs of tracks in this store that are currently held"""
+        folder = os.path.abspath(self.folder)
+        return {
+            os.path.basename(path)[:-4]
+            for path in _refs.held()
+            if os.path.dirname(path) == folder
+        }
+
+    def remove(self, track_id):
+        """Delete a track now, or once its last reference is released"""
+        return _refs.cleanup(
+            os.path.abspath(self.path(track_id)), lambda: self._delete(track_id)
+        )
+
+    def _delete(self, track_id):
+        for path in (self.path(track_id), self.meta_path(track_id)):
+            if os.path.exists(path):
+                os.remove(path)
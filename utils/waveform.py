@@ -0,0 +1,101 @@
+import struct
+import numpy as np
+
+# Samples per pixel of each zoom tier; each tier must divide the next
+ZOOM_LEVELS = (256, 1024, 4096)
+
+MAGIC = b'WAVP'
+VERSION = 1
+_HEADER = struct.Struct('<4sBBHII')  # magic, version, tiers, reserved, sample_rate, frames
+_TIER = struct.Struct('<II')  # samples per pixel, pixels
+
+def compute_peaks(audio_data, levels=ZOOM_LEVELS):
+    """
+    Min/max/RMS per pixel for every zoom tier in one pass over the samples.
+    The finest tier is computed from the audio; coarser tiers are reduced
+    from it. Returns {samples_per_pixel: (mins, maxs, rms)} as float32.
+    """
+    levels = sorted(levels)
+    for finer, coarser in zip(levels, levels[1:]):
+        if coarser % finer:
+            raise ValueError(f"Zoom level {coarser} is not a multiple of {finer}")
+
+    audio = np.asarray(audio_data, dtype=np.float32)
+    if len(audio) == 0:
+        audio = np.zeros(1, dtype=np.float32)
+    step = levels[0]
+    pixels = -(-len(audio) // step)
+    # Pad the last pixel with its own final sample, so min/max are unaffected
+    pad = pixels * step - len(audio)
+    blocks = np.pad(audio, (0, pad), mode='edge').reshape(pixels, step)
+
+    mins = blocks.min(axis=1)
+    maxs = blocks.max(axis=1)
+    squares = np.einsum('ij,ij->i', blocks, blocks)
+    counts = np.full(pixels, step, dtype=np.float64)
+    counts[-1] -= pad
+    if pad:
+        squares[-1] -= pad * blocks[-1, -1] ** 2
+
+    peaks = {}
+    for level in levels:
+        factor = level // step
+        if factor > 1:
+            pixels = -(-len(mins) // factor)
+            extra = pixels * factor - len(mins)
+            mins = np.pad(mins, (0, extra), mode='edge').reshape(pixels, factor).min(axis=1)
+            maxs = np.pad(maxs, (0, extra), mode='edge').reshape(pixels, factor).max(axis=1)
+            squares = np.pad(squares, (0, extra)).reshape(pixels, factor).sum(axis=1)
+            counts = np.pad(counts, (0, extra)).reshape(pixels, factor).sum(axis=1)
+            step = level
+        rms = np.sqrt(np.maximum(squares, 0) / np.maximum(counts, 1)).astype(np.float32)
+        peaks[level] = (mins, maxs, rms)
+    return peaks
+
+def encode_peaks(peaks, sample_rate, frames, levels=None):
+    """
+    Pack peak tiers into the binary waveform format:
+    a header, then per tier its samples-per-pixel and pixel count followed
+    by interleaved int8 (min, max, rms) triples scaled to +/-127.
+    """
+    levels = sorted(levels or peaks)
+    parts = [_HEADER.pack(MAGIC, VERSION, len(levels), 0, int(sample_rate), int(frames))]
+    for level in levels:
+        mins, maxs, rms = peaks[level]
+        data = np.empty((len(mins), 3), dtype=np.int8)
+        data[:, 0] = _quantize(mins)
+        data[:, 1] = _quantize(maxs)
+        data[:, 2] = _quantize(rms)
+        parts.append(_TIER.pack(level, len(mins)))
+        parts.append(data.tobytes())
+    return b''.join(parts)
+
+def decode_peaks(data):
+    """Unpack the binary format: (sample_rate, frames, {level: int8 array (pixels, 3)})"""
+    magic, version, count, _, sample_rate, frames = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a waveform peak file')
+
+    offset = _HEADER.size
+    tiers = {}
+    for _ in range(count):
+        level, pixels = _TIER.unpack_from(data, offset)
+        offset += _TIER.size
+        tiers[level] = np.frombuffer(data, dtype=np.int8, count=pixels * 3, offset=offset).reshape(pixels, 3)
+        offset += pixels * 3
+    return sample_rate, frames, tiers
+
+def extract_tier(data, level):
+    """Binary file holding only one zoom tier of an encoded waveform"""
+    sample_rate, frames, tiers = decode_peaks(data)
+    tier = tiers.get(level)
+    if tier is None:
+        return None
+    return b''.join([
+        _HEADER.pack(MAGIC, VERSION, 1, 0, sample_rate, frames),
+        _TIER.pack(level, len(tier)),
+        tier.tobytes()
+    ])
+
+def _quantize(values):
+    return np.clip(np.round(values * 127), -127, 127)
@@ -1,23 +1,21 @@
-import youtube_dl
 import os
-from pydub import AudioSegment
-import requests
+import glob
 import json
+import time
 from urllib.parse import urlparse, parse_qs
+from utils.audio_decoder import decode_audio, decode_audio_blocks, copy_audio_stream
+from utils.metrics import DECODED_SECONDS, DOWNLOAD_BYTES, STAGE_SECONDS, span
 
 class YouTubeLoader:
-    def __init__(self, temp_folder='temp_audio'):
+    def __init__(self, temp_folder='temp_audio', storage=None):
         self.temp_folder = temp_folder
+        self.storage = storage
         if not os.path.exists(temp_folder):
             os.makedirs(temp_folder)
         
+        # Streams are read directly by ffmpeg; no transcode postprocessor
         self.ydl_opts = {
             'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
             'outtmpl': os.path.join(temp_folder, '%(id)s.%(ext)s'),
             'quiet': True,
             'no_warnings': True,
@@ -67,6 +65,7 @@ class YouTubeLoader:
     def get_audio_info(self, video_id):
         """Get audio information without downloading"""
         try:
+            import youtube_dl  # deferred: slow to import, only needed here
             with youtube_dl.YoutubeDL(self.ydl_opts) as ydl:
                 info = ydl.extract_info(
                     f'https://www.youtube.com/watch?v={video_id}',
@@ -84,42 +83,142 @@ class YouTubeLoader:
             print(f"Error getting audio info: {e}")
             return None
     
-    def download_audio(self, video_id):
-        """Download audio from YouTube"""
+    def download_audio(self, video_id, sample_rate=44100, keep_source=False, write_wav=False):
+        """
+        Stream the best audio format and decode it once to a float32 array.
+        No files are written unless requested: keep_source saves the
+        original compressed stream, write_wav saves a PCM WAV copy.
+        """
         try:
-            with youtube_dl.YoutubeDL(self.ydl_opts) as ydl:
-                info = ydl.extract_info(
-                    f'https://www.youtube.com/watch?v={video_id}',
-                    download=True
+            stream = self._resolve_stream(video_id)
+            source_path = self._source_path(video_id, stream['ext']) if keep_source else None
+            
+            with span('download'):
+                audio = decode_audio(
+                    stream['url'],
+                    sample_rate=sample_rate,
+                    headers=stream['headers'],
+                    copy_to=source_path
                 )
-                
-                # Convert to WAV for audio processing
-                mp3_path = os.path.join(self.temp_folder, f"{video_id}.mp3")
+            self._count_download(stream, source_path, len(audio) / sample_rate)
+            
+            wav_path = None
+            if write_wav:
                 wav_path = os.path.join(self.temp_folder, f"{video_id}.wav")
-                
-                audio = AudioSegment.from_mp3(mp3_path)
-                audio.export(wav_path, format="wav")
-                
-                return {
-                    'mp3_path': mp3_path,
-                    'wav_path': wav_path,
-                    'duration': len(audio) / 1000,  # Convert to seconds
-                    'sample_rate': audio.frame_rate,
-                    'channels': audio.channels
-                }
+                from scipy.io import wavfile
+                wavfile.write(wav_path, sample_rate, audio)
+            
+            self._register(source_path, wav_path)
+            
+            return {
+                'audio': audio,
+                'source_path': source_path,
+                'wav_path': wav_path,
+                'duration': len(audio) / sample_rate,
+                'sample_rate': sample_rate,
+                'channels': 1
+            }
         except Exception as e:
             print(f"Download error: {e}")
             return None
     
+    def stream_audio(self, video_id, sample_rate=44100, block_frames=65536):
+        """
+        Yield the decoded float32 audio in blocks while the stream downloads,
+        so analysis can start before the whole track has arrived.
+        """
+        stream = self._resolve_stream(video_id)
+        start = time.perf_counter()
+        frames = 0
+        for block in decode_audio_blocks(
+            stream['url'],
+            sample_rate=sample_rate,
+            headers=stream['headers'],
+            block_frames=block_frames
+        ):
+            frames += len(block)
+            yield block
+        # Includes the time the consumer spent on each block
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='download')
+        self._count_download(stream, None, frames / sample_rate)
+    
+    def download_source(self, video_id):
+        """Save the original audio stream to the temp folder without decoding"""
+        try:
+            existing = self.find_source(video_id)
+            if existing:
+                return existing
+            
+            stream = self._resolve_stream(video_id)
+            with span('download'):
+                source_path = copy_audio_stream(
+                    stream['url'],
+                    self._source_path(video_id, stream['ext']),
+                    headers=stream['headers']
+                )
+            self._count_download(stream, source_path)
+            self._register(source_path)
+            return source_path
+        except Exception as e:
+            print(f"Download error: {e}")
+            return None
+    
+    def find_source(self, video_id):
+        """Path of a previously saved source stream, if any"""
+        matches = glob.glob(os.path.join(self.temp_folder, f"{glob.escape(video_id)}.*"))
+        if not matches:
+            return None
+        if self.storage:
+            self.storage.touch(matches[0])
+        return matches[0]
+    
+    @span('resolve')
+    def _resolve_stream(self, video_id):
+        """Direct URL, headers, container and (if known) size of the best audio stream"""
+        import youtube_dl
+        with youtube_dl.YoutubeDL(self.ydl_opts) as ydl:
+            info = ydl.extract_info(
+                f'https://www.youtube.com/watch?v={video_id}',
+                download=False
+            )
+        return {
+            'url': info['url'],
+            'headers': info.get('http_headers'),
+            'ext': info.get('ext') or 'webm',
+            'filesize': info.get('filesize') or info.get('filesize_approx')
+        }
+    
+    def _count_download(self, stream, source_path=None, decoded_seconds=0):
+        """
+        Record bytes downloaded: the saved file's size when there is one,
+        otherwise the size the stream metadata reports
+        """
+        size = stream.get('filesize')
+        if source_path and os.path.exists(source_path):
+            size = os.path.getsize(source_path)
+        if size:
+            DOWNLOAD_BYTES.inc(size)
+        if decoded_seconds:
+            DECODED_SECONDS.inc(decoded_seconds)
+    
+    def _source_path(self, video_id, ext):
+        return os.path.join(self.temp_folder, f"{video_id}.{ext}")
+    
+    def _register(self, *paths):
+        """Hand written files to the storage manager, if there is one"""
+        if self.storage:
+            for path in paths:
+                if path:
+                    self.storage.register(path, 'download')
+    
     def cleanup(self, video_id):
         """Clean up temporary files"""
-        files = [
-            os.path.join(self.temp_folder, f"{video_id}.mp3"),
-            os.path.join(self.temp_folder, f"{video_id}.wav")
-        ]
+        files = glob.glob(os.path.join(self.temp_folder, f"{glob.escape(video_id)}.*"))
         for file in files:
-            if os.path.exists(file):
-                try:
+            try:
+                if self.storage:
+                    self.storage.remove(file)
+                elif os.path.exists(file):
                     os.remove(file)
-                except:
-                    pass
\ No newline at end of file
+            except OSError:
+                pass
\ No newline at end of file
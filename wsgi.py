@@ -0,0 +1,11 @@
+"""
+WSGI entry point for one worker process, e.g.
+
+    gunicorn -k eventlet -w 1 -b 0.0.0.0:5000 wsgi:app
+
+Gunicorn cannot keep Socket.IO clients on one worker, so scale with one
+single-worker gunicorn per port behind a sticky balancer, or serve.py.
+"""
+from app import create_app
+
+app = create_app()